@@ -0,0 +1,110 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Representative templates, models and a mock target for the benchmarks
+'''
+from kitty.model import Template, Container, String, Delimiter, Static
+from kitty.model import UInt8, UInt16, UInt32, RandomBytes
+from kitty.model import Size, Checksum, Hash
+from kitty.model import GraphModel
+from kitty.model.low_level.mutated_field import MutableField
+from kitty.targets.server import ServerTarget
+
+
+def deep_containers(depth=10, width=3):
+    '''
+    Template of nested containers, each level has a few fields and the next level
+    '''
+    inner = [UInt8(0x11, name='leaf_byte'), String('leaf', name='leaf_string')]
+    for level in range(depth):
+        fields = [UInt16(level, name='level_%d_int_%d' % (level, i)) for i in range(width)]
+        fields.append(Container(name='level_%d' % level, fields=inner))
+        inner = fields
+    return Template(name='deep_containers', fields=inner)
+
+
+def many_strings(count=50):
+    '''
+    Text based template with many String fields
+    '''
+    fields = []
+    for i in range(count):
+        fields.append(String('value %d' % i, name='key_%d' % i))
+        fields.append(Delimiter('\r\n', fuzzable=False, name='delim_%d' % i))
+    return Template(name='many_strings', fields=fields)
+
+
+def binary_format(records=8):
+    '''
+    Binary format with many Size and Checksum fields, similar to chunk based file formats
+    '''
+    fields = [Static('\x89KTY\r\n\x1a\n', name='magic')]
+    for i in range(records):
+        data = Container(name='data_%d' % i, fields=[
+            UInt32(i, name='type'),
+            RandomBytes('chunk data %d' % i, min_length=0, max_length=256, num_mutations=20, name='payload'),
+        ])
+        fields.append(Container(name='record_%d' % i, fields=[
+            Size(sized_field='data_%d' % i, length=32, name='length'),
+            data,
+            Checksum(depends_on='data_%d' % i, length=32, algorithm='crc32', name='crc'),
+        ]))
+    fields.append(Hash(depends_on='record_0', algorithm='sha1', name='digest'))
+    return Template(name='binary_format', fields=fields)
+
+
+def mutable_field(size=16 * 1024):
+    '''
+    Template with a big MutableField, as used for mutation fuzzing of files
+    '''
+    value = ''.join(chr((i * 7) % 256) for i in range(size))
+    return Template(name='mutable_field', fields=[MutableField(value, name='file')])
+
+
+def graph_model():
+    '''
+    GraphModel with branching - a login stage that branches to several commands
+    '''
+    def message(name, *extra):
+        return Template(name=name, fields=[String(name, name='command'), Delimiter(' ', fuzzable=False)] + list(extra) + [Static('\r\n')])
+
+    login = message('login', String('user', name='user'), String('pass', name='password'))
+    model = GraphModel()
+    model.connect(login)
+    for command in ['list', 'get', 'put', 'delete']:
+        template = message(command, String('/path/to/file', name='path'), UInt32(0, name='offset'))
+        model.connect(login, template)
+        model.connect(template, message(command + '_ack', UInt8(0, name='status')))
+    return model
+
+
+class MockTarget(ServerTarget):
+    '''
+    Server target that does not send or receive anything
+    '''
+
+    def __init__(self, logger=None):
+        super(MockTarget, self).__init__('BenchmarkTarget', logger=logger)
+
+    def _restart(self):
+        pass
+
+    def _send_to_target(self, data):
+        pass
+
+    def _receive_from_target(self):
+        return ''
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Kitty benchmarks - measure the throughput of the data model and the fuzzing loop.
+
+Usage:
+    run.py [options] [<BENCHMARK> ...]
+    run.py --list
+
+Options:
+    <BENCHMARK>                 benchmarks to run (default: all)
+    --count -c COUNT            number of cases to run in each benchmark [default: 2000]
+    --baseline -b FILE          compare the results with a baseline file (e.g. benchmarks/baseline.json)
+    --save -s FILE              save the results as a baseline file
+    --threshold -t PERCENT      slowdown (in percent) that is reported as a regression [default: 10]
+    --inline                    run all benchmarks in this process (peak RSS is not per benchmark)
+    --list                      list the benchmarks
+    --help -h                   print this help and exit
+
+Each benchmark reports:
+    cases/sec       number of cases per second
+    alloc KB        peak memory allocated while running the cases, in KB
+                    (requires tracemalloc, on python 2 install pytracemalloc)
+    peak RSS KB     peak resident set size of the benchmark process, in KB
+
+The exit code is 1 if any benchmark is slower than the baseline by more than the threshold.
+'''
+import os
+import sys
+import gc
+import json
+import time
+import logging
+import subprocess
+import multiprocessing
+import docopt
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import models
+from kitty.core.kitty_object import KittyObject
+from kitty.fuzzers import ServerFuzzer
+from kitty.interfaces.base import EmptyInterface
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _get_logger():
+    logger = logging.getLogger('kitty-benchmarks')
+    logger.setLevel(logging.ERROR)
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+    return logger
+
+
+def mutate_render(factory):
+    '''
+    :return: function that mutates and renders a template (or a model) *count* times
+    '''
+    def prepare():
+        target = factory()
+
+        def run(count):
+            done = 0
+            while done < count:
+                if not target.mutate():
+                    target.reset()
+                    continue
+                target.render()
+                done += 1
+            return done
+        return run
+    return prepare
+
+
+def skip(factory):
+    '''
+    :return: function that skips over *count* mutations of a template
+    '''
+    def prepare():
+        template = factory()
+
+        def run(count):
+            done = 0
+            while done < count:
+                skipped = template.skip(count - done)
+                if not skipped:
+                    template.reset()
+                    continue
+                done += skipped
+            return done
+        return run
+    return prepare
+
+
+def construct(factory):
+    '''
+    :return: function that constructs a template (or a model) *count* times
+    '''
+    def prepare():
+        def run(count):
+            for _ in range(count):
+                factory()
+            return count
+        return run
+    return prepare
+
+
+def cold_import(modules, max_count=20):
+    '''
+    :return: function that imports modules in a new python process, up to *max_count* times
+    '''
+    def prepare():
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        command = [sys.executable, '-c', 'import %s' % ', '.join(modules)]
+        env = dict(os.environ, PYTHONPATH=root)
+
+        def run(count):
+            # each case is a new process, so the count is limited
+            count = min(count, max_count)
+            for _ in range(count):
+                subprocess.check_call(command, env=env)
+            return count
+        return run
+    return prepare
+
+
+def model_sequences(factory):
+    '''
+    :return: function that mutates a model and renders all the templates of each sequence
+    '''
+    def prepare():
+        # the models can not be reset, a new model is created when one is exhausted
+        current = [factory()]
+
+        def run(count):
+            done = 0
+            while done < count:
+                if not current[0].mutate():
+                    current[0] = factory()
+                    continue
+                for connection in current[0].get_sequence():
+                    connection.dst.render()
+                done += 1
+            return done
+        return run
+    return prepare
+
+
+def server_fuzzer(factory):
+    '''
+    :return: function that runs *count* tests of a ServerFuzzer with a mock target
+    '''
+    def prepare():
+        def run(count):
+            logger = _get_logger()
+            model = factory()
+            fuzzer = ServerFuzzer(name='BenchmarkFuzzer', logger=logger)
+            fuzzer.set_interface(EmptyInterface())
+            fuzzer.set_model(model)
+            fuzzer.set_target(models.MockTarget(logger=logger))
+            fuzzer.set_range(0, min(count, model.num_mutations()) - 1)
+            fuzzer.start()
+            # the session info is not available once the fuzzer is stopped
+            done = fuzzer._get_session_info().current_index + 1
+            fuzzer.stop()
+            return done
+        return run
+    return prepare
+
+
+#: name: (description, function that prepares the benchmark)
+BENCHMARKS = {
+    'deep_containers.mutate': ('mutate and render nested containers', mutate_render(models.deep_containers)),
+    'many_strings.mutate': ('mutate and render a template of many strings', mutate_render(models.many_strings)),
+    'many_strings.skip': ('skip the mutations of a template of many strings', skip(models.many_strings)),
+    'binary_format.mutate': ('mutate and render a Size/Checksum heavy binary format', mutate_render(models.binary_format)),
+    'mutable_field.mutate': ('mutate and render a 16KB MutableField', mutate_render(models.mutable_field)),
+    'graph_model.mutate': ('mutate a branching GraphModel and render its sequences', model_sequences(models.graph_model)),
+    'graph_model.fuzz': ('run a ServerFuzzer over a branching GraphModel with a mock target', server_fuzzer(models.graph_model)),
+    'many_strings.construct': ('construct a template of many strings', construct(models.many_strings)),
+    'graph_model.construct': ('construct a branching GraphModel and its templates', construct(models.graph_model)),
+    'import.model': ('import kitty.model in a new process (up to 20 cases)', cold_import(['kitty.model'])),
+    'import.fuzzers': ('import kitty.fuzzers and kitty.targets in a new process (up to 20 cases)', cold_import(['kitty.fuzzers', 'kitty.targets'])),
+}
+
+
+def run_benchmark(args):
+    '''
+    Run a single benchmark
+
+    :param args: tuple (benchmark name, number of cases)
+    :return: dictionary of the benchmark results
+    '''
+    (name, count) = args
+    # objects that are created without a logger use the shared kitty logger,
+    # replace it so logging does not affect the results (and no log files are created)
+    KittyObject._logger = _get_logger()
+    run = BENCHMARKS[name][1]()
+    # warm up, so one-time initialization is not measured
+    run(max(1, count // 20))
+    gc.collect()
+    start = time.time()
+    done = run(count)
+    elapsed = time.time() - start
+    alloc_kb = None
+    if tracemalloc:
+        sample = max(1, count // 10)
+        tracemalloc.start()
+        run(sample)
+        alloc_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    peak_rss_kb = None
+    if resource:
+        peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            peak_rss_kb /= 1024
+    return {
+        'cases': done,
+        'seconds': elapsed,
+        'cases_per_sec': done / elapsed if elapsed else None,
+        'alloc_kb': alloc_kb,
+        'peak_rss_kb': peak_rss_kb,
+    }
+
+
+def run_benchmarks(names, count, inline=False):
+    '''
+    :param names: names of the benchmarks to run
+    :param count: number of cases in each benchmark
+    :param inline: run in the current process (default: False)
+    :return: dictionary of results per benchmark
+    '''
+    results = {}
+    for name in names:
+        if inline:
+            results[name] = run_benchmark((name, count))
+        else:
+            # fresh process per benchmark, so the peak RSS belongs to the benchmark
+            pool = multiprocessing.Pool(1)
+            try:
+                results[name] = pool.apply(run_benchmark, ((name, count),))
+            finally:
+                pool.close()
+                pool.join()
+        print_result(name, results[name])
+    return results
+
+
+def _fmt(value, fmt):
+    return fmt % value if value is not None else 'n/a'
+
+
+def print_result(name, result, baseline=None):
+    line = '%-24s %12s cases/sec %10s alloc KB %10s peak RSS KB' % (
+        name,
+        _fmt(result['cases_per_sec'], '%.1f'),
+        _fmt(result['alloc_kb'], '%d'),
+        _fmt(result['peak_rss_kb'], '%d'),
+    )
+    if baseline:
+        line += '  %+.1f%%' % get_change(result, baseline)
+    print(line)
+
+
+def get_change(result, baseline):
+    '''
+    :return: change in cases/sec from the baseline, in percent
+    '''
+    return (result['cases_per_sec'] - baseline['cases_per_sec']) * 100.0 / baseline['cases_per_sec']
+
+
+def compare(results, baseline, threshold):
+    '''
+    :return: names of the benchmarks that are slower than the baseline by more than the threshold
+    '''
+    regressions = []
+    print('')
+    print('Compared with the baseline:')
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        print_result(name, results[name], baseline[name])
+        if get_change(results[name], baseline[name]) < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def _main():
+    opts = docopt.docopt(__doc__)
+    if opts['--list']:
+        for name in sorted(BENCHMARKS):
+            print('%-24s %s' % (name, BENCHMARKS[name][0]))
+        return
+    names = opts['<BENCHMARK>'] or sorted(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print('No such benchmark: %s' % name)
+            sys.exit(2)
+    count = int(opts['--count'])
+    results = run_benchmarks(names, count, opts['--inline'])
+    if opts['--save']:
+        with open(opts['--save'], 'wb') as f:
+            json.dump(results, f, indent=4, sort_keys=True, separators=(',', ': '))
+            f.write('\n')
+    if opts['--baseline']:
+        with open(opts['--baseline'], 'rb') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, float(opts['--threshold']))
+        if regressions:
+            print('')
+            print('Regressions: %s' % ', '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    _main()
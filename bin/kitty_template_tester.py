@@ -17,7 +17,7 @@
 # along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
 '''
 Usage:
-    kitty_template_tester.py [--fast] [--tree] [--verbose] <FILE> ...
+    kitty_template_tester.py [options] <FILE> ...
 
 This tool mutates and renders templates in a file, making sure there are no
 syntax issues in the templates.
@@ -25,17 +25,24 @@ It doesn't prove that the data model is correct, only checks that the it is
 a valid model
 
 Options:
-    <FILE>      python file that contains templates in dictionaries, lists or globals
-    --fast      only import, don't run all mutations
-    --tree      print fields tree of the template instead of mutating it
-    --verbose   print full call stack upon exception
+    <FILE>                  python file that contains templates in dictionaries, lists or globals
+    --fast                  only import, don't run all mutations
+    --tree                  print fields tree of the template instead of mutating it
+    --verbose               print full call stack upon exception
+    --jobs -j JOBS          number of templates to test in parallel [default: 1]
+    --density -d DENSITY    fraction of the mutations to test, between 0 and 1 [default: 1]
+    --range-size -r SIZE    size of the sampled mutation ranges, the first DENSITY of each range is tested [default: 1000]
+    --cache -c CACHE        file of passed template hashes, templates that did not change since they passed are not tested again
+    --twice                 mutate each template twice, to check that it can be reset and mutated again
 '''
 import os
 import sys
+import time
+import json
 import types
 import docopt
 import traceback
-from pkg_resources import get_distribution
+import multiprocessing
 from kitty.model import Template
 
 
@@ -69,24 +76,42 @@ class TemplateTreePrinter(TemplateProcessor):
 
 class TemplateTester(TemplateProcessor):
 
-    def __init__(self, fast):
-        super(TemplateProcessor, self).__init__()
+    def __init__(self, fast, density=1.0, range_size=1000, twice=False):
+        super(TemplateTester, self).__init__()
         self._fast = fast
+        self.density = density
+        self.range_size = range_size
+        self.twice = twice
+
+    def _mutate(self, t):
+        '''
+        Mutate and render the template in a single pass,
+        when density < 1 only the first mutations of each range are tested,
+        and the rest of the range is skipped
+
+        :return: number of tested mutations
+        '''
+        range_count = max(1, int(self.range_size * self.density))
+        skip_count = self.range_size - range_count if self.density < 1 else 0
+        count = 0
+        while t.mutate():
+            t.render()
+            count += 1
+            if skip_count and count % range_count == 0:
+                t.skip(skip_count)
+        t.reset()
+        return count
 
     def process(self, t):
-        print('[mutation count: %d]' % t.num_mutations())
+        lines = ['[mutation count: %d]' % t.num_mutations()]
         t.render()
         if not self._fast:
-            count = 0
-            while t.mutate():
-                count += 1
-                t.render()
-            t.reset()
-            count = 0
-            while t.mutate():
-                count += 1
-                t.render()
-            t.reset()
+            count = self._mutate(t)
+            if self.twice:
+                self._mutate(t)
+            if self.density < 1:
+                lines.append('[tested mutations: %d]' % count)
+        return lines
 
 
 def validate_file(f):
@@ -109,71 +134,187 @@ def validate_files(files):
     return valid
 
 
-def test_if_template(obj, description, processor):
-    if isinstance(obj, Template):
-        print('Template %s: %s' % (obj.get_name(), description))
+def test_template(t, description, processor):
+    '''
+    :return: tuple (passed, output lines, elapsed time)
+    '''
+    lines = ['Template %s: %s' % (t.get_name(), description)]
+    start_time = time.time()
+    try:
+        lines.extend(processor.process(t) or [])
+        passed = True
+    except Exception as e:
+        passed = False
+        error = traceback.format_exc() if processor.verbose else str(e)
+    elapsed = time.time() - start_time
+    if passed:
+        lines.append('[PASS] (%.2f seconds)' % elapsed)
+    else:
+        lines.extend(['[FAIL] (%.2f seconds)' % elapsed, error])
+    return passed, lines, elapsed
+
+
+def load_module(f):
+    dirpath, filename = os.path.split(f)
+    modulename = filename[:-3]
+    if dirpath in sys.path:
+        sys.path.remove(dirpath)
+    sys.path.insert(0, dirpath)
+    return __import__(modulename)
+
+
+def find_templates(f, processor):
+    '''
+    :return: list of tuples (template, description, locator) of the templates in a file,
+        the locator is used to find the template in a worker process
+    '''
+    templates = []
+    module = load_module(f)
+    for name in dir(module):
         try:
-            processor.process(obj)
-            print('[PASS]')
+            attr = getattr(module, name)
+            if isinstance(attr, Template):
+                templates.append((attr, '(member name %s)' % name, (name, None)))
+            elif isinstance(attr, types.ListType):
+                for i, mem in enumerate(attr):
+                    if isinstance(mem, Template):
+                        templates.append((mem, '(element in list %s)' % name, (name, i)))
+            elif isinstance(attr, types.DictionaryType):
+                for k in attr:
+                    if isinstance(attr[k], Template):
+                        templates.append((attr[k], '(%s[%s])' % (name, k), (name, k)))
         except Exception as e:
-            print('[FAIL]')
+            print('Exception when testing member %s' % name)
             if processor.verbose:
                 print(traceback.format_exc())
-            else:
-                print(e)
+    return templates
 
 
-def process_file(f, processor):
-    try:
-        dirpath, filename = os.path.split(f)
-        modulename = filename[:-3]
-        if dirpath in sys.path:
-            sys.path.remove(dirpath)
-        sys.path.insert(0, dirpath)
-        module = __import__(modulename)
-        member_names = dir(module)
-        print('Testing file %s' % f)
-        for name in member_names:
-            try:
-                attr = getattr(module, name)
-                if isinstance(attr, Template):
-                    description = '(member name %s)' % name
-                    test_if_template(attr, description, processor)
-                elif isinstance(attr, types.ListType):
-                    for mem in attr:
-                        description = '(element in list %s)' % name
-                        test_if_template(mem, description, processor)
-                elif isinstance(attr, types.DictionaryType):
-                    for k in attr:
-                        description = '(%s[%s])' % (name, k)
-                        test_if_template(attr[k], description, processor)
+def get_template(f, locator):
+    (name, key) = locator
+    attr = getattr(load_module(f), name)
+    return attr if key is None else attr[key]
+
+
+def _test_worker(args):
+    '''
+    Test a template in a worker process
+    '''
+    (f, locator, description, processor) = args
+    return test_template(get_template(f, locator), description, processor)
+
+
+def load_cache(path):
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return json.load(f)
+    return {}
+
+
+def save_cache(path, cache):
+    with open(path, 'wb') as f:
+        json.dump(cache, f, indent=4, sort_keys=True)
+
+
+def is_cached(cache, template_hash, processor):
+    '''
+    :return: True if the template passed a test that covered the mutations of the current test
+    '''
+    entry = cache.get(template_hash)
+    if entry is None or processor._fast:
+        return False
+    if processor.twice and not entry.get('twice'):
+        return False
+    if entry['density'] >= 1:
+        return True
+    return entry['density'] >= processor.density and entry.get('range_size') == processor.range_size
+
+
+def process_files(files, processor, jobs=1, cache_path=None):
+    '''
+    Test the templates in the files, in parallel if jobs > 1
+
+    :return: tuple (number of passed templates, number of failed templates, number of cached templates)
+    '''
+    cache = load_cache(cache_path)
+    tasks = []
+    cached = 0
+    for f in files:
+        try:
+            print('Testing file %s' % f)
+            for (t, description, locator) in find_templates(f, processor):
+                template_hash = str(t.hash())
+                if is_cached(cache, template_hash, processor):
+                    print('Template %s: %s' % (t.get_name(), description))
+                    print('[CACHED] (%.2f seconds)' % cache[template_hash]['seconds'])
+                    cached += 1
                 else:
-                    attr = None
-            except Exception as e:
-                print('Exception when testing member %s' % name)
-                if processor.verbose:
-                    print(traceback.format_exc())
-    except Exception as e:
-        print('Exception when processing file %s: %s' % (f, e))
-        if processor.verbose:
-            print(traceback.format_exc())
+                    tasks.append((f, locator, description, processor, t, template_hash))
+        except Exception as e:
+            print('Exception when processing file %s: %s' % (f, e))
+            if processor.verbose:
+                print(traceback.format_exc())
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        results = pool.imap(_test_worker, [task[:4] for task in tasks])
+    else:
+        pool = None
+        results = (test_template(task[4], task[2], processor) for task in tasks)
+    passed = failed = 0
+    try:
+        for (task, (success, lines, elapsed)) in zip(tasks, results):
+            print('\n'.join(lines))
+            if success:
+                passed += 1
+                if cache_path and not processor._fast:
+                    cache[task[5]] = {
+                        'name': task[4].get_name(),
+                        'mutations': task[4].num_mutations(),
+                        'density': processor.density,
+                        'range_size': processor.range_size,
+                        'twice': processor.twice,
+                        'seconds': elapsed,
+                    }
+            else:
+                failed += 1
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if cache_path:
+            save_cache(cache_path, cache)
+    return passed, failed, cached
 
 
 def _main():
+    from pkg_resources import get_distribution
     print('kitty version: %s' % get_distribution('kittyfuzzer').version)
     opts = docopt.docopt(__doc__)
     files = opts['<FILE>']
     fast = opts['--fast']
     verbose = opts['--verbose']
-    if opts['--tree']:
-        processor = TemplateTreePrinter()
-    else:
-        processor = TemplateTester(fast)
-    processor.verbose = verbose
     try:
+        jobs = int(opts['--jobs'])
+        density = float(opts['--density'])
+        range_size = int(opts['--range-size'])
+        if not 0 < density <= 1:
+            raise ValueError('density should be between 0 and 1')
+        if range_size <= 0:
+            raise ValueError('range size should be positive')
         validate_files(files)
-        for f in files:
-            process_file(f, processor)
+        if opts['--tree']:
+            processor = TemplateTreePrinter()
+            processor.verbose = verbose
+            for f in files:
+                for (t, description, _) in find_templates(f, processor):
+                    print('Template %s: %s' % (t.get_name(), description))
+                    processor.process(t)
+        else:
+            processor = TemplateTester(fast, density, range_size, opts['--twice'])
+            processor.verbose = verbose
+            start_time = time.time()
+            passed, failed, cached = process_files(files, processor, jobs, opts['--cache'])
+            print('Templates: %d passed, %d failed, %d cached (%.2f seconds)' % (passed, failed, cached, time.time() - start_time))
     except Exception as e:
         print(e)
 
@@ -21,11 +21,13 @@ Tools for testing and manipulating kitty templates.
 Usage:
     kitty-tool generate [options] <FILE> <TEMPLATE> ...
     kitty-tool list <FILE>
+    kitty-tool analyze [options] <SESSION> ...
     kitty-tool --version
 
 Commands:
     generate    generate files with mutated payload
     list        list templates in a file
+    analyze     aggregate the reports of finished fuzzing sessions
 
 Options:
     <FILE>                  python file that contains the template
@@ -36,6 +38,14 @@ Options:
     --field-path -p FIELDPATH   generate mutations only for the field with the given path
     --verbose -v            verbose output
     --filename-format -f FORMAT  format for generated file names [default: %(template)s.%(index)s.bin]
+    --metadata -m MODE      how to store the metadata of the mutations - files, ndjson or none [default: files]
+    --archive -a FORMAT     store the mutations in a single tar or zip archive, OUTDIR is the archive path
+    --shard-size N          store the mutations in sub-directories of N mutations each
+    <SESSION>               session file(s) to analyze, opened read-only
+    --jobs -j JOBS          number of worker processes (generate default: 1, analyze default: number of CPUs)
+    --bucket -b SECS        length of a throughput time series bucket, in seconds [default: 60]
+    --top -t TOP            number of entries to print for each aggregation [default: 20]
+    --json                  print the analysis as JSON
     --version               print version and exit
     --help -h               print this help and exit
 
@@ -45,12 +55,22 @@ File name formats:
     The available keywords are:
         template - the template name
         index - the template index
+
+Metadata modes:
+    files   - a <file name>.metadata file with the JSON info of each mutation
+    ndjson  - a single metadata.ndjson file, one compact JSON line per mutation
+    none    - no metadata
 '''
 import os
 import sys
+import time
 import types
 import logging
-from pkg_resources import get_distribution
+import tarfile
+import zipfile
+import tempfile
+import multiprocessing
+from cStringIO import StringIO
 from json import dumps
 import docopt
 from kitty.model import Template
@@ -63,6 +83,24 @@ def get_logger(opts):
     return logger
 
 
+def load_module(filename):
+    dirpath, filename = os.path.split(filename)
+    modulename = filename[:-3]
+    if dirpath in sys.path:
+        sys.path.remove(dirpath)
+    sys.path.insert(0, dirpath)
+    return __import__(modulename)
+
+
+def find_template(filename, name):
+    module = load_module(filename)
+    for member_name in dir(module):
+        attr = getattr(module, member_name)
+        if isinstance(attr, Template) and attr.get_name() == name:
+            return attr
+    raise Exception('Template %s not found in %s' % (name, filename))
+
+
 class FileIterator(object):
 
     def __init__(self, filename, handler, logger):
@@ -79,12 +117,7 @@ class FileIterator(object):
     def iterate(self):
         self.check_file()
         self.handler.start()
-        dirpath, filename = os.path.split(self.filename)
-        modulename = filename[:-3]
-        if dirpath in sys.path:
-            sys.path.remove(dirpath)
-        sys.path.insert(0, dirpath)
-        module = __import__(modulename)
+        module = load_module(self.filename)
         member_names = dir(module)
         for name in member_names:
             attr = getattr(module, name)
@@ -112,6 +145,9 @@ class Handler(object):
     def handle(self, template):
         pass
 
+    def finish(self):
+        pass
+
 
 def to_int(val, name):
     if val is None:
@@ -122,10 +158,116 @@ def to_int(val, name):
         raise Exception('%s should be a number' % name)
 
 
+#: maximal number of mutations that are passed on for storage at once
+GENERATE_CHUNK_SIZE = 1000
+
+
+def generate_chunks(template, start, end, settings, chunk_size=GENERATE_CHUNK_SIZE):
+    '''
+    Generate the mutations [start, end] of a template in a single pass,
+    the template skips to the first mutation only once
+
+    :param template: the template
+    :param start: index of the first mutation
+    :param end: index of the last mutation
+    :param settings: dictionary of the generation settings (see FileGeneratorHandler.get_settings)
+    :param chunk_size: maximal number of mutations in a chunk (default: GENERATE_CHUNK_SIZE)
+    :return: generator of tuples (list of (index, file name, payload, info), last field path),
+        one per chunk, payloads are returned only when they are stored in an archive,
+        otherwise they are written by the generator
+    '''
+    template.reset()
+    template.skip(start)
+    results = []
+    field_path = None
+    while template.mutate():
+        index = template._current_index
+        filename = settings['filename_format'] % {'template': template.get_name(), 'index': index}
+        if settings['shard_size']:
+            filename = os.path.join('%06d' % (index // settings['shard_size']), filename)
+        payload = template.render().tobytes()
+        info = template.get_info() if settings['metadata'] != 'none' else None
+        if info:
+            field_path = info.get('field', {}).get('path', field_path)
+        if settings['archive']:
+            results.append((index, filename, payload, info))
+        else:
+            path = os.path.join(settings['outdir'], filename)
+            dirname = os.path.dirname(path)
+            if not os.path.exists(dirname):
+                try:
+                    os.makedirs(dirname)
+                except OSError:
+                    # another worker created it
+                    pass
+            with open(path, 'wb') as f:
+                f.write(payload)
+            if settings['metadata'] == 'files':
+                with open(path + '.metadata', 'wb') as f:
+                    f.write(dumps(info, indent=4, sort_keys=True))
+            results.append((index, filename, None, info if settings['metadata'] == 'ndjson' else None))
+        if index >= end:
+            break
+        if len(results) >= chunk_size:
+            yield results, field_path
+            results = []
+    if results:
+        yield results, field_path
+
+
+def _generate_worker(filename, template_name, start, end, settings, queue):
+    '''
+    Generate a slice of the mutations in a worker process,
+    and pass the chunks to the parent process through the queue
+    '''
+    try:
+        for chunk in generate_chunks(find_template(filename, template_name), start, end, settings):
+            queue.put(('chunk', chunk))
+        queue.put(('done', None))
+    except Exception as ex:
+        queue.put(('error', '%s: %s' % (type(ex).__name__, ex)))
+
+
+class ArchiveWriter(object):
+    '''
+    Write the mutations to a tar or zip archive
+    '''
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        if fmt == 'tar':
+            self.archive = tarfile.open(path, 'w')
+        else:
+            self.archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True)
+
+    def write(self, filename, data):
+        if self.fmt == 'tar':
+            info = tarfile.TarInfo(filename)
+            info.size = len(data)
+            info.mtime = time.time()
+            self.archive.addfile(info, StringIO(data))
+        else:
+            self.archive.writestr(filename, data)
+
+    def write_file(self, filename, fileobj):
+        fileobj.seek(0)
+        if self.fmt == 'tar':
+            info = tarfile.TarInfo(filename)
+            info.size = os.fstat(fileobj.fileno()).st_size
+            info.mtime = time.time()
+            self.archive.addfile(info, fileobj)
+        else:
+            self.archive.writestr(filename, fileobj.read())
+
+    def close(self):
+        self.archive.close()
+
+
 class FileGeneratorHandler(Handler):
 
     def __init__(self, opts, logger):
         super(FileGeneratorHandler, self).__init__(opts, logger)
+        self.filename = opts['<FILE>']
         self.outdir = opts['--out'] or 'out'
         if opts['--skip'] is None:
             self.skip = '0'
@@ -133,6 +275,12 @@ class FileGeneratorHandler(Handler):
         self.count = to_int(opts['--count'], 'count')
         self.template_names = opts['<TEMPLATE>']
         self.filename_format = opts['--filename-format']
+        self.jobs = to_int(opts['--jobs'], 'jobs') or 1
+        self.metadata = opts['--metadata'] or 'files'
+        self.archive = opts['--archive']
+        self.shard_size = to_int(opts['--shard-size'], 'shard size')
+        self.writer = None
+        self.metadata_file = None
         try:
             self.filename_format % {
                 'template': 'hello',
@@ -140,11 +288,46 @@ class FileGeneratorHandler(Handler):
             }
         except:
             raise Exception('invalid filename template: %s' % (self.filename_format))
+        if self.metadata not in ['files', 'ndjson', 'none']:
+            raise Exception('invalid metadata mode: %s' % self.metadata)
+        if self.archive not in [None, 'tar', 'zip']:
+            raise Exception('invalid archive format: %s' % self.archive)
+
+    def get_settings(self):
+        return {
+            'outdir': self.outdir,
+            'filename_format': self.filename_format,
+            'metadata': self.metadata,
+            'archive': self.archive,
+            'shard_size': self.shard_size,
+        }
 
     def start(self):
         if os.path.exists(self.outdir):
-            raise Exception('cannot create directory %s, already exists' % self.outdir)
-        os.mkdir(self.outdir)
+            raise Exception('cannot create %s, already exists' % self.outdir)
+        if self.archive:
+            self.writer = ArchiveWriter(self.outdir, self.archive)
+            self.metadata_file = tempfile.TemporaryFile() if self.metadata == 'ndjson' else None
+        else:
+            self.writer = None
+            os.mkdir(self.outdir)
+            self.metadata_file = open(os.path.join(self.outdir, 'metadata.ndjson'), 'wb') if self.metadata == 'ndjson' else None
+
+    def finish(self):
+        '''
+        Close the output, also called when the generation failed,
+        so the archive is not left truncated
+        '''
+        try:
+            if self.writer:
+                if self.metadata_file:
+                    self.writer.write_file('metadata.ndjson', self.metadata_file)
+                self.writer.close()
+        finally:
+            self.writer = None
+            if self.metadata_file:
+                self.metadata_file.close()
+                self.metadata_file = None
 
     def handle(self, template):
         self.template = template
@@ -154,19 +337,64 @@ class FileGeneratorHandler(Handler):
             self._set_current_template_params(template)
             self.logger.info('Mutation range: %s-%s (total: %d)' % (self.skip, self.end_index, self.end_index - self.skip + 1))
             self._progress_init()
-            while template.mutate():
-                template_filename = self.filename_format % {'template': template_name, 'index': template._current_index}
-                self._store_template(template, template_filename)
-                metadata_filename = template_filename + '.metadata'
-                info = template.get_info()
-                self._store_metadata(info, metadata_filename)
-                self._progress_print(template._current_index, info)
-                if template._current_index >= self.end_index:
-                    break
+            settings = self.get_settings()
+            if self.jobs > 1:
+                self._generate_parallel(template_name, settings)
+            else:
+                for chunk in generate_chunks(template, self.skip, self.end_index, settings):
+                    self._store_results(*chunk)
             self._progress_finalize()
 
+    def _generate_parallel(self, template_name, settings):
+        '''
+        Generate the mutations in worker processes, each generates its own slice of the range
+        '''
+        slices = self._split_range(self.skip, self.end_index)
+        # bounded, so the workers do not get too far ahead of the storage
+        queue = multiprocessing.Queue(len(slices) * 2)
+        workers = []
+        for (start, end) in slices:
+            worker = multiprocessing.Process(target=_generate_worker, args=(self.filename, template_name, start, end, settings, queue))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+        running = len(workers)
+        try:
+            while running:
+                (kind, value) = queue.get()
+                if kind == 'chunk':
+                    self._store_results(*value)
+                elif kind == 'done':
+                    running -= 1
+                else:
+                    raise Exception('worker failed: %s' % value)
+        finally:
+            for worker in workers:
+                if running:
+                    # stopped on an error
+                    worker.terminate()
+                worker.join()
+
+    def _split_range(self, start, end):
+        '''
+        Split the mutation range to a contiguous slice per worker
+        '''
+        total = end - start + 1
+        slice_size = (total + self.jobs - 1) // self.jobs
+        return [(i, min(i + slice_size, end + 1) - 1) for i in range(start, end + 1, slice_size)]
+
+    def _store_results(self, results, field_path):
+        for (index, filename, payload, info) in results:
+            if self.writer:
+                self.writer.write(filename, payload)
+                if self.metadata == 'files':
+                    self.writer.write(filename + '.metadata', dumps(info, indent=4, sort_keys=True))
+            if self.metadata_file:
+                self.metadata_file.write(dumps({'index': index, 'file': filename, 'info': info}, sort_keys=True) + '\n')
+        self.done += len(results)
+        self._progress_print(field_path)
+
     def _set_current_template_params(self, template):
-        template.skip(self.skip)
         self.end_index = template.num_mutations() if not self.count else self.skip + self.count
         self.end_index = min(self.end_index, template.num_mutations()) - 1
         if self.end_index < 0:
@@ -174,31 +402,21 @@ class FileGeneratorHandler(Handler):
         if self.skip > template.num_mutations():
             raise Exception('No mutations to generate, you skipped over the entire template')
 
-    def _store_template(self, template, filename):
-        with open(os.path.join(self.outdir, filename), 'wb') as f:
-            f.write(template.render().tobytes())
-
-    def _store_metadata(self, info, filename):
-        with open(os.path.join(self.outdir, filename), 'wb') as f:
-            f.write(dumps(info, indent=4, sort_keys=True))
-
     def _progress_init(self):
-        self.total = (self.end_index - self.skip)
-        self.step = 100.0 / self.total
+        self.total = (self.end_index - self.skip + 1)
+        self.done = 0
         self.max_line_length = 0
 
-    def _progress_print(self, current_index, info):
-        tests_left = (self.end_index - current_index)
-        precent = int((self.total - tests_left) * self.step)
+    def _progress_print(self, field_path):
         out_line = ''
-        out_line += '\r%3d%%' % (precent)
-        out_line += ' %d/%d' % (current_index - self.skip + 1, self.end_index - self.skip + 1)
-        if 'field/path' in info:
-            out_line += ' %s' % (info['field/path'])
+        out_line += '\r%3d%%' % (self.done * 100 / self.total)
+        out_line += ' %d/%d' % (self.done, self.total)
+        if field_path:
+            out_line += ' %s' % (field_path)
         if len(out_line) > self.max_line_length:
-            max_line_length = len(out_line)
+            self.max_line_length = len(out_line)
         else:
-            out_line += ' ' * (max_line_length - len(out_line))
+            out_line += ' ' * (self.max_line_length - len(out_line))
         sys.stdout.write(out_line)
         sys.stdout.flush()
 
@@ -213,8 +431,49 @@ class ListHandler(Handler):
         self.logger.info('%-80s %s' % (template.get_name(), template.num_mutations()))
 
 
+class SessionAnalyzer(object):
+
+    def __init__(self, opts, logger):
+        self.opts = opts
+        self.logger = logger
+        self.filenames = opts['<SESSION>']
+        jobs = to_int(opts['--jobs'], 'jobs')
+        self.jobs = jobs if jobs else multiprocessing.cpu_count()
+        self.bucket_size = to_int(opts['--bucket'], 'bucket')
+        self.top = to_int(opts['--top'], 'top')
+        self.json = opts['--json']
+
+    def run(self):
+        from kitty.data.analytics import analyze_sessions
+        stats = analyze_sessions(self.filenames, jobs=self.jobs, bucket_size=self.bucket_size)
+        if self.json:
+            print(dumps(stats.to_dict(self.top), indent=4, sort_keys=True))
+        else:
+            self._print_stats(stats)
+
+    def _print_stats(self, stats):
+        from kitty.data.analytics import AGGREGATIONS
+        self.logger.info('Reports: %d (%s)' % (stats.reports, ', '.join('%s: %d' % item for item in sorted(stats.statuses.items()))))
+        for name in AGGREGATIONS:
+            self.logger.info('')
+            self.logger.info('Failures per %s:' % name)
+            for (key, count) in stats.get_top(name, self.top):
+                self.logger.info('    %8d  %s' % (count, key))
+        for filename in self.filenames:
+            self.logger.info('')
+            self.logger.info('Throughput of %s:' % filename)
+            for (bucket, reports, failures, rate) in stats.get_throughput(filename):
+                bucket_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(bucket))
+                self.logger.info('    %s  %10.2f tests/sec  %8d reports  %8d failures' % (bucket_time, rate, reports, failures))
+
+
 def _main():
-    opts = docopt.docopt(__doc__, version=get_distribution('kittyfuzzer').version)
+    opts = docopt.docopt(__doc__)
+    if opts['--version']:
+        # pkg_resources takes long to import, so it is imported only to print the version
+        from pkg_resources import get_distribution
+        print(get_distribution('kittyfuzzer').version)
+        return
     logger = get_logger(opts)
     try:
         if opts['generate'] or opts['list']:
@@ -223,7 +482,12 @@ def _main():
             elif opts['list']:
                 handler = ListHandler(opts, logger)
             file_iter = FileIterator(opts['<FILE>'], handler, logger)
-            file_iter.iterate()
+            try:
+                file_iter.iterate()
+            finally:
+                handler.finish()
+        elif opts['analyze']:
+            SessionAnalyzer(opts, logger).run()
     except Exception as ex:
         logger.error('Error: %s' % ex)
         sys.exit(1)
@@ -18,21 +18,32 @@
 '''
 Usage:
     kitty_web_client.py (info [-v]|pause|resume) [--host <hostname>] [--port <port>]
-    kitty_web_client.py reports store <folder> [--host <hostname>] [--port <port>]
+    kitty_web_client.py reports store <folder> [options]
+    kitty_web_client.py reports export <export_file> [--format <format>] [options]
     kitty_web_client.py reports show <file> ...
 
-Retrieve and parse kitty status and reports from a kitty web server
+Retrieve and parse kitty status and reports from a kitty web server,
+or directly from a session file (--session).
+
+Reports are stored/exported as a stream, an interrupted store or ndjson export
+is resumed when the same command is executed again.
 
 Options:
     -v --verbose            verbose information
     -h --host <hostname>    kitty web server host [default: localhost]
     -p --port <port>        kitty web server port [default: 26000]
+    -s --session <file>     read the reports from a session file instead of a web server
+    --status <status>       only reports with this status (passed, failed or error)
+    --start <id>            only reports of tests with this id or higher
+    --end <id>              only reports of tests with this id or lower
+    -f --format <format>    export format (ndjson or tar) [default: ndjson]
 '''
 import requests
 import os
 import docopt
 import json
 import types
+from kitty.data.export import SessionReader, iter_reports, report_to_json, export_reports, get_ndjson_cursor
 
 
 class KittyWebClientApi(object):
@@ -53,11 +64,45 @@ class KittyWebClientApi(object):
         assert(resp.status_code == 200)
         return resp.json()
 
+    def get_report_page(self, after=None, status=None):
+        '''
+        Get a page of the report list
+
+        :param after: cursor returned with the previous page (default: None)
+        :param status: get only reports with this status (default: None)
+        :return: tuple (list of [report id, status, reason], cursor for the next page)
+        '''
+        params = {}
+        if after is not None:
+            params['after'] = after
+        if status is not None:
+            params['status'] = status
+        resp = requests.get('%s/api/reports.json' % self.url, params=params)
+        assert(resp.status_code == 200)
+        page = resp.json()
+        if 'error' in page:
+            raise Exception(page['error'])
+        return (page['reports'], page['next'])
+
+    def iter_report_list(self, status=None):
+        '''
+        Iterate over the report list, page by page
+
+        :param status: get only reports with this status (default: None)
+        '''
+        after = None
+        while True:
+            reports, after = self.get_report_page(after, status)
+            if not reports:
+                break
+            for report in reports:
+                yield report
+
     def get_report_list(self):
         '''
         Get list of report ids
         '''
-        return self.get_stats()['reports_extended']
+        return list(self.iter_report_list())
 
     def get_reports(self, report_ids):
         '''
@@ -75,6 +120,40 @@ class KittyWebClientApi(object):
                 res[rid] = resp.text
         return res
 
+    def export(self, fmt='ndjson', after=None, status=None, start=None, end=None):
+        '''
+        Start a bulk export of the reports
+
+        :param fmt: export format - 'ndjson' or 'tar' (default: 'ndjson')
+        :param after: cursor to resume after (default: None)
+        :param status: export only reports with this status (default: None)
+        :param start: export only reports of tests with this id or higher (default: None)
+        :param end: export only reports of tests with this id or lower (default: None)
+        :return: streamed response
+        '''
+        params = {'format': fmt}
+        for (k, v) in [('after', after), ('status', status), ('start', start), ('end', end)]:
+            if v is not None:
+                params[k] = v
+        resp = requests.get('%s/api/export' % self.url, params=params, stream=True)
+        assert(resp.status_code == 200)
+        if resp.headers.get('content-type') == 'text/json':
+            raise Exception(resp.json()['error'])
+        return resp
+
+    def iter_reports(self, after=None, status=None, start=None, end=None):
+        '''
+        Iterate over the reports, as they are streamed from the server
+
+        :return: generator of tuples (cursor, test id, report json)
+        '''
+        resp = self.export('ndjson', after, status, start, end)
+        for line in resp.iter_lines(chunk_size=0x10000):
+            if line:
+                entry = json.loads(line)
+                report = json.dumps({'encoding': entry['encoding'], 'report': entry['report']})
+                yield (entry['cursor'], entry['test_id'], report)
+
     def pause(self):
         requests.get('%s/api/action/pause' % (self.url))
 
@@ -82,16 +161,71 @@ class KittyWebClientApi(object):
         requests.get('%s/api/action/resume' % (self.url))
 
 
+def _get_filters(options):
+    return {
+        'status': options['--status'],
+        'start': int(options['--start']) if options['--start'] else None,
+        'end': int(options['--end']) if options['--end'] else None,
+    }
+
+
+def _iter_reports(options, web, after):
+    if options['--session']:
+        reader = SessionReader(options['--session'])
+        try:
+            for (cursor, test_id, report) in iter_reports(reader, after, **_get_filters(options)):
+                yield (cursor, test_id, report_to_json(report))
+        finally:
+            reader.close()
+    else:
+        for entry in web.iter_reports(after, **_get_filters(options)):
+            yield entry
+
+
 def cmd_report_store(options, web):
     folder = options['<folder>']
     folder = './%s' % folder
     if not os.path.exists(folder):
         os.mkdir(folder)
-    ids = [x[0] for x in web.get_report_list()]
-    reports = web.get_reports(ids)
-    for (rid, report) in reports.items():
+    cursor_file = os.path.join(folder, '.cursor')
+    after = None
+    if os.path.exists(cursor_file):
+        with open(cursor_file, 'r') as f:
+            after = int(f.read())
+        print('Resuming after cursor %d' % after)
+    count = 0
+    for (cursor, rid, report) in _iter_reports(options, web, after):
         with open('%s/report_%d.json' % (folder, rid), 'w') as f:
             f.write(report)
+        with open(cursor_file, 'w') as f:
+            f.write('%d' % cursor)
+        count += 1
+    print('Stored %d reports' % count)
+
+
+def cmd_report_export(options, web):
+    filename = options['<export_file>']
+    fmt = options['--format']
+    after = None
+    if fmt == 'ndjson':
+        after = get_ndjson_cursor(filename)
+        mode = 'ab'
+        if after is not None:
+            print('Resuming after cursor %d' % after)
+    else:
+        mode = 'wb'
+    with open(filename, mode) as f:
+        if options['--session']:
+            reader = SessionReader(options['--session'])
+            try:
+                count = export_reports(reader, f, fmt, after, **_get_filters(options))
+            finally:
+                reader.close()
+            print('Exported %d reports' % count)
+        else:
+            resp = web.export(fmt, after, **_get_filters(options))
+            for chunk in resp.iter_content(chunk_size=0x10000):
+                f.write(chunk)
 
 
 def cmd_report_show(options):
@@ -190,11 +324,16 @@ def cmd_info(options, web):
         # pad = ' ' * (max_len - len(k))
         # print('%s:%s %s' % (k, pad, v))
 
+    print('')
+    print('--- Report counts ---')
+    for k, v in sorted(resp.get('report_counts', {}).items()):
+        print('%s: %s' % (k, v))
+
     if options['--verbose']:
-        reports = resp['reports_extended']
         print('')
         print('--- Report list ---')
-        print('\n'.join('%-10s %-10s %s' % tuple(report) for report in reports))
+        for report in web.iter_report_list():
+            print('%-10s %-10s %s' % tuple(report))
 
 
 def _main():
@@ -203,6 +342,8 @@ def _main():
     if options['reports']:
         if options['store']:
             cmd_report_store(options, web)
+        elif options['export']:
+            cmd_report_export(options, web)
         elif options['show']:
             cmd_report_show(options)
     elif options['info']:
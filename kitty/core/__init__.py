@@ -19,6 +19,8 @@
 The classes in this module has very little to do with the fuzzing process,
 however, those classes and functions are used all over kitty.
 '''
+import hashlib
+import struct
 from kitty.core.kitty_object import KittyObject
 from kitty.core.threading_utils import FuncThread, LoopFuncThread
 
@@ -37,3 +39,19 @@ def khash(*args):
     '''
     ksum = sum([hash(arg if arg is not None else -13371337) for arg in args])
     return hash(str(ksum))
+
+
+def kseed(*args):
+    '''
+    Derive a 64 bit RNG seed from the arguments.
+    Unlike khash, the derived seed does not depend on the order-insensitive sum of the hashes,
+    so (seed, index) pairs result in unrelated seeds, and it is stable accross runs and processes.
+
+    :example:
+
+        ::
+
+            r = random.Random(kseed(seed, index))
+    '''
+    digest = hashlib.sha1('|'.join('%s' % (arg,) for arg in args)).digest()
+    return struct.unpack('<Q', digest[:8])[0]
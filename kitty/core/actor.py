@@ -19,6 +19,7 @@ This module contains :class:`~kitty.core.actor.KittyActorInterface`
 which is the base class for both monitors and controllers.
 '''
 import time
+import threading
 from kitty.core.kitty_object import KittyObject
 from kitty.data.report import Report
 
@@ -34,8 +35,17 @@ class KittyActorInterface(KittyObject):
     - :func:`~kitty.core.actor.KittyActorInterface.post_test`
     - :func:`~kitty.core.actor.KittyActorInterface.is_victim_alive`
     - :func:`~kitty.core.actor.KittyActorInterface.get_report`
+
+    If the actor can tell when the victim becomes alive (e.g. a controller that restarts the victim
+    and gets notified when it is ready), it should call
+    :func:`~kitty.core.actor.KittyActorInterface.signal_victim_alive`,
+    which wakes up pre_test immediately, instead of waiting for the next poll of is_victim_alive.
     '''
 
+    #: delay (in seconds) before the first poll of is_victim_alive in pre_test,
+    #: it is doubled after each poll, up to victim_alive_check_delay
+    initial_victim_alive_check_delay = 0.01
+
     def __init__(self, name, logger=None, victim_alive_check_delay=0.3):
         '''
         :param name: name of the actor
@@ -46,6 +56,9 @@ class KittyActorInterface(KittyObject):
         self.victim_alive_check_delay = victim_alive_check_delay
         self.report = None
         self.test_number = 0
+        #: time (in seconds) the last pre_test waited for the victim to be alive
+        self.victim_alive_wait = 0
+        self._victim_alive_event = threading.Event()
 
     def setup(self):
         '''
@@ -72,14 +85,42 @@ class KittyActorInterface(KittyObject):
         self.report.add('start_time', time.time())
         self.report.add('test_number', self.test_number)
         self.report.add('state', 'pre_test')
-        last_log = 0
-        while not self.is_victim_alive():
+        self.victim_alive_wait = self._wait_for_victim()
+        self.report.add('victim_alive_wait', self.victim_alive_wait)
+
+    def _wait_for_victim(self):
+        '''
+        Wait until the victim is alive, either by a call to signal_victim_alive,
+        or by polling is_victim_alive with exponential backoff.
+
+        :return: wait time (in seconds)
+        '''
+        self._victim_alive_event.clear()
+        start = time.time()
+        if self.is_victim_alive():
+            return 0
+        self.logger.warn('waiting for target to be alive')
+        delay = min(self.initial_victim_alive_check_delay, self.victim_alive_check_delay)
+        last_log = start
+        while True:
+            self._victim_alive_event.wait(delay)
+            if self._victim_alive_event.is_set() or self.is_victim_alive():
+                break
             if time.time() - last_log >= 10:
                 last_log = time.time()
                 self.logger.warn('waiting for target to be alive')
-            time.sleep(self.victim_alive_check_delay)
-        if last_log > 0:  # only if we logged that we're waiting, should we log that we're now alive
-            self.logger.warn('target is now alive')
+            delay = min(delay * 2, self.victim_alive_check_delay)
+        waited = time.time() - start
+        self.logger.warn('target is now alive (waited %.3f seconds)' % waited)
+        return waited
+
+    def signal_victim_alive(self):
+        '''
+        Signal that the victim is alive.
+        It may be called from any thread (e.g. from a callback of the process that runs the victim).
+        If pre_test is waiting for the victim, it will return immediately.
+        '''
+        self._victim_alive_event.set()
 
     def post_test(self):
         '''
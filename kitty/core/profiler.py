@@ -0,0 +1,168 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Sampling profiler for a running fuzzing session.
+
+While it runs, the profiler periodically samples the stacks of all the threads
+of the process (the fuzzer, the data manager, the monitors etc.),
+without tracing or otherwise slowing them down.
+When it is done, it writes the samples in the collapsed stack format,
+one line per distinct stack: the thread name and the frames (outermost first),
+separated by ``;``, followed by the number of samples.
+This format can be converted to a flame graph by
+`flamegraph.pl <https://github.com/brendangregg/FlameGraph>`_ or loaded by
+`speedscope <https://www.speedscope.app>`_.
+
+The fuzzers start the profiler on SIGUSR1 or from the web interface,
+see :func:`~kitty.fuzzers.base.BaseFuzzer.start_profiling`.
+
+:example:
+
+    ::
+
+        profiler = SamplingProfiler('fuzz_session.sqlite')
+        filename = profiler.start(duration=30)
+'''
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from kitty.core.kitty_object import KittyObject
+
+
+def _collapse_stack(thread_name, frame):
+    '''
+    :param thread_name: name of the thread the stack belongs to
+    :param frame: innermost frame of the stack
+    :return: the stack in the collapsed format (without the count)
+    '''
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), frame.f_lineno))
+        frame = frame.f_back
+    frames.append(thread_name.replace(' ', '_'))
+    return ';'.join(reversed(frames))
+
+
+class SamplingProfiler(KittyObject):
+    '''
+    Samples the stacks of the threads of the process for a limited time,
+    in a dedicated thread, and writes them to a collapsed stack file.
+    '''
+
+    def __init__(self, file_prefix='kitty', interval=0.005, logger=None):
+        '''
+        :param file_prefix: prefix of the profile files (default: 'kitty')
+        :param interval: time (in seconds) between two samples (default: 0.005)
+        :param logger: logger for the profiler (default: None)
+        '''
+        super(SamplingProfiler, self).__init__('SamplingProfiler', logger)
+        self.file_prefix = file_prefix
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._filename = None
+        self._end_time = None
+        self._samples = 0
+        self.last_filename = None
+
+    def get_filename(self):
+        '''
+        :return: name for a new profile file
+        '''
+        return '%s.profile-%s.folded' % (self.file_prefix, time.strftime('%Y%m%d-%H%M%S'))
+
+    def is_running(self):
+        '''
+        :return: True if the profiler is sampling
+        '''
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def start(self, duration=30, filename=None):
+        '''
+        Start sampling (in a new thread)
+
+        :param duration: sampling duration, in seconds (default: 30)
+        :param filename: profile file name, None to generate it from the prefix (default: None)
+        :return: name of the profile file, None if the profiler is already running
+        '''
+        with self._lock:
+            if self.is_running():
+                self.logger.warning('profiler is already running, writing to %s', self._filename)
+                return None
+            self._filename = filename if filename else self.get_filename()
+            self._end_time = time.time() + duration
+            self._samples = 0
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='SamplingProfiler')
+            self._thread.daemon = True
+            self._thread.start()
+            self.logger.info('profiling for %s seconds, the profile will be written to %s', duration, self._filename)
+            return self._filename
+
+    def stop(self):
+        '''
+        Stop sampling before the end of the duration, the profile is written anyway
+        '''
+        thread = self._thread
+        if thread is not None:
+            self._stop_event.set()
+            thread.join()
+
+    def get_status(self):
+        '''
+        :return: dictionary with the status of the profiler
+        '''
+        running = self.is_running()
+        return {
+            'running': running,
+            'filename': self._filename if running else None,
+            'remaining': max(0, self._end_time - time.time()) if running else 0,
+            'samples': self._samples,
+            'last_filename': self.last_filename,
+        }
+
+    def _sample(self, stacks):
+        own_ident = threading.current_thread().ident
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for (ident, frame) in sys._current_frames().items():
+            if ident != own_ident:
+                stacks[_collapse_stack(names.get(ident, 'Thread-%s' % ident), frame)] += 1
+        self._samples += 1
+
+    def _run(self):
+        stacks = Counter()
+        try:
+            while not self._stop_event.is_set() and time.time() < self._end_time:
+                self._sample(stacks)
+                time.sleep(self.interval)
+        finally:
+            self._write(stacks)
+
+    def _write(self, stacks):
+        try:
+            with open(self._filename, 'wb') as f:
+                for (stack, count) in sorted(stacks.items()):
+                    f.write('%s %d\n' % (stack, count))
+            self.last_filename = self._filename
+            self.logger.info('profile (%d samples) was written to %s', self._samples, self._filename)
+        except IOError as ex:
+            self.logger.error('failed to write the profile to %s: %s', self._filename, ex)
@@ -0,0 +1,249 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+This module provides offline analysis of finished fuzzing sessions.
+The session files are opened read-only, and their reports are decoded in
+parallel by multiple processes, each of them handles a range of reports.
+
+Only the few values that are needed for the analysis are read from each report,
+the reports are not converted to :class:`~kitty.data.report.Report` objects
+and their large values (payloads, responses) are not read at all.
+
+:example:
+
+    ::
+
+        stats = analyze_sessions(['session1.sqlite', 'session2.sqlite'], jobs=4)
+        print(stats.failures['field'].most_common(10))
+'''
+import multiprocessing
+from collections import Counter
+from kitty.data.report import Report
+from kitty.data.export import SessionReader
+
+#: keys of the 'Data Model' sub-report that are used for the aggregation
+_FIELD_PATH_KEY = 'node/field/path'
+_FIELD_TYPE_KEY = 'node/field/field_type'
+_TEMPLATE_KEY = 'node/name'
+
+#: aggregations of the failures
+AGGREGATIONS = ['field', 'category', 'template', 'reason']
+
+
+class SessionStats(object):
+    '''
+    Aggregated statistics of the reports of one or more sessions.
+    Partial statistics (e.g. of different ranges of reports) are combined with :func:`merge`.
+    '''
+
+    def __init__(self, bucket_size=60):
+        '''
+        :param bucket_size: length (in seconds) of a time series bucket (default: 60)
+        '''
+        self.bucket_size = bucket_size
+        self.reports = 0
+        self.statuses = Counter()
+        self.failures = {name: Counter() for name in AGGREGATIONS}
+        #: time series per session: {session: {bucket start: [reports, failures, first test, last test]}}
+        self.series = {}
+
+    def add(self, session, summary):
+        '''
+        :param session: name of the session the report belongs to
+        :param summary: report summary (see :func:`summarize_report`)
+        '''
+        self.reports += 1
+        self.statuses[summary['status']] += 1
+        failed = summary['status'] != Report.PASSED
+        if failed:
+            for name in AGGREGATIONS:
+                self.failures[name][summary[name]] += 1
+        if summary['time'] is not None:
+            bucket = int(summary['time'] // self.bucket_size) * self.bucket_size
+            buckets = self.series.setdefault(session, {})
+            test_id = summary['test_id']
+            if bucket not in buckets:
+                buckets[bucket] = [0, 0, test_id, test_id]
+            entry = buckets[bucket]
+            entry[0] += 1
+            entry[1] += 1 if failed else 0
+            entry[2] = min(entry[2], test_id)
+            entry[3] = max(entry[3], test_id)
+
+    def merge(self, other):
+        '''
+        Add the statistics of another object to this one
+
+        :type other: SessionStats
+        :param other: statistics to merge
+        :return: self
+        '''
+        self.reports += other.reports
+        self.statuses.update(other.statuses)
+        for name in AGGREGATIONS:
+            self.failures[name].update(other.failures[name])
+        for (session, buckets) in other.series.items():
+            mine = self.series.setdefault(session, {})
+            for (bucket, entry) in buckets.items():
+                if bucket not in mine:
+                    mine[bucket] = list(entry)
+                else:
+                    current = mine[bucket]
+                    current[0] += entry[0]
+                    current[1] += entry[1]
+                    current[2] = min(current[2], entry[2])
+                    current[3] = max(current[3], entry[3])
+        return self
+
+    def get_throughput(self, session):
+        '''
+        Time series of the throughput of a session.
+        The number of tests in each bucket is estimated from the test numbers of the reports,
+        so it is accurate only if all reports were stored, or failures are frequent.
+
+        :param session: name of the session
+        :return: list of tuples [(bucket start time, reports, failures, tests per second) ..]
+        '''
+        res = []
+        last_test = None
+        for bucket in sorted(self.series.get(session, {})):
+            (reports, failures, first, last) = self.series[session][bucket]
+            tests = last - (first - 1 if last_test is None else last_test)
+            last_test = last
+            res.append((bucket, reports, failures, float(tests) / self.bucket_size))
+        return res
+
+    def get_top(self, name, top=None):
+        '''
+        :param name: name of the aggregation (one of :data:`AGGREGATIONS`)
+        :param top: number of entries to return (default: None, all entries)
+        :return: list of tuples [(key, failures) ..], sorted by the number of failures,
+            entries with the same number of failures are sorted by their key
+        '''
+        entries = sorted(self.failures[name].items(), key=lambda item: (-item[1], item[0]))
+        return entries[:top] if top is not None else entries
+
+    def to_dict(self, top=None):
+        '''
+        :param top: include only the top N entries of each aggregation (default: None, all entries)
+        :return: dictionary representation of the statistics
+        '''
+        return {
+            'reports': self.reports,
+            'statuses': dict(self.statuses),
+            'failures': {name: self.get_top(name, top) for name in AGGREGATIONS},
+            'throughput': {session: self.get_throughput(session) for session in self.series},
+        }
+
+
+def summarize_report(reports, test_id, status, reason, report_d, encoding):
+    '''
+    Extract the values that are needed for the analysis from a stored report
+
+    :type reports: :class:`~kitty.data.data_manager.ReportsTable`
+    :param reports: the table the report was read from
+    :param test_id: test number of the report
+    :param status: status of the report
+    :param reason: failure reason
+    :param report_d: the report dictionary, as returned by ``ReportsTable.get_report_dicts``
+    :param encoding: encoding of the strings in the report dictionary
+    :return: dictionary with the keys: test_id, status, reason, time, field, category, template
+    '''
+    def get(d, key, default=None):
+        if d is None or key not in d:
+            return default
+        return reports.resolve_value(d[key], encoding)
+
+    data_model = report_d.get('Data Model')
+    field_type = get(data_model, _FIELD_TYPE_KEY, '<unknown>')
+    description = get(data_model, 'node/field/mutation/description')
+    return {
+        'test_id': test_id,
+        'status': status,
+        'reason': reason or '<no reason>',
+        'time': get(report_d, 'report_time'),
+        'field': get(data_model, _FIELD_PATH_KEY, '<unknown>'),
+        'category': '%s: %s' % (field_type, description) if description else field_type,
+        'template': get(data_model, _TEMPLATE_KEY, '<unknown>'),
+    }
+
+
+def _analyze_range(args):
+    '''
+    Analyze a range of reports of a session file (executed in a worker process)
+
+    :param args: tuple (filename, cursor to start after, number of reports, bucket size)
+    :return: SessionStats of the range
+    '''
+    (filename, after, limit, bucket_size) = args
+    reader = SessionReader(filename)
+    try:
+        stats = SessionStats(bucket_size)
+        reports = reader.reports
+        for entry in reports.get_report_dicts(after, limit):
+            stats.add(filename, summarize_report(reports, *entry[1:]))
+        return stats
+    finally:
+        reader.close()
+
+
+def _get_ranges(filename, chunk_size):
+    '''
+    :return: list of tuples (cursor to start after, number of reports) that cover a session file
+    '''
+    reader = SessionReader(filename)
+    try:
+        ranges = []
+        after = None
+        while True:
+            (page, cursor) = reader.get_report_page(after, chunk_size)
+            if not page:
+                return ranges
+            ranges.append((after, len(page)))
+            after = cursor
+    finally:
+        reader.close()
+
+
+def analyze_sessions(filenames, jobs=1, chunk_size=1000, bucket_size=60):
+    '''
+    Analyze the reports of one or more session files
+
+    :param filenames: list of session files
+    :param jobs: number of worker processes, 1 to analyze in the current process (default: 1)
+    :param chunk_size: number of reports that are handled by a worker at once (default: 1000)
+    :param bucket_size: length (in seconds) of a time series bucket (default: 60)
+    :rtype: :class:`~kitty.data.analytics.SessionStats`
+    :return: aggregated statistics of all sessions
+    '''
+    tasks = []
+    for filename in filenames:
+        for (after, limit) in _get_ranges(filename, chunk_size):
+            tasks.append((filename, after, limit, bucket_size))
+    stats = SessionStats(bucket_size)
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        try:
+            for partial in pool.imap_unordered(_analyze_range, tasks):
+                stats.merge(partial)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for task in tasks:
+            stats.merge(_analyze_range(task))
+    return stats
@@ -21,6 +21,7 @@ interface, and persistent storage of the fuzzing session results.
 '''
 import sqlite3
 import cPickle
+import hashlib
 import zlib
 import traceback
 from kitty.core import KittyObject
@@ -118,7 +119,7 @@ class DataManager(Thread):
         '''
         :param dbname: database name for storing the data
         '''
-        super(DataManager, self).__init__()
+        super(DataManager, self).__init__(name='DataManager')
         self._queue = Queue()
         self._dbname = dbname
         self._connection = None
@@ -155,7 +156,7 @@ class DataManager(Thread):
         self._connection = sqlite3.connect(self._dbname)
         self._cursor = self._connection.cursor()
         self._session_info = SessionInfoTable(self._connection, self._cursor)
-        self._reports = ReportsTable(self._connection, self._cursor)
+        self._reports = ReportsTable(self._connection, self._cursor, BlobsTable(self._connection, self._cursor))
 
     def close(self):
         '''
@@ -208,6 +209,55 @@ class DataManager(Thread):
         '''
         return self._reports.get_report_list()
 
+    @synced
+    def get_report_page(self, after=None, limit=None, status=None):
+        '''
+        Get a page of the report list, in the order the reports were stored.
+
+        :param after: cursor returned with the previous page, None for the first page (default: None)
+        :param limit: maximal number of reports in the page, None for no limit (default: None)
+        :param status: return only reports with this status, None for all reports (default: None)
+        :return: tuple (list of tuples [(report id, status, reason) ..], cursor for the next page)
+        '''
+        return self._reports.get_report_page(after, limit, status)
+
+    @synced
+    def get_reports(self, after=None, limit=None, status=None, start=None, end=None):
+        '''
+        Get a page of reports (with their content), in the order they were stored.
+
+        :param after: cursor returned with the previous page, None for the first page (default: None)
+        :param limit: maximal number of reports in the page, None for no limit (default: None)
+        :param status: return only reports with this status, None for all reports (default: None)
+        :param start: return only reports of tests with this id or higher (default: None)
+        :param end: return only reports of tests with this id or lower (default: None)
+        :return: list of tuples [(cursor, test id, Report) ..]
+        '''
+        return self._reports.get_reports(after, limit, status, start, end)
+
+    @synced
+    def get_report_count(self, status=None):
+        '''
+        :param status: count only reports with this status, None for all reports (default: None)
+        :return: number of stored reports
+        '''
+        return self._reports.count(status)
+
+    @synced
+    def get_report_status_counts(self):
+        '''
+        :return: dictionary of status/number of stored reports with this status
+        '''
+        return self._reports.get_status_counts()
+
+    @synced
+    def get_report_summary(self):
+        '''
+        :return: tuple (dictionary of status/number of stored reports,
+            cursor of the last stored report)
+        '''
+        return (self._reports.get_status_counts(), self._reports.get_last_cursor())
+
     @synced
     def get_report_by_id(self, report_id):
         '''
@@ -249,6 +299,16 @@ class DataManager(Thread):
         '''
         return self._volatile_data.get(key, None)
 
+    @synced
+    def get_values(self, keys):
+        '''
+        get multiple arbitrary data entries from volatile memory, in a single task
+
+        :param keys: keys of the data
+        :return: dictionary of key/data
+        '''
+        return {key: self._volatile_data.get(key, None) for key in keys}
+
 
 class Table(object):
     '''
@@ -257,17 +317,20 @@ class Table(object):
 
     __TABLE_FIELDS__ = []
     __TABLE_NAME__ = None
+    __TABLE_INDICES__ = []
 
-    def __init__(self, connection, cursor):
+    def __init__(self, connection, cursor, create=True):
         '''
         :param connection: the database connection
         :param cursor: the cursor for the database
+        :param create: create the table if it does not exist (default: True)
         '''
         self._connection = connection
         self._cursor = cursor
         self._name = type(self).__TABLE_NAME__
         self._fields = type(self).__TABLE_FIELDS__
-        self._create_table()
+        if create:
+            self._create_table()
 
     def _create_table(self):
         '''
@@ -279,6 +342,15 @@ class Table(object):
             'name': self._name,
             'fields': ','.join('%s %s' % (k, v) for (k, v) in self._fields)
         })
+        # fields that were added after the table was created (by an older version) are added to it
+        existing = set(row[1] for row in self._cursor.execute('PRAGMA table_info(%s)' % self._name).fetchall())
+        for (k, v) in self._fields:
+            if k not in existing:
+                self._cursor.execute('ALTER TABLE %s ADD COLUMN %s %s' % (self._name, k, v))
+        for field in type(self).__TABLE_INDICES__:
+            self._cursor.execute('''
+                CREATE INDEX IF NOT EXISTS %(name)s_%(field)s ON %(name)s ( %(field)s )
+            ''' % {'name': self._name, 'field': field})
         self._connection.commit()
 
     def select(self, to_select, where=None, sql_params=None):
@@ -349,9 +421,69 @@ class Table(object):
         return self._cursor.lastrowid
 
 
+class BlobsTable(Table):
+    '''
+    Content-addressed storage for large values of the reports
+    (payloads, responses, etc.).
+    Each blob is stored once, compressed, under the sha1 of its content,
+    so identical values of different reports share the same entry.
+    '''
+
+    __TABLE_NAME__ = 'blobs'
+    __TABLE_FIELDS__ = [
+        ('hash', 'TEXT PRIMARY KEY'),
+        ('content', 'BLOB'),
+    ]
+
+    def put(self, data):
+        '''
+        Store a blob, if it is not stored already.
+        The change is not committed, it is committed with the report that references it.
+
+        :param data: the blob (str)
+        :return: hash of the blob
+        '''
+        blob_hash = hashlib.sha1(data).hexdigest()
+        self._cursor.execute(
+            'INSERT OR IGNORE INTO %s (hash, content) VALUES (?, ?)' % self._name,
+            (blob_hash, sqlite3.Binary(zlib.compress(data)))
+        )
+        return blob_hash
+
+    def get(self, blob_hash):
+        '''
+        :param blob_hash: hash of the blob
+        :return: the blob (str)
+        '''
+        self.select('content', 'hash=?', [blob_hash])
+        row = self._cursor.fetchone()
+        if not row:
+            raise KeyError('No blob with hash %s in the DB' % blob_hash)
+        return zlib.decompress(row[0])
+
+
+class _BlobRef(object):
+    '''
+    Placeholder for a report value that is stored in the blobs table
+    '''
+
+    __slots__ = ['blob_hash']
+
+    def __init__(self, blob_hash):
+        self.blob_hash = blob_hash
+
+    def __getstate__(self):
+        return self.blob_hash
+
+    def __setstate__(self, state):
+        self.blob_hash = state
+
+
 class ReportsTable(Table):
     '''
-    Table for storing the reports
+    Table for storing the reports.
+    String values that are larger than ``blob_threshold`` are stored in the
+    :class:`~kitty.data.data_manager.BlobsTable`, and the report references them by hash.
     '''
 
     __TABLE_NAME__ = 'reports'
@@ -362,13 +494,21 @@ class ReportsTable(Table):
         ('status', 'BLOB'),
         ('reason', 'BLOB'),
     ]
+    __TABLE_INDICES__ = ['test_id', 'status']
 
-    def __init__(self, connection, cursor):
+    #: minimal size of a string value to be stored as a blob
+    blob_threshold = 64
+
+    def __init__(self, connection, cursor, blobs=None, create=True):
         '''
         :param connection: the database connection
         :param cursor: the cursor for the database
+        :type blobs: :class:`~kitty.data.data_manager.BlobsTable`
+        :param blobs: table for the large values of the reports (default: None, create one)
+        :param create: create the tables if they do not exist (default: True)
         '''
-        super(ReportsTable, self).__init__(connection, cursor)
+        super(ReportsTable, self).__init__(connection, cursor, create)
+        self._blobs = blobs if blobs is not None else BlobsTable(connection, cursor, create)
 
     def store(self, report, test_id):
         '''
@@ -376,7 +516,7 @@ class ReportsTable(Table):
         :param test_id: the id of the test reported
         :return: report id
         '''
-        report_d = report.to_dict()
+        report_d = self._extract_blobs(report.to_dict(encoding=None))
         content = self._serialize_dict(report_d)
         report_id = self.insert(
             ['test_id', 'content', 'status', 'reason'],
@@ -397,7 +537,49 @@ class ReportsTable(Table):
             raise KeyError('No report with test id %s in the DB' % test_id)
 
         values = self.row_to_dict(row)
-        content = self._deserialize_dict(values['content'])
+        return self._load_report(values['content'])
+
+    def get_report_dicts(self, after=None, limit=None):
+        '''
+        Get a page of reports as stored, without constructing Report objects
+        and without reading their large values (see :func:`resolve_value`).
+        This is much faster than :func:`get_reports` when only some of the values are needed.
+
+        :param after: cursor returned with the previous page, None for the first page (default: None)
+        :param limit: maximal number of reports in the page, None for no limit (default: None)
+        :return: list of tuples [(cursor, test id, status, reason, report dictionary,
+            encoding of the strings in the dictionary) ..]
+        '''
+        res = []
+        for (cursor, test_id, status, reason, content) in self._select_page('test_id, status, reason, content', after, limit, None):
+            if isinstance(content, buffer):
+                res.append((cursor, test_id, status, reason, self._deserialize_dict(content), None))
+            else:
+                res.append((cursor, test_id, status, reason, self._deserialize_legacy_dict(content), 'base64'))
+        return res
+
+    def resolve_value(self, value, encoding):
+        '''
+        :param value: a value from a dictionary returned by :func:`get_report_dicts`
+        :param encoding: encoding of the strings in the dictionary
+        :return: the actual value
+        '''
+        if isinstance(value, _BlobRef):
+            return self._blobs.get(value.blob_hash)
+        if isinstance(value, basestring) and encoding:
+            return value.decode(encoding)
+        return value
+
+    def _load_report(self, content):
+        '''
+        :param content: content of a report, as stored
+        :return: Report object
+        '''
+        if isinstance(content, buffer):
+            content = self._resolve_blobs(self._deserialize_dict(content))
+            return Report.from_dict(content, encoding=None)
+        # reports that were stored by older versions of kitty
+        content = self._deserialize_legacy_dict(content)
         return Report.from_dict(content)
 
     def get_report_test_ids(self):
@@ -420,6 +602,115 @@ class ReportsTable(Table):
             res.append((row[0], row[1], row[2]))
         return res
 
+    def _select_page(self, fields, after, limit, status, start=None, end=None):
+        '''
+        Select a page of reports, ordered by row id (the cursor)
+        '''
+        query = 'SELECT id, %s FROM %s WHERE id > ?' % (fields, self._name)
+        params = [after if after is not None else -1]
+        if status is not None:
+            query += ' AND status = ?'
+            params.append(status)
+        if start is not None:
+            query += ' AND test_id >= ?'
+            params.append(start)
+        if end is not None:
+            query += ' AND test_id <= ?'
+            params.append(end)
+        query += ' ORDER BY id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return self._cursor.execute(query, tuple(params)).fetchall()
+
+    def get_report_page(self, after=None, limit=None, status=None):
+        '''
+        Get a page of the report list.
+        The cursor is the row id of the last report in the page,
+        so reports that are stored later are returned in the next pages,
+        regardless of their test id.
+
+        :param after: cursor returned with the previous page, None for the first page (default: None)
+        :param limit: maximal number of reports in the page, None for no limit (default: None)
+        :param status: return only reports with this status, None for all reports (default: None)
+        :return: tuple (list of tuples [(report id, status, reason) ..], cursor for the next page)
+        '''
+        res = []
+        cursor = after
+        for row in self._select_page('test_id, status, reason', after, limit, status):
+            cursor = row[0]
+            res.append((row[1], row[2], row[3]))
+        return (res, cursor)
+
+    def get_reports(self, after=None, limit=None, status=None, start=None, end=None):
+        '''
+        Get a page of reports, with their content
+
+        :param after: cursor returned with the previous page, None for the first page (default: None)
+        :param limit: maximal number of reports in the page, None for no limit (default: None)
+        :param status: return only reports with this status, None for all reports (default: None)
+        :param start: return only reports of tests with this id or higher (default: None)
+        :param end: return only reports of tests with this id or lower (default: None)
+        :return: list of tuples [(cursor, test id, Report) ..]
+        '''
+        rows = self._select_page('test_id, content', after, limit, status, start, end)
+        return [(row[0], row[1], self._load_report(row[2])) for row in rows]
+
+    def get_last_cursor(self):
+        '''
+        :return: cursor (as returned by get_report_page) of the last report, None if there are no reports
+        '''
+        self.select('MAX(id)')
+        return self._cursor.fetchone()[0]
+
+    def count(self, status=None):
+        '''
+        :param status: count only reports with this status, None for all reports (default: None)
+        :return: number of reports
+        '''
+        if status is None:
+            self.select('COUNT(*)')
+        else:
+            self.select('COUNT(*)', 'status=?', [status])
+        return self._cursor.fetchone()[0]
+
+    def get_status_counts(self):
+        '''
+        :return: dictionary of status/number of reports with this status
+        '''
+        self._cursor.execute('SELECT status, COUNT(*) FROM %s GROUP BY status' % self._name)
+        return {row[0]: row[1] for row in self._cursor.fetchall()}
+
+    def _extract_blobs(self, data):
+        '''
+        Store the large string values of a report dictionary in the blobs table
+
+        :param data: report dictionary (with unencoded strings)
+        :return: dictionary in which the large strings are replaced with references
+        '''
+        res = {}
+        for k, v in data.items():
+            if isinstance(v, dict):
+                v = self._extract_blobs(v)
+            elif isinstance(v, str) and len(v) >= self.blob_threshold:
+                v = _BlobRef(self._blobs.put(v))
+            res[k] = v
+        return res
+
+    def _resolve_blobs(self, data):
+        '''
+        Replace the blob references in a report dictionary with the actual values
+
+        :param data: report dictionary, as stored
+        :return: report dictionary
+        '''
+        for k, v in data.items():
+            if isinstance(v, dict):
+                self._resolve_blobs(v)
+            elif isinstance(v, _BlobRef):
+                data[k] = self._blobs.get(v.blob_hash)
+        return data
+
     @classmethod
     def _serialize_dict(cls, data):
         '''
@@ -427,13 +718,22 @@ class ReportsTable(Table):
 
         :param data: data to serialize
         '''
-        return zlib.compress(cPickle.dumps(data, protocol=2)).encode('base64')
+        return sqlite3.Binary(zlib.compress(cPickle.dumps(data, protocol=2)))
 
     @classmethod
     def _deserialize_dict(cls, data):
         '''
         deserializes a dictionary
 
+        :param data: data to deserialize
+        '''
+        return cPickle.loads(zlib.decompress(data))
+
+    @classmethod
+    def _deserialize_legacy_dict(cls, data):
+        '''
+        deserializes a dictionary that was stored base64 encoded (by older versions)
+
         :param data: data to deserialize
         '''
         return cPickle.loads(zlib.decompress(data.decode('base64')))
@@ -452,7 +752,8 @@ class SessionInfoTable(Table):
         ('current_index', 'INT'),
         ('failure_count', 'INT'),
         ('kitty_version', 'BLOB'),
-        ('data_model_hash', 'INT')
+        ('data_model_hash', 'INT'),
+        ('phase_timing', 'BLOB'),
     ]
 
     def __init__(self, connection, cursor):
@@ -522,6 +823,8 @@ class SessionInfo(object):
         self.failure_count = 0
         self.kitty_version = ''
         self.data_model_hash = 0
+        #: JSON of the per-phase timing of the session (see :mod:`kitty.data.timing`)
+        self.phase_timing = None
         if orig:
             self.copy(orig)
 
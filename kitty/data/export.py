@@ -0,0 +1,199 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+This module provides bulk export of the reports of a fuzzing session.
+The reports are read page by page, either from a running fuzzer
+(:class:`~kitty.data.data_manager.DataManager`) or directly from a session file
+(:class:`~kitty.data.export.SessionReader`), and written as they are read,
+so the memory usage does not depend on the number of reports.
+
+Two formats are supported:
+
+- ``ndjson`` - one JSON object per line:
+  ``{"cursor": <cursor>, "test_id": <id>, "encoding": "base64", "report": <report>}``.
+  The cursor of the last line can be used to resume an interrupted export.
+- ``tar`` - tar archive with a ``reports/report_<id>.json`` file per report,
+  in the same format as the ``/api/report`` response of the web interface.
+'''
+import os
+import json
+import time
+import sqlite3
+import tarfile
+from cStringIO import StringIO
+from kitty.core import KittyException
+from kitty.data.data_manager import ReportsTable
+
+#: supported export formats
+FORMATS = ['ndjson', 'tar']
+
+
+class SessionReader(object):
+    '''
+    Read-only access to the reports of a session file, without a running fuzzer.
+    It provides the same report query API as the
+    :class:`~kitty.data.data_manager.DataManager`.
+
+    :example:
+
+        ::
+
+            reader = SessionReader('fuzz_session.sqlite')
+            with open('failures.ndjson', 'wb') as f:
+                export_reports(reader, f, status='failed')
+            reader.close()
+    '''
+
+    def __init__(self, filename):
+        '''
+        :param filename: path to the session file, it is opened read-only
+        '''
+        if not os.path.isfile(filename):
+            raise KittyException('no such session file: %s' % filename)
+        self.filename = filename
+        self._connection = sqlite3.connect(filename)
+        cursor = self._connection.cursor()
+        cursor.execute('PRAGMA query_only = 1')
+        cursor.execute('SELECT name FROM sqlite_master WHERE type=? AND name=?', ('table', ReportsTable.__TABLE_NAME__))
+        if not cursor.fetchone():
+            self._connection.close()
+            raise KittyException('%s is not a kitty session file' % filename)
+        self._reports = ReportsTable(self._connection, cursor, create=False)
+
+    @property
+    def reports(self):
+        '''
+        :rtype: :class:`~kitty.data.data_manager.ReportsTable`
+        :return: the reports table of the session
+        '''
+        return self._reports
+
+    def get_reports(self, after=None, limit=None, status=None, start=None, end=None):
+        '''
+        See :func:`~kitty.data.data_manager.DataManager.get_reports`
+        '''
+        return self._reports.get_reports(after, limit, status, start, end)
+
+    def get_report_page(self, after=None, limit=None, status=None):
+        '''
+        See :func:`~kitty.data.data_manager.DataManager.get_report_page`
+        '''
+        return self._reports.get_report_page(after, limit, status)
+
+    def get_report_by_id(self, report_id):
+        '''
+        See :func:`~kitty.data.data_manager.DataManager.get_report_by_id`
+        '''
+        return self._reports.get(report_id)
+
+    def close(self):
+        '''
+        close the session file
+        '''
+        self._connection.close()
+
+
+def iter_reports(source, after=None, status=None, start=None, end=None, page_size=100):
+    '''
+    Iterate over the reports of a session, page by page
+
+    :param source: DataManager or SessionReader
+    :param after: cursor to start after, None to start from the first report (default: None)
+    :param status: export only reports with this status (default: None)
+    :param start: export only reports of tests with this id or higher (default: None)
+    :param end: export only reports of tests with this id or lower (default: None)
+    :param page_size: number of reports to read at once (default: 100)
+    :return: generator of tuples (cursor, test id, Report)
+    '''
+    while True:
+        page = source.get_reports(after, page_size, status, start, end)
+        for entry in page:
+            yield entry
+        if len(page) < page_size:
+            return
+        after = page[-1][0]
+
+
+def report_to_json(report, encoding='base64'):
+    '''
+    :param report: the report
+    :param encoding: encoding of the strings in the report (default: 'base64')
+    :return: JSON representation of the report, as returned by the web interface
+    '''
+    return json.dumps({'encoding': encoding, 'report': report.to_dict(encoding)})
+
+
+def export_reports(source, fileobj, fmt='ndjson', after=None, status=None, start=None, end=None):
+    '''
+    Write the reports of a session to a file (or any object with a ``write`` method)
+
+    :param source: DataManager or SessionReader
+    :param fileobj: file to write to
+    :param fmt: export format - 'ndjson' or 'tar' (default: 'ndjson')
+    :param after: cursor to start after, None to start from the first report (default: None)
+    :param status: export only reports with this status (default: None)
+    :param start: export only reports of tests with this id or higher (default: None)
+    :param end: export only reports of tests with this id or lower (default: None)
+    :return: number of exported reports
+    '''
+    if fmt not in FORMATS:
+        raise KittyException('unsupported export format: %s' % fmt)
+    count = 0
+    reports = iter_reports(source, after, status, start, end)
+    if fmt == 'ndjson':
+        for (cursor, test_id, report) in reports:
+            fileobj.write(json.dumps({
+                'cursor': cursor,
+                'test_id': test_id,
+                'encoding': 'base64',
+                'report': report.to_dict(),
+            }) + '\n')
+            count += 1
+    else:
+        tar = tarfile.open(fileobj=fileobj, mode='w|')
+        for (cursor, test_id, report) in reports:
+            data = report_to_json(report)
+            info = tarfile.TarInfo('reports/report_%d.json' % test_id)
+            info.size = len(data)
+            info.mtime = time.time()
+            tar.addfile(info, StringIO(data))
+            count += 1
+        tar.close()
+    return count
+
+
+def get_ndjson_cursor(filename):
+    '''
+    Prepare a partially written ndjson export for resuming:
+    remove the last line if it is incomplete and return the cursor of the last complete line
+
+    :param filename: the export file
+    :return: cursor to resume after, None if there are no complete lines
+    '''
+    if not os.path.exists(filename):
+        return None
+    cursor = None
+    valid_size = 0
+    with open(filename, 'rb') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            cursor = json.loads(line)['cursor']
+            valid_size += len(line)
+    with open(filename, 'ab') as f:
+        f.truncate(valid_size)
+    return cursor
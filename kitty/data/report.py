@@ -17,6 +17,45 @@
 '''
 This module defines the :class:`~kitty.data.report.Report` class
 '''
+import binascii
+
+
+class LazyValue(object):
+    '''
+    A report value that is computed only when it is needed,
+    i.e. when it is retrieved from the report, or when the report is converted to a dictionary
+    (before it is stored or sent).
+    It is used for values that are expensive to compute (such as hex dump of a large payload)
+    and are not needed for most reports.
+
+    :example:
+
+        ::
+
+            report.add('request (hex)', LazyValue(hexlify, payload))
+    '''
+
+    def __init__(self, func, *args):
+        '''
+        :param func: function that computes the value
+        :param args: arguments for func
+        '''
+        self._func = func
+        self._args = args
+
+    def get(self):
+        '''
+        :return: the computed value
+        '''
+        return self._func(*self._args)
+
+
+def hexlify(data):
+    '''
+    :param data: data to encode (str or any object that supports the buffer interface)
+    :return: hex representation of the data
+    '''
+    return binascii.hexlify(data)
 
 
 class Report(object):
@@ -152,7 +191,11 @@ class Report(object):
         :return: corresponding value
         '''
         if key in self._data_fields:
-            return self._data_fields[key]
+            value = self._data_fields[key]
+            if isinstance(value, LazyValue):
+                value = value.get()
+                self._data_fields[key] = value
+            return value
         if key in self._sub_reports:
             return self._sub_reports[key]
         return None
@@ -161,15 +204,17 @@ class Report(object):
         '''
         Return a dictionary version of the report
 
-        :param encoding: required encoding for the string values (default: 'base64')
+        :param encoding: required encoding for the string values,
+            None to keep them as is (default: 'base64')
         :rtype: dictionary
         :return: dictionary representation of the report
         '''
         res = {}
-        for k, v in self._data_fields.items():
+        for k in self._data_fields:
+            v = self.get(k)
             if isinstance(v, unicode):
                 v = v.encode('utf-8')
-            if isinstance(v, str):
+            if isinstance(v, str) and encoding:
                 v = v.encode(encoding)[:-1]
             res[k] = v
         for k, v in self._sub_reports.items():
@@ -178,7 +223,7 @@ class Report(object):
 
     @classmethod
     def _decode(cls, val, encoding):
-        if isinstance(val, str):
+        if isinstance(val, basestring) and encoding:
             val = val.decode(encoding)
         return val
 
@@ -189,7 +234,8 @@ class Report(object):
 
         :type d: dictionary
         :param d: dictionary representing the report
-        :param encoding: encoding of strings in the dictionary (default: 'base64')
+        :param encoding: encoding of strings in the dictionary,
+            None if they are not encoded (default: 'base64')
         :return: Report object
         '''
         report = Report(Report._decode(d['name'], encoding))
@@ -198,7 +244,7 @@ class Report(object):
         del d['sub_reports']
         for k, v in d.items():
             if k in sub_reports:
-                report.add(k, Report.from_dict(v))
+                report.add(k, Report.from_dict(v, encoding))
             else:
                 if k.lower() == 'status':
                     report.set_status(Report._decode(v, encoding))
@@ -229,6 +275,20 @@ class Report(object):
             status = self.get('status')
         return status
 
+    def get_feedback(self):
+        '''
+        Get the feedback signal of the report and its sub-reports.
+        Actors may add a numeric 'feedback' entry to their report
+        (e.g. number of new edges that were covered by the test),
+        the feedback of the report is the sum of all those entries.
+
+        :return: feedback signal (0 if no feedback was added)
+        '''
+        feedback = self.get('feedback') or 0
+        for sr_name in self._sub_reports:
+            feedback += self._sub_reports[sr_name].get_feedback()
+        return feedback
+
     def is_failed(self):
         '''
         .. deprecated:: 0.6.7
@@ -0,0 +1,285 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+This module provides per-phase timing of the tests of a fuzzing session.
+
+The fuzzers measure the duration of each phase of a test
+(e.g. ``target.pre_test``, ``render``, ``transmit``, ``store_session``)
+and add it to a histogram of the phase.
+The phases do not overlap (e.g. the ``trigger`` phase of the client fuzzer
+does not include the ``render`` time of the payloads that are requested during the trigger),
+so the total of all the phases is the time spent in the tests.
+A histogram keeps only counters, so the overhead and the memory usage
+do not depend on the number of tests.
+
+The timing of a running fuzzer is available from its data manager
+(under the ``phase_timing`` key), in the ``/api/stats.json`` response of the
+web interface, and can be exported to a file when the session ends
+(see :func:`~kitty.fuzzers.base.BaseFuzzer.set_timing_file`).
+It is stored in the session info as well,
+so the timing of a resumed session includes the timing of its previous runs.
+
+:example:
+
+    ::
+
+        timer = PhaseTimer()
+        with timer.measure('render'):
+            payload = template.render().tobytes()
+        print(timer.get_summary())
+'''
+import json
+import time
+import threading
+from bisect import bisect_left
+
+#: upper bounds (in seconds) of the histogram buckets,
+#: the last bucket holds the durations that are longer than the last bound
+BUCKET_BOUNDS = [m * 10 ** e for e in range(-5, 1) for m in (1, 2, 5)] + [10]
+
+
+class PhaseHistogram(object):
+    '''
+    Histogram of the durations of a single phase
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def add(self, duration):
+        '''
+        :param duration: duration (in seconds) of the phase
+        '''
+        self.count += 1
+        self.total += duration
+        if self.min is None or duration < self.min:
+            self.min = duration
+        if self.max is None or duration > self.max:
+            self.max = duration
+        self.buckets[bisect_left(BUCKET_BOUNDS, duration)] += 1
+
+    def merge(self, other):
+        '''
+        :type other: PhaseHistogram
+        :param other: histogram to add to this one
+        :return: self
+        '''
+        for (i, count) in enumerate(other.buckets):
+            self.buckets[i] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def get_mean(self):
+        '''
+        :return: mean duration of the phase, None if there are no samples
+        '''
+        return self.total / self.count if self.count else None
+
+    def get_percentile(self, percent):
+        '''
+        The percentile is estimated from the histogram,
+        it is the upper bound of the bucket that contains it (but not more than the maximal duration).
+
+        :param percent: the percentile (0-100)
+        :return: estimated duration of the percentile, None if there are no samples
+        '''
+        if not self.count:
+            return None
+        needed = self.count * percent / 100.0
+        seen = 0
+        for (i, count) in enumerate(self.buckets):
+            seen += count
+            if count and seen >= needed:
+                if i < len(BUCKET_BOUNDS):
+                    return min(BUCKET_BOUNDS[i], self.max)
+                break
+        return self.max
+
+    def to_dict(self):
+        '''
+        :return: dictionary representation of the histogram
+        '''
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.get_mean(),
+            'p50': self.get_percentile(50),
+            'p90': self.get_percentile(90),
+            'p99': self.get_percentile(99),
+            'buckets': list(self.buckets),
+        }
+
+    @classmethod
+    def from_dict(cls, hist_d):
+        '''
+        :param hist_d: dictionary representation of a histogram (see :func:`to_dict`)
+        :rtype: :class:`~kitty.data.timing.PhaseHistogram`
+        :return: the histogram
+        '''
+        hist = PhaseHistogram()
+        hist.count = hist_d['count']
+        hist.total = hist_d['total']
+        hist.min = hist_d['min']
+        hist.max = hist_d['max']
+        hist.buckets = list(hist_d['buckets'])
+        return hist
+
+
+class _Measurement(object):
+    '''
+    Context manager that adds its duration to a phase
+    '''
+
+    __slots__ = ['_timer', '_phase', '_start']
+
+    def __init__(self, timer, phase):
+        self._timer = timer
+        self._phase = phase
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._timer.add(self._phase, time.time() - self._start)
+
+
+class PhaseTimer(object):
+    '''
+    Histograms of the durations of the phases of the tests.
+
+    Each phase is expected to be measured by a single thread,
+    other threads may read the timing (:func:`to_dict`) at any time,
+    the histograms are updated and read under a lock, so the read is a consistent snapshot.
+    '''
+
+    def __init__(self):
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, duration):
+        '''
+        :param phase: name of the phase
+        :param duration: duration (in seconds) of the phase
+        '''
+        with self._lock:
+            hist = self._phases.get(phase)
+            if hist is None:
+                hist = self._phases.setdefault(phase, PhaseHistogram())
+            hist.add(duration)
+
+    def measure(self, phase):
+        '''
+        :param phase: name of the phase
+        :return: context manager that adds the duration of its block to the phase
+        '''
+        return _Measurement(self, phase)
+
+    def get_histogram(self, phase):
+        '''
+        :param phase: name of the phase
+        :rtype: :class:`~kitty.data.timing.PhaseHistogram`
+        :return: the histogram of the phase, None if it was not measured
+        '''
+        return self._phases.get(phase)
+
+    def get_phases(self):
+        '''
+        :return: names of the measured phases
+        '''
+        return sorted(self._phases.keys())
+
+    def merge(self, other):
+        '''
+        :type other: PhaseTimer
+        :param other: timer to add to this one (e.g. timing of another session)
+        :return: self
+        '''
+        with self._lock:
+            for (phase, hist) in list(other._phases.items()):
+                self._phases.setdefault(phase, PhaseHistogram()).merge(hist)
+        return self
+
+    def reset(self):
+        '''
+        Remove all measurements
+        '''
+        with self._lock:
+            self._phases = {}
+
+    def to_dict(self):
+        '''
+        :return: dictionary representation of the timing:
+            ``{'buckets': <bucket bounds>, 'phases': {<phase>: <histogram dictionary>}}``
+        '''
+        with self._lock:
+            phases = {phase: hist.to_dict() for (phase, hist) in self._phases.items()}
+        return {
+            'buckets': BUCKET_BOUNDS,
+            'phases': phases,
+        }
+
+    @classmethod
+    def from_dict(cls, timer_d):
+        '''
+        :param timer_d: dictionary representation of the timing (see :func:`to_dict`)
+        :rtype: :class:`~kitty.data.timing.PhaseTimer`
+        :return: the timer
+        '''
+        timer = PhaseTimer()
+        for (phase, hist_d) in timer_d['phases'].items():
+            timer._phases[phase] = PhaseHistogram.from_dict(hist_d)
+        return timer
+
+    def get_summary(self):
+        '''
+        :return: table (string) of the phases, sorted by their total duration
+        '''
+        phases = sorted(self._phases.items(), key=lambda item: (-item[1].total, item[0]))
+        grand_total = sum(hist.total for (_, hist) in phases)
+        lines = ['%-20s %10s %10s %10s %10s %7s' % ('phase', 'count', 'mean ms', 'p90 ms', 'max ms', 'total')]
+        for (phase, hist) in phases:
+            lines.append('%-20s %10d %10.3f %10.3f %10.3f %6.1f%%' % (
+                phase,
+                hist.count,
+                hist.get_mean() * 1000,
+                hist.get_percentile(90) * 1000,
+                hist.max * 1000,
+                hist.total * 100.0 / grand_total if grand_total else 0,
+            ))
+        return '\n'.join(lines)
+
+    def export(self, filename):
+        '''
+        Write the timing to a JSON file
+
+        :param filename: name of the file
+        '''
+        with open(filename, 'wb') as f:
+            json.dump(self.to_dict(), f, indent=4, sort_keys=True)
@@ -30,7 +30,11 @@ provides payloads to some server stack in a client fuzzing session.
 :class:`~kitty.fuzzers.server.ServerFuzzer` should be used when the fuzzer
 instantiates the communication, in cases such as fuzzing a server of some sort
 or when writing payloads to files.
+
+:class:`~kitty.fuzzers.concurrent.ConcurrentServerFuzzer` is a server fuzzer
+that keeps multiple connections to a network target in flight.
 '''
 from kitty.fuzzers.base import BaseFuzzer
 from kitty.fuzzers.client import ClientFuzzer
 from kitty.fuzzers.server import ServerFuzzer
+from kitty.fuzzers.concurrent import ConcurrentServerFuzzer
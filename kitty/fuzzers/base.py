@@ -23,15 +23,20 @@ as it is tightly coupled to the implementation of the Client and Server fuzzer,
 and will probably be changed in the future.
 '''
 import sys
+import json
 import time
 import traceback
 import shlex
-import docopt
 from threading import Event
 from kitty.core import KittyException, KittyObject
+from kitty.core.profiler import SamplingProfiler
 from kitty.data.data_manager import DataManager, SessionInfo
-from kitty.data.report import Report
-from pkg_resources import get_distribution
+from kitty.data.report import Report, LazyValue, hexlify
+from kitty.data.timing import PhaseTimer
+from kitty.fuzzers.pacing import AdaptiveDelay
+
+#: minimal time (in seconds) between two stores of the phase timing in the session info
+_TIMING_STORE_INTERVAL = 10
 
 
 def _flatten_dict_entry(orig_key, v):
@@ -49,14 +54,17 @@ def _flatten_dict_entry(orig_key, v):
 
 class _Configuration(object):
 
-    def __init__(self, delay_secs, store_all_reports, session_file_name, max_failures):
+    def __init__(self, delay_secs, store_all_reports, session_file_name, max_failures, timing_file_name):
         self.delay_secs = delay_secs
         self.store_all_reports = store_all_reports
         self.session_file_name = session_file_name
         self.max_failures = max_failures
+        self.timing_file_name = timing_file_name
 
 
 def _get_current_version():
+    # pkg_resources takes long to import, so it is imported only when needed
+    from pkg_resources import get_distribution
     package_name = 'kittyfuzzer'
     #
     # This is weird. I know that this is the way to get the version,
@@ -88,7 +96,18 @@ class BaseFuzzer(KittyObject):
             store_all_reports=False,
             session_file_name=None,
             max_failures=None,
+            timing_file_name=None,
         )
+        #: per-phase timing of the tests
+        self.timer = PhaseTimer()
+        # timing of the previous runs of the session (loaded from the session info)
+        self._previous_timing = None
+        self._timing_store_time = None
+        #: sampling profiler, started on demand (see :func:`start_profiling`)
+        self.profiler = SamplingProfiler(logger=self.logger)
+        #: adaptive delay controller, None for a fixed delay (see :func:`set_adaptive_delay`)
+        self.pacer = None
+        self._last_transmit_total = 0.0
         # user interface
         self.user_interface = None
         # target
@@ -113,6 +132,7 @@ class BaseFuzzer(KittyObject):
         :param option_line: string with the command line options to be parsed.
         '''
         if option_line is not None:
+            import docopt
             usage = '''
             These are the options to the kitty fuzzer object, not the options to the runner.
 
@@ -120,10 +140,12 @@ class BaseFuzzer(KittyObject):
                 fuzzer [options] [-v ...]
 
             Options:
+                -a --adaptive-delay <max-delay> adapt the delay between tests to the victim, up to max-delay seconds
                 -d --delay <delay>              delay between tests in secodes, float number
                 -e --end <end-index>            fuzzing end index, ignored if session-file loaded
                 -f --session <session-file>     session file name to use
                 -s --start <start-index>        fuzzing start index, ignored if session-file loaded
+                -t --timing <timing-file>       export the per-phase timing of the tests to a file
                 -n --no-env-test                don't perform environment test before the fuzzing session
                 -v --verbose                    be more verbose in the log
             '''
@@ -137,9 +159,15 @@ class BaseFuzzer(KittyObject):
             session_file = options['--session']
             if session_file is not None:
                 self.set_session_file(session_file)
+            timing_file = options['--timing']
+            if timing_file is not None:
+                self.set_timing_file(timing_file)
             delay = options['--delay']
             if delay is not None:
                 self.set_delay_between_tests(float(delay))
+            max_delay = options['--adaptive-delay']
+            if max_delay is not None:
+                self.set_adaptive_delay(float(max_delay), float(delay) if delay is not None else 0.0)
             skip_env_test = options['--no-env-test']
             if skip_env_test:
                 self.set_skip_env_test(True)
@@ -172,6 +200,22 @@ class BaseFuzzer(KittyObject):
         self.config.delay_secs = delay_secs
         return self
 
+    def set_adaptive_delay(self, max_delay=5.0, min_delay=0.0, latency_factor=2.0):
+        '''
+        Adapt the delay between tests to the victim, instead of a fixed delay.
+        The delay is increased when the victim seems overwhelmed (receive failures,
+        waiting for the victim to be alive, or high transmission latency),
+        and decreased otherwise (see :mod:`kitty.fuzzers.pacing`).
+        The current delay and the steady-state rate of the tests are available
+        in the web interface stats, and logged at the end of the session.
+
+        :param max_delay: maximal delay between tests, in seconds (default: 5.0)
+        :param min_delay: minimal delay between tests, in seconds (default: 0.0)
+        :param latency_factor: latency (relative to the baseline latency) that is considered overwhelming (default: 2.0)
+        '''
+        self.pacer = AdaptiveDelay(min_delay, max_delay, latency_factor=latency_factor, logger=self.logger)
+        return self
+
     def set_store_all_reports(self, store_all_reports):
         '''
         :param store_all_reports: should all reports be stored
@@ -188,6 +232,31 @@ class BaseFuzzer(KittyObject):
         self.config.session_file_name = filename
         return self
 
+    def set_timing_file(self, filename):
+        '''
+        Export the per-phase timing of the tests to a file (JSON) when the session is stopped.
+        See :mod:`kitty.data.timing` for the format.
+
+        :param filename: timing file name
+        '''
+        self.config.timing_file_name = filename
+        return self
+
+    def start_profiling(self, duration=30):
+        '''
+        Sample the stacks of all the threads (fuzzer, data manager, monitors etc.)
+        for a while, without stopping or pausing the session.
+        The profile is written in the collapsed stack (flame graph) format,
+        next to the session file (see :mod:`kitty.core.profiler`).
+
+        Profiling can also be started from the web interface,
+        or by sending SIGUSR1 to the fuzzer process (for 30 seconds).
+
+        :param duration: profiling duration, in seconds (default: 30)
+        :return: name of the profile file, None if the profiler is already running
+        '''
+        return self.profiler.start(duration)
+
     def set_model(self, model):
         '''
         Set the model to fuzz
@@ -291,6 +360,12 @@ class BaseFuzzer(KittyObject):
                 self.logger.info('Performing environment test')
                 self._test_environment()
             self._in_environment_test = False
+            # the timing of the environment test is not part of the session
+            self.timer.reset()
+            if self._previous_timing:
+                self.timer.merge(self._previous_timing)
+            transmit = self.timer.get_histogram('transmit')
+            self._last_transmit_total = transmit.total if transmit else 0.0
             self.session_info.current_index = start_index
             self.model.skip(self.session_info.current_index)
             self._start()
@@ -320,6 +395,13 @@ class BaseFuzzer(KittyObject):
     def _start(self):
         self.not_implemented('_start')
 
+    def _mutate(self):
+        '''
+        :return: True if the model was mutated, False if there are no more mutations
+        '''
+        with self.timer.measure('mutate'):
+            return self.model.mutate()
+
     def _update_test_info(self):
         test_info = self.model.get_test_info()
         self.dataman.set('test_info', test_info)
@@ -327,20 +409,26 @@ class BaseFuzzer(KittyObject):
         self.dataman.set('template_info', template_info)
 
     def _pre_test(self):
-        self._update_test_info()
-        self.session_info.current_index = self.model.current_index()
-        self.target.pre_test(self.model.current_index())
+        with self.timer.measure('pre_test'):
+            self._update_test_info()
+            self.session_info.current_index = self.model.current_index()
+        with self.timer.measure('target.pre_test'):
+            self.target.pre_test(self.model.current_index())
 
     def _post_test(self):
         '''
         :return: True if test failed
         '''
         failure_detected = False
-        self.target.post_test(self.model.current_index())
-        report = self._get_report()
+        with self.timer.measure('target.post_test'):
+            self.target.post_test(self.model.current_index())
+        with self.timer.measure('get_report'):
+            report = self._get_report()
         status = report.get_status()
         if self._in_environment_test:
             return status != Report.PASSED
+        self._update_pacing()
+        self.model.handle_feedback(report.get_feedback())
         if status != Report.PASSED:
             self._store_report(report)
             self.user_interface.failure_detected()
@@ -351,11 +439,36 @@ class BaseFuzzer(KittyObject):
         if failure_detected:
             self.session_info.failure_count += 1
         self._store_session()
-        if self.config.delay_secs:
-            self.logger.debug('delaying for %f seconds', self.config.delay_secs)
-            time.sleep(self.config.delay_secs)
+        self._delay()
         return failure_detected
 
+    def _update_pacing(self):
+        '''
+        Update the adaptive delay with the signals of the last test
+        '''
+        if self.pacer is None:
+            return
+        transmit = self.timer.get_histogram('transmit')
+        latency = None
+        if transmit is not None:
+            latency = transmit.total - self._last_transmit_total
+            self._last_transmit_total = transmit.total
+        self.pacer.observe(
+            latency=latency,
+            receive_failure=getattr(self.target, 'receive_failure', False),
+            alive_wait=self.target.get_victim_alive_wait(),
+        )
+
+    def _delay(self):
+        '''
+        Delay between tests
+        '''
+        delay = self.pacer.delay if self.pacer else self.config.delay_secs
+        if delay:
+            self.logger.debug('delaying for %f seconds', delay)
+            with self.timer.measure('delay'):
+                time.sleep(delay)
+
     def _get_report(self):
         report = self.target.get_report()
         return report
@@ -403,6 +516,14 @@ class BaseFuzzer(KittyObject):
             self.model.current_index(),
             self.session_info.failure_count
         )
+        if self.timer.get_phases():
+            self.logger.info('Test phase timing:\n%s', self.timer.get_summary())
+        if self.pacer:
+            rate = self.pacer.get_rate()
+            self.logger.info(
+                'Adaptive delay: %.3f seconds (backed off %d times), steady-state rate: %s tests per second',
+                self.pacer.delay, self.pacer.backoffs, '%.2f' % rate if rate else 'unknown'
+            )
 
     def _test_info(self):
         fuzz_node_info = self.model.get_test_info()
@@ -438,36 +559,63 @@ class BaseFuzzer(KittyObject):
         assert(self.user_interface)
         assert(self.target)
         self.user_interface.stop()
+        self.profiler.stop()
         self.target.teardown()
+        self._store_timing()
+        self._set_session_info()
+        if self.config.timing_file_name:
+            self.timer.export(self.config.timing_file_name)
         self.dataman.submit_task(None)
         self._un_set_signal_handler()
 
-    def _store_report(self, report):
+    def _store_report(self, report, test_number=None, fuzz_path=None, test_info=None, payload=None):
+        '''
+        Store the report of a test.
+        The details of the test are taken from the model and the last payload,
+        unless they are provided (e.g. when the test is not the current one).
+        '''
         self.logger.debug('<in>')
-        report.add('test_number', self.model.current_index())
-        report.add('fuzz_path', self.model.get_sequence_str())
-        test_info = self.model.get_test_info()
-        data_model_report = Report(name='Data Model')
-        for k, v in test_info.items():
-            new_entries = _flatten_dict_entry(k, v)
-            for (k_, v_) in new_entries:
-                data_model_report.add(k_, v_)
-        report.add(data_model_report.get_name(), data_model_report)
-        payload = self._last_payload
-        if payload is not None:
-            data_report = Report('payload')
-            data_report.add('raw', payload)
-            data_report.add('hex', payload.encode('hex'))
-            data_report.add('length', len(payload))
-            report.add('payload', data_report)
-        else:
-            report.add('payload', None)
+        with self.timer.measure('store_report'):
+            if test_number is None:
+                test_number = self.model.current_index()
+                fuzz_path = self.model.get_sequence_str()
+                test_info = self.model.get_test_info()
+                payload = self._last_payload
+            report.add('test_number', test_number)
+            report.add('fuzz_path', fuzz_path)
+            report.add('report_time', time.time())
+            data_model_report = Report(name='Data Model')
+            for k, v in test_info.items():
+                new_entries = _flatten_dict_entry(k, v)
+                for (k_, v_) in new_entries:
+                    data_model_report.add(k_, v_)
+            report.add(data_model_report.get_name(), data_model_report)
+            if payload is not None:
+                data_report = Report('payload')
+                data_report.add('raw', payload)
+                data_report.add('hex', LazyValue(hexlify, payload))
+                data_report.add('length', len(payload))
+                report.add('payload', data_report)
+            else:
+                report.add('payload', None)
 
-        self.dataman.store_report(report, self.model.current_index())
-        self.dataman.get_report_by_id(self.model.current_index())
+            self.dataman.store_report(report, test_number)
+            self.dataman.get_report_by_id(test_number)
 
     def _store_session(self):
-        self._set_session_info()
+        with self.timer.measure('store_session'):
+            now = time.time()
+            if self._timing_store_time is None or now - self._timing_store_time >= _TIMING_STORE_INTERVAL:
+                self._store_timing()
+            self._set_session_info()
+
+    def _store_timing(self):
+        '''
+        Put the phase timing in the session info,
+        it is serialized at most once every few seconds, as it is relatively expensive
+        '''
+        self._timing_store_time = time.time()
+        self.session_info.phase_timing = json.dumps(self.timer.to_dict(), sort_keys=True)
 
     def _get_session_info(self):
         info = self.dataman.get_session_info()
@@ -490,10 +638,19 @@ class BaseFuzzer(KittyObject):
         if self.model:
             self.handle_stage_changed(self.model)
         self.dataman.set('log_file_name', self.get_log_file_name())
+        # the timer is shared, so its current state is available without a task per test
+        self.dataman.set('phase_timing', self.timer)
+        self.dataman.set('profiler', self.profiler)
+        self.dataman.set('pacer', self.pacer)
+        if self.config.session_file_name != ':memory:':
+            self.profiler.file_prefix = self.config.session_file_name
         info = self._get_session_info()
         if info:
             self.logger.info('Loaded session from DB')
             self.session_info = info
+            if info.phase_timing:
+                self._previous_timing = PhaseTimer.from_dict(json.loads(info.phase_timing))
+                self.timer.merge(self._previous_timing)
             return True
         else:
             self.logger.info('No session loaded')
@@ -504,6 +661,9 @@ class BaseFuzzer(KittyObject):
         self.stop()
         sys.exit(0)
 
+    def _profile_now(self, dummy1, dummy2):
+        self.start_profiling()
+
     def _keep_running(self):
         '''
         Should we still fuzz??
@@ -515,10 +675,13 @@ class BaseFuzzer(KittyObject):
 
     def _set_signal_handler(self):
         '''
-        Replace the signal handler with self._exit_now
+        Replace the signal handler with self._exit_now,
+        and start profiling on SIGUSR1 (where it is supported)
         '''
         import signal
         signal.signal(signal.SIGINT, self._exit_now)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._profile_now)
 
     @classmethod
     def _un_set_signal_handler(cls):
@@ -527,3 +690,5 @@ class BaseFuzzer(KittyObject):
         '''
         import signal
         signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, signal.SIG_DFL)
@@ -17,6 +17,7 @@
 '''
 This module contains the :class:`~kitty.fuzzer.client.ClientFuzzer` class.
 '''
+import time
 from threading import Event
 from kitty.fuzzers.base import BaseFuzzer
 from kitty.core.threading_utils import LoopFuncThread
@@ -48,11 +49,13 @@ class ClientFuzzer(BaseFuzzer):
         '''
         super(ClientFuzzer, self).__init__(name, logger, option_line)
         self._target_control_thread = LoopFuncThread(self._do_trigger)
+        self._target_control_thread.name = name
         self._trigger_stop_evt = Event()
         self._target_control_thread.set_func_stop_event(self._trigger_stop_evt)
         self._index_in_path = 0
         self._requested_stages = []
         self._report = None
+        self._trigger_render_time = 0.0
         self._done_evt = Event()
 
     def _pre_test(self):
@@ -86,12 +89,17 @@ class ClientFuzzer(BaseFuzzer):
     def _do_trigger(self):
         self.logger.debug('_do_trigger called')
         self._check_pause()
-        if self._keep_running() and self.model.mutate():
+        if self._keep_running() and self._mutate():
             self._fuzz_path = self.model.get_sequence()
             self._index_in_path = 0
             self._pre_test()
             self._test_info()
+            # the payloads are rendered (in get_mutation) during the trigger,
+            # their render time is measured separately and is not included in the trigger time
+            self._trigger_render_time = 0.0
+            start = time.time()
             self.target.trigger()
+            self.timer.add('trigger', max(0.0, time.time() - start - self._trigger_render_time))
             self._post_test()
         else:
             self._end_message()
@@ -144,7 +152,11 @@ class ClientFuzzer(BaseFuzzer):
             fuzz_node = self._fuzz_path[self._index_in_path].dst
             if self._should_fuzz_node(fuzz_node, stage):
                 fuzz_node.set_session_data(data)
+                start = time.time()
                 payload = fuzz_node.render().tobytes()
+                render_time = time.time() - start
+                self.timer.add('render', render_time)
+                self._trigger_render_time += render_time
                 self._last_payload = payload
             else:
                 self._update_path_index(stage)
@@ -0,0 +1,316 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+This module defines ConcurrentServerFuzzer - a server fuzzer that keeps
+multiple tests (connections to the victim) in flight, using a single
+select-based event loop.
+'''
+import time
+import errno
+import select
+import socket
+import traceback
+from kitty.core import KittyException
+from kitty.data.report import Report, LazyValue, hexlify
+from kitty.fuzzers.server import ServerFuzzer
+
+
+class _Case(object):
+    '''
+    State of a single test in a batch
+    '''
+
+    CONNECTING = 'connecting'
+    SENDING = 'sending'
+    RECEIVING = 'receiving'
+    DONE = 'done'
+
+    def __init__(self, index, fuzz_path, test_info, payloads, feedback_context=None):
+        '''
+        :param index: test number
+        :param fuzz_path: string representation of the sequence
+        :param test_info: test information from the model
+        :param payloads: list of rendered payloads of the sequence
+        :param feedback_context: context of the test for the feedback to the model (default: None)
+        '''
+        self.index = index
+        self.fuzz_path = fuzz_path
+        self.test_info = test_info
+        self.payloads = payloads
+        self.feedback_context = feedback_context
+        self.report = Report('connection')
+        self.report.add('test_number', index)
+        self.sock = None
+        self.state = None
+        self.deadline = None
+        self.payload_idx = 0
+        self.out_buf = None
+        self.trans_report = None
+
+    def last_payload(self):
+        if self.payload_idx < len(self.payloads):
+            return self.payloads[self.payload_idx]
+        return self.payloads[-1] if self.payloads else None
+
+
+class ConcurrentServerFuzzer(ServerFuzzer):
+    '''
+    ConcurrentServerFuzzer runs multiple tests at the same time,
+    each of them over its own connection to the victim,
+    all of them multiplexed by a single select-based event loop.
+    It works with :class:`~kitty.targets.network.TcpTarget` and
+    :class:`~kitty.targets.network.UdpTarget` (or any target that provides
+    ``open_connection``, ``timeout``, ``max_response_size`` and ``socket_type``).
+
+    The tests are executed in batches of up to ``concurrency`` tests.
+    The controller and monitors of the target are called once per batch
+    (target.pre_test before the batch and target.post_test after it),
+    and their report is attached to the report of each test in the batch,
+    so a failure that is detected by them marks all tests of the batch as failed.
+
+    .. note::
+
+        The payloads of a test are rendered before the test starts,
+        so edge callbacks (that use the responses) are not supported.
+        The environment test is performed by the blocking ServerFuzzer flow.
+
+    :example:
+
+        ::
+
+            target = TcpTarget('server', host='127.0.0.1', port=8080, timeout=1)
+            target.set_expect_response(True)
+            fuzzer = ConcurrentServerFuzzer()
+            fuzzer.set_concurrency(32)
+            fuzzer.set_target(target)
+            # ...
+    '''
+
+    def __init__(self, name='ConcurrentServerFuzzer', logger=None, option_line=None):
+        '''
+        :param name: name of the object
+        :param logger: logger for the object (default: None)
+        :param option_line: cmd line options to the fuzzer
+        '''
+        super(ConcurrentServerFuzzer, self).__init__(name, logger, option_line)
+        self._concurrency = 8
+
+    def set_concurrency(self, concurrency):
+        '''
+        :param concurrency: maximal number of tests in flight (default: 8)
+        '''
+        if concurrency < 1:
+            raise KittyException('concurrency (%s) < 1' % concurrency)
+        self._concurrency = concurrency
+        return self
+
+    def _start(self):
+        self.logger.info('should keep running? %s' % self._keep_running())
+        while True:
+            self._check_pause()
+            batch = []
+            try:
+                while len(batch) < self._concurrency and self._keep_running() and self._mutate():
+                    batch.append(self._new_case())
+                if not batch:
+                    break
+                self._run_batch(batch)
+            except Exception as e:
+                self.logger.error('Error occurred while fuzzing: %s', repr(e))
+                self.logger.error(traceback.format_exc())
+                break
+        self._end_message()
+
+    def _new_case(self):
+        '''
+        Render the current sequence of the model into a new case
+        '''
+        self._update_test_info()
+        sequence = self.model.get_sequence()
+        payloads = []
+        for edge in sequence:
+            if edge.callback:
+                raise KittyException('edge callbacks are not supported by %s (%s)' % (type(self).__name__, edge))
+            node = edge.dst
+            node.set_session_data(self.target.get_session_data())
+            payloads.append(self._render(node, True))
+        return _Case(
+            self.model.current_index(), self.model.get_sequence_str(), self.model.get_test_info(), payloads,
+            self.model.get_feedback_context()
+        )
+
+    def _run_batch(self, batch):
+        '''
+        Run a batch of cases concurrently
+        '''
+        first = batch[0].index
+        last = batch[-1].index
+        self.logger.info('Current tests: %d - %d' % (first, last))
+        self.session_info.current_index = last
+        with self.timer.measure('target.pre_test'):
+            self.target.pre_test(first)
+        # the target phases are measured per batch
+        with self.timer.measure('transmit'):
+            for case in batch:
+                self._start_case(case)
+            active = [case for case in batch if case.state != _Case.DONE]
+            while active:
+                self._poll(active)
+                active = [case for case in active if case.state != _Case.DONE]
+        with self.timer.measure('target.post_test'):
+            self.target.post_test(last)
+        with self.timer.measure('get_report'):
+            target_report = self.target.get_report()
+        self._update_pacing()
+        failures = 0
+        for case in batch:
+            case.report.add(target_report.get_name(), target_report)
+            if self._post_case(case):
+                failures += 1
+        self._store_session()
+        self._delay()
+        return failures
+
+    def _post_case(self, case):
+        '''
+        :return: True if the case failed
+        '''
+        report = case.report
+        status = report.get_status()
+        # the model moved on to the other cases of the batch, so the feedback is passed with the context of the case
+        self.model.handle_feedback(report.get_feedback(), case.feedback_context)
+        if status != Report.PASSED:
+            self._store_report(report, case.index, case.fuzz_path, case.test_info, case.last_payload())
+            self.user_interface.failure_detected()
+            self.session_info.failure_count += 1
+            self.logger.warn('!! Failure detected in test %d !!' % case.index)
+            return True
+        elif self.config.store_all_reports:
+            self._store_report(report, case.index, case.fuzz_path, case.test_info, case.last_payload())
+        return False
+
+    def _start_case(self, case):
+        try:
+            case.sock = self.target.open_connection()
+        except Exception as ex:
+            self._fail_case(case, 'failed to connect: %s' % ex)
+            return
+        case.deadline = self._get_deadline()
+        if self.target.socket_type == socket.SOCK_STREAM:
+            case.state = _Case.CONNECTING
+        else:
+            self._next_payload(case)
+
+    def _get_deadline(self):
+        return None if self.target.timeout is None else time.time() + self.target.timeout
+
+    def _poll(self, active):
+        '''
+        Wait for I/O on the active cases and handle it
+        '''
+        readers = [case.sock for case in active if case.state == _Case.RECEIVING]
+        writers = [case.sock for case in active if case.state in (_Case.CONNECTING, _Case.SENDING)]
+        deadlines = [case.deadline for case in active if case.deadline is not None]
+        timeout = max(0, min(deadlines) - time.time()) if deadlines else None
+        (readable, writable, _) = select.select(readers, writers, [], timeout)
+        readable = set(readable)
+        writable = set(writable)
+        now = time.time()
+        for case in active:
+            try:
+                if case.sock in writable:
+                    self._handle_writable(case)
+                elif case.sock in readable:
+                    self._handle_readable(case)
+                elif case.deadline is not None and now >= case.deadline:
+                    self._fail_case(case, 'timeout while %s' % case.state)
+            except Exception as ex:
+                self._fail_case(case, 'error while %s: %s' % (case.state, ex))
+
+    def _handle_writable(self, case):
+        if case.state == _Case.CONNECTING:
+            err = case.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                self._fail_case(case, 'failed to connect: %s' % errno.errorcode.get(err, err))
+            else:
+                self._next_payload(case)
+            return
+        try:
+            sent = case.sock.send(case.out_buf)
+        except socket.error as ex:
+            if ex.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            case.trans_report.failed('failed to send payload: %s' % ex)
+            self._fail_case(case, 'send failure')
+            return
+        case.out_buf = case.out_buf[sent:]
+        if len(case.out_buf):
+            return
+        case.trans_report.success()
+        if self.target.expect_response:
+            case.state = _Case.RECEIVING
+            case.deadline = self._get_deadline()
+        else:
+            case.payload_idx += 1
+            self._next_payload(case)
+
+    def _handle_readable(self, case):
+        response = case.sock.recv(self.target.max_response_size)
+        if not response and self.target.socket_type == socket.SOCK_STREAM:
+            case.trans_report.failed('failed to receive response: connection closed by the victim')
+            self._fail_case(case, 'receive failure')
+            return
+        trans_report = case.trans_report
+        trans_report.add('response time', time.time())
+        trans_report.add('response (hex)', LazyValue(hexlify, response))
+        trans_report.add('response (raw)', response)
+        trans_report.add('response length', len(response))
+        case.payload_idx += 1
+        self._next_payload(case)
+
+    def _next_payload(self, case):
+        '''
+        Start sending the next payload of the case, or finish the case if all were sent
+        '''
+        if case.payload_idx >= len(case.payloads):
+            self._close_case(case)
+            return
+        payload = case.payloads[case.payload_idx]
+        trans_report_name = 'transmission_0x%04x' % case.payload_idx
+        trans_report = Report(trans_report_name)
+        trans_report.add('request (hex)', LazyValue(hexlify, payload))
+        trans_report.add('request (raw)', payload)
+        trans_report.add('request length', len(payload))
+        trans_report.add('request time', time.time())
+        case.report.add(trans_report_name, trans_report)
+        case.trans_report = trans_report
+        # partial sends slice the view, not the payload
+        case.out_buf = memoryview(payload)
+        case.state = _Case.SENDING
+        case.deadline = self._get_deadline()
+
+    def _fail_case(self, case, reason):
+        self.logger.info('test %d failed: %s' % (case.index, reason))
+        case.report.failed(reason)
+        self._close_case(case)
+
+    def _close_case(self, case):
+        case.state = _Case.DONE
+        if case.sock is not None:
+            case.sock.close()
+            case.sock = None
@@ -0,0 +1,153 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Adaptive pacing of the tests.
+
+Instead of a fixed delay between tests, the delay is adjusted after each test,
+according to signs that the victim is overwhelmed:
+
+- failure to receive a response
+- waiting for the victim to be alive (see :func:`~kitty.core.actor.KittyActorInterface.is_victim_alive`)
+- transmission latency that is much higher than the baseline latency of the session
+
+When the victim is overwhelmed, the delay is increased sharply (multiplied by ``backoff``),
+otherwise it is decreased slowly (multiplied by ``recovery``), within the configured bounds.
+So the delay settles around the shortest delay the victim can handle,
+and the rate of the tests at that point is reported as the steady-state rate.
+
+:example:
+
+    ::
+
+        fuzzer.set_adaptive_delay(max_delay=2)
+'''
+import time
+from kitty.core import KittyException, KittyObject
+
+
+def _ewma(average, value, alpha):
+    return value if average is None else average + alpha * (value - average)
+
+
+class AdaptiveDelay(KittyObject):
+    '''
+    Controller of the delay between tests
+    '''
+
+    #: smoothing factor of the transmission latency
+    latency_alpha = 0.2
+    #: smoothing factor of the test rate
+    rate_alpha = 0.05
+    #: rate (per test) in which the baseline latency follows a higher latency
+    baseline_drift = 0.01
+
+    def __init__(self, min_delay=0.0, max_delay=5.0, step=0.01, backoff=2.0, recovery=0.9,
+                 latency_factor=2.0, alive_wait_threshold=0.1, logger=None):
+        '''
+        :param min_delay: minimal delay (in seconds) between tests (default: 0.0)
+        :param max_delay: maximal delay (in seconds) between tests (default: 5.0)
+        :param step: minimal increase of the delay, and the delay under which it drops to min_delay (default: 0.01)
+        :param backoff: factor of the delay when the victim is overwhelmed (default: 2.0)
+        :param recovery: factor of the delay when the victim is not overwhelmed (default: 0.9)
+        :param latency_factor: latency (relative to the baseline latency) that is considered overwhelming (default: 2.0)
+        :param alive_wait_threshold: wait time (in seconds) for the victim that is considered overwhelming (default: 0.1)
+        :param logger: logger for the object (default: None)
+        '''
+        super(AdaptiveDelay, self).__init__('AdaptiveDelay', logger)
+        if min_delay < 0 or max_delay < min_delay:
+            raise KittyException('invalid delay bounds: min_delay=%s, max_delay=%s' % (min_delay, max_delay))
+        if backoff <= 1 or not 0 < recovery < 1:
+            raise KittyException('backoff (%s) should be > 1 and recovery (%s) should be between 0 and 1' % (backoff, recovery))
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.step = step
+        self.backoff = backoff
+        self.recovery = recovery
+        self.latency_factor = latency_factor
+        self.alive_wait_threshold = alive_wait_threshold
+        self.delay = min_delay
+        self.backoffs = 0
+        self.last_backoff_reason = None
+        self._latency = None
+        self._baseline_latency = None
+        self._interval = None
+        self._last_observation = None
+
+    def _get_backoff_reason(self, latency, receive_failure, alive_wait):
+        if receive_failure:
+            return 'receive failure'
+        if alive_wait > self.alive_wait_threshold:
+            return 'victim alive wait %.3f seconds' % alive_wait
+        if latency is not None:
+            self._latency = _ewma(self._latency, latency, self.latency_alpha)
+            if self._baseline_latency is None or self._latency < self._baseline_latency:
+                self._baseline_latency = self._latency
+            else:
+                # follow a lasting change in the latency, slowly
+                self._baseline_latency += (self._latency - self._baseline_latency) * self.baseline_drift
+            if self._latency > self._baseline_latency * self.latency_factor + self.step:
+                return 'latency %.3f seconds (baseline %.3f seconds)' % (self._latency, self._baseline_latency)
+        return None
+
+    def observe(self, latency=None, receive_failure=False, alive_wait=0):
+        '''
+        Update the delay according to the signals of the last test
+
+        :param latency: transmission time (in seconds) of the test, None if unknown (default: None)
+        :param receive_failure: did the test fail to receive a response (default: False)
+        :param alive_wait: time (in seconds) the test waited for the victim to be alive (default: 0)
+        :return: the new delay
+        '''
+        now = time.time()
+        if self._last_observation is not None:
+            self._interval = _ewma(self._interval, now - self._last_observation, self.rate_alpha)
+        self._last_observation = now
+        reason = self._get_backoff_reason(latency, receive_failure, alive_wait)
+        if reason:
+            delay = min(self.max_delay, max(self.delay * self.backoff, self.delay + self.step))
+            if delay != self.delay:
+                self.logger.info('increasing the delay between tests to %.3f seconds (%s)', delay, reason)
+            self.delay = delay
+            self.backoffs += 1
+            self.last_backoff_reason = reason
+        else:
+            delay = self.delay * self.recovery
+            self.delay = self.min_delay if delay < self.step else max(self.min_delay, delay)
+        return self.delay
+
+    def get_rate(self):
+        '''
+        :return: the (smoothed) number of tests per second, None if not enough tests were observed
+        '''
+        if not self._interval:
+            return None
+        return 1.0 / self._interval
+
+    def get_status(self):
+        '''
+        :return: dictionary with the state of the controller
+        '''
+        return {
+            'delay': self.delay,
+            'min_delay': self.min_delay,
+            'max_delay': self.max_delay,
+            'rate': self.get_rate(),
+            'latency': self._latency,
+            'baseline_latency': self._baseline_latency,
+            'backoffs': self.backoffs,
+            'last_backoff_reason': self.last_backoff_reason,
+        }
@@ -34,10 +34,41 @@ class ServerFuzzer(BaseFuzzer):
         :param option_line: cmd line options to the fuzzer
         '''
         super(ServerFuzzer, self).__init__(name, logger, option_line)
+        self._render_cache = {}
+        self._snapshot_interval = 0
+        self._snapshot = None
+
+    def set_snapshot_interval(self, interval):
+        '''
+        Send the prefix of the sequence (all templates but the last one)
+        only once per [interval] tests, and restore the state of the victim
+        after the prefix in the other tests.
+        This requires the target to implement the snapshot hooks
+        (:func:`~kitty.targets.server.ServerTarget.save_snapshot` and
+        :func:`~kitty.targets.server.ServerTarget.restore_snapshot`).
+
+        .. note::
+
+            When the prefix is restored, the callbacks of its edges are not called.
+
+        :param interval: number of tests per transmission of the prefix, 0 to disable snapshots (default: 0)
+        '''
+        self._snapshot_interval = interval
+        self._snapshot = None
+        return self
+
+    def handle_stage_changed(self, model):
+        '''
+        handle a stage change in the data model
+
+        :param model: the data model that was changed
+        '''
+        super(ServerFuzzer, self).handle_stage_changed(model)
+        self._render_cache = {}
 
     def _start(self):
         self.logger.info('should keep running? %s' % self._keep_running())
-        while self._keep_running() and self.model.mutate():
+        while self._keep_running() and self._mutate():
             sequence = self.model.get_sequence()
             try:
                 self._run_sequence(sequence)
@@ -65,27 +96,105 @@ class ServerFuzzer(BaseFuzzer):
         session_data = self.target.get_session_data()
         self._test_info()
         resp = None
-        for edge in sequence:
+        cacheable = True
+        prefix_key = self._get_prefix_key(sequence)
+        (start, resp) = self._restore_prefix(prefix_key)
+        for i in range(start, len(sequence)):
+            if i == len(sequence) - 1:
+                self._save_prefix(prefix_key, resp)
+            edge = sequence[i]
             if edge.callback:
-                edge.callback(self, edge, resp)
+                with self.timer.measure('callback'):
+                    edge.callback(self, edge, resp)
+                # the callback might have changed the rest of the templates
+                cacheable = False
             session_data = self.target.get_session_data()
             node = edge.dst
             node.set_session_data(session_data)
-            resp = self._transmit(node)
-        return self._post_test()
+            resp = self._transmit(node, cacheable)
+        failed = self._post_test()
+        if failed:
+            self._snapshot = None
+        return failed
+
+    def _get_prefix_key(self, sequence):
+        '''
+        :return: key of the prefix of the sequence if snapshots can be used for it, None otherwise
+        '''
+        if not self._snapshot_interval or self._in_environment_test or len(sequence) < 2:
+            return None
+        prefix = [edge.dst for edge in sequence[:-1]]
+        if any(node._mutating() for node in prefix):
+            return None
+        return tuple(id(node) for node in prefix)
+
+    def _restore_prefix(self, prefix_key):
+        '''
+        Restore the state of the victim after the prefix, if there is a valid snapshot of it.
+
+        :return: tuple (index of the first edge to transmit, response to the prefix)
+        '''
+        if prefix_key is None or self._snapshot is None:
+            return (0, None)
+        (key, resp, uses) = self._snapshot
+        if key != prefix_key or uses >= self._snapshot_interval:
+            self._snapshot = None
+            return (0, None)
+        if not self.target.restore_snapshot():
+            self.logger.warning('failed to restore snapshot, transmitting the prefix')
+            self._snapshot = None
+            return (0, None)
+        self._snapshot = (key, resp, uses + 1)
+        self.target.report.add('prefix', 'restored from snapshot')
+        return (len(prefix_key), resp)
+
+    def _save_prefix(self, prefix_key, resp):
+        '''
+        Save the state of the victim after the prefix, if it was transmitted in this test.
+        '''
+        if prefix_key is None or self._snapshot is not None:
+            return
+        if self.target.save_snapshot():
+            self._snapshot = (prefix_key, resp, 1)
+
+    def _render(self, node, cacheable=False):
+        '''
+        Render a node.
+        The rendered payload of nodes that are not mutated is cached for the current sequence,
+        as it does not change unless the session data changes.
+
+        :param node: node to render
+        :param cacheable: can the payload be taken from the cache (default: False)
+        :return: rendered payload
+        '''
+        with self.timer.measure('render'):
+            if not cacheable or node._mutating():
+                return node.render().tobytes()
+            session_data = self.target.get_session_data()
+            try:
+                key = (id(node), tuple(sorted(session_data.items())) if session_data else None)
+                payload = self._render_cache.get(key)
+            except TypeError:
+                return node.render().tobytes()
+            if payload is None:
+                payload = node.render().tobytes()
+                self._render_cache[key] = payload
+            return payload
 
-    def _transmit(self, node):
+    def _transmit(self, node, cacheable=False):
         '''
         Transmit node data to target.
 
         :type node:  Template
         :param node: node to transmit
+        :param cacheable: can the rendered payload be taken from the cache (default: False)
         :return: response if there is any
         '''
-        payload = node.render().tobytes()
+        payload = self._render(node, cacheable)
         self._last_payload = payload
         try:
-            return self.target.transmit(payload)
+            with self.timer.measure('transmit'):
+                return self.target.transmit(payload)
         except Exception as e:
             self.logger.error('Error in transmit: %s', e)
             raise
@@ -16,21 +16,285 @@
 # along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
 
 import BaseHTTPServer
+import SocketServer
+import gzip
 import json
+import math
 import datetime
 import time
+import socket
+import threading
 from urlparse import urlparse, parse_qs
+from cStringIO import StringIO
 import os
 
 from kitty.interfaces.base import EmptyInterface
 from kitty.core.threading_utils import FuncThread
+from kitty.data.export import export_reports, FORMATS
+
+
+def _get_eta(info):
+    end_index = info.end_index
+    current_index = info.current_index
+    start_index = info.start_index
+    tests_left = end_index - current_index
+    tests_passed = current_index - start_index
+    current_time = time.time()
+    time_passed = current_time - info.start_time
+    if tests_passed == 0:
+        return 'unknown'
+    else:
+        average_test_time = time_passed / tests_passed
+        eta = average_test_time * tests_left
+        return str(datetime.timedelta(seconds=int(eta)))
+
+
+def _json_object(entries):
+    '''
+    :param entries: dictionary of key/serialized (JSON) value
+    :return: JSON object with the entries
+    '''
+    return '{%s}' % ', '.join('%s: %s' % (json.dumps(k), v) for (k, v) in sorted(entries.items()))
+
+
+class _StatsCache(object):
+    '''
+    Stats that are shared by all the clients of the web interface.
+    They are collected from the data manager at most once every ``refresh_interval`` seconds,
+    regardless of the number of clients, and each entry is serialized only when it changes.
+
+    Each change increments the version of the stats,
+    so clients can ask only for the entries that changed since the version they have.
+    '''
+
+    def __init__(self, interface, refresh_interval):
+        '''
+        :param interface: the web interface
+        :param refresh_interval: minimal time (in seconds) between two refreshes
+        '''
+        self._interface = interface
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._last_refresh = None
+        self._serialized = {}
+        self._versions = {}
+        self.version = 0
+        self.last_report = None
+
+    def _collect(self):
+        interface = self._interface
+        dataman = interface.dataman
+        session_info = dataman.get_session_info()
+        values = dataman.get_values([
+            'fuzzer_name', 'session_file_name', 'log_file_name', 'test_info', 'phase_timing', 'profiler', 'pacer'
+        ])
+        report_counts, self.last_report = dataman.get_report_summary()
+        stats = session_info.as_dict()
+        # the timing is published (from the live timer) under its own key
+        del stats['phase_timing']
+        stats['fuzzer_name'] = values['fuzzer_name']
+        stats['session_file_name'] = values['session_file_name']
+        stats['log_file_name'] = values['log_file_name']
+        return {
+            'paused': interface.is_paused(),
+            'eta': _get_eta(session_info),
+            'stats': stats,
+            'current_test': values['test_info'],
+            'report_counts': report_counts,
+            'last_report': self.last_report,
+            'phase_timing': values['phase_timing'].to_dict() if values['phase_timing'] else None,
+            'profiler': values['profiler'].get_status() if values['profiler'] else None,
+            'pacing': values['pacer'].get_status() if values['pacer'] else None,
+        }
+
+    def _refresh(self):
+        now = time.time()
+        if self._last_refresh is not None and now - self._last_refresh < self._refresh_interval:
+            return
+        self._last_refresh = now
+        new_version = self.version + 1
+        for (key, value) in self._collect().items():
+            serialized = json.dumps(value, sort_keys=True)
+            if self._serialized.get(key) != serialized:
+                self._serialized[key] = serialized
+                self._versions[key] = new_version
+                self.version = new_version
+
+    def get(self, since=0):
+        '''
+        :param since: version of the stats the client has (default: 0)
+        :return: tuple (current version, dictionary of key/serialized value
+            of the entries that changed after ``since``)
+        '''
+        with self._lock:
+            self._refresh()
+            return (self.version, {k: v for (k, v) in self._serialized.items() if self._versions[k] > since})
+
+
+def _format_event(version, changes):
+    return 'id: %d\nevent: stats\ndata: %s\n\n' % (version, _json_object(changes))
+
+
+class _StatsPublisher(object):
+    '''
+    Pushes the changes in the stats to the clients of the events endpoint (Server-Sent Events).
+    A single thread serializes each change once and writes it to all subscribers,
+    so the load does not grow with the number of dashboards.
+    '''
+
+    #: time (in seconds) without changes after which a keep-alive comment is sent
+    keepalive_interval = 15
+    #: timeout (in seconds) for writing an event to a subscriber, slower subscribers are dropped
+    send_timeout = 2
+
+    def __init__(self, cache, interval, logger):
+        '''
+        :param cache: the stats cache
+        :param interval: time (in seconds) between two checks for changes
+        :param logger: logger
+        '''
+        self._cache = cache
+        self._interval = interval
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._subscribers = []
+        self._version = 0
+        self._thread = None
+
+    def subscribe(self, sock, version):
+        '''
+        :param sock: connection to the subscriber (after the response headers were sent)
+        :param version: version of the stats the subscriber has
+        '''
+        sock.settimeout(self.send_timeout)
+        with self._lock:
+            self._subscribers.append((sock, version))
+            if self._thread is None:
+                self._stop_event.clear()
+                self._thread = FuncThread(self._loop)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def subscriber_count(self):
+        '''
+        :return: number of subscribers
+        '''
+        with self._lock:
+            return len(self._subscribers)
+
+    def _send(self, subscribers, message):
+        dropped = []
+        for sock in subscribers:
+            try:
+                sock.sendall(message)
+            except Exception as ex:
+                self.logger.debug('dropping events subscriber: %s' % ex)
+                dropped.append(sock)
+        return dropped
+
+    def _loop(self):
+        last_sent = time.time()
+        while not self._stop_event.wait(self._interval):
+            with self._lock:
+                subscribers = self._subscribers
+                self._subscribers = []
+                if not subscribers:
+                    self._thread = None
+                    return
+            updates = {}
+            for (_, version) in subscribers:
+                if version not in updates:
+                    (current, changes) = self._cache.get(version)
+                    updates[version] = (current, _format_event(current, changes) if changes else None)
+            keepalive = time.time() - last_sent > self.keepalive_interval
+            remaining = []
+            for (version, (current, message)) in updates.items():
+                socks = [sock for (sock, v) in subscribers if v == version]
+                if message is None and keepalive:
+                    message = ': keepalive\n\n'
+                dropped = self._send(socks, message) if message is not None else []
+                for sock in socks:
+                    if sock in dropped:
+                        self._close(sock)
+                    else:
+                        remaining.append((sock, current))
+            if any(message is not None for (_, message) in updates.values()) or keepalive:
+                last_sent = time.time()
+            with self._lock:
+                self._subscribers += remaining
+        with self._lock:
+            self._thread = None
+
+    def _close(self, sock):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        sock.close()
+
+    def stop(self):
+        '''
+        Stop publishing and close all subscribers
+        '''
+        self._stop_event.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            subscribers = self._subscribers
+            self._subscribers = []
+        for (sock, _) in subscribers:
+            self._close(sock)
+
 
+# longest profiling session that can be started from the web interface, in seconds
+_MAX_PROFILING_DURATION = 600
 
-class _WebInterfaceServer(BaseHTTPServer.HTTPServer):
+_STATIC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'web')
+
+
+class _StaticFiles(object):
+    '''
+    In-memory cache of the static files of the web interface,
+    each file is read from the disk only once
+    '''
+
+    def __init__(self, root):
+        '''
+        :param root: root directory of the static files
+        '''
+        self._root = root
+        self._lock = threading.Lock()
+        self._files = {}
+
+    def get(self, subdir, filename):
+        '''
+        :param subdir: sub directory of the file
+        :param filename: name of the file
+        :return: content of the file
+        :raises: IOError if the file does not exist
+        '''
+        key = (subdir, filename)
+        with self._lock:
+            if key not in self._files:
+                with open(os.path.join(self._root, subdir, filename), 'rb') as the_file:
+                    self._files[key] = the_file.read()
+            return self._files[key]
+
+
+class _WebInterfaceServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
     '''
     http://docs.python.org/lib/module-BaseHTTPServer.html
+
+    Each request is handled in its own thread,
+    so a slow client does not block the other clients.
     '''
 
+    daemon_threads = True
+    allow_reuse_address = True
+
     def __init__(self, server_address, handler, interface):
         '''
         :param server_address: address of the server
@@ -42,6 +306,22 @@ class _WebInterfaceServer(BaseHTTPServer.HTTPServer):
         self.interface = interface
         self.RequestHandlerClass.logger = interface.logger
         self.RequestHandlerClass.dataman = interface.dataman
+        self._detached = set()
+
+    def detach(self, request):
+        '''
+        Keep the connection of the request open after the request is handled
+        (it is owned by the events publisher from now on)
+
+        :param request: the request (connection)
+        '''
+        self._detached.add(request)
+
+    def shutdown_request(self, request):
+        if request in self._detached:
+            self._detached.remove(request)
+            return
+        BaseHTTPServer.HTTPServer.shutdown_request(self, request)
 
     @classmethod
     def log_message(cls, dummy1, *dummy2):
@@ -56,6 +336,16 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     '''
     Our HTTP request handler
     '''
+
+    #: maximal number of reports that are returned in a single response
+    report_page_size = 1000
+    #: timeout (in seconds) for socket operations of a request
+    timeout = 10
+    #: minimal size of a JSON response to be compressed (if the client accepts gzip)
+    gzip_min_size = 1024
+    #: cache of the static files
+    static_files = _StaticFiles(_STATIC_DIR)
+
     def __init__(self, request, client_address, server):
         '''
         :param request: the request from the client
@@ -80,14 +370,35 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     def _resume_fuzzer(self):
         self.server.interface.resume()
 
+    def _start_profiling(self):
+        '''
+        Start the sampling profiler of the fuzzer
+        (query parameter: duration, in seconds, default: 30, capped at 600)
+
+        :return: the status of the profiler
+        '''
+        profiler = self.dataman.get('profiler')
+        if profiler is None:
+            return json.dumps({'error': 'profiling is not supported by the fuzzer'})
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            duration = float(query['duration'][0]) if 'duration' in query else 30
+        except ValueError as ex:
+            return json.dumps({'error': 'invalid duration: %s' % ex})
+        if math.isnan(duration) or math.isinf(duration) or duration <= 0:
+            return json.dumps({'error': 'invalid duration: %s, should be a positive number' % duration})
+        duration = min(duration, _MAX_PROFILING_DURATION)
+        filename = profiler.start(duration)
+        status = profiler.get_status()
+        if filename is None:
+            status['error'] = 'profiler is already running'
+        return json.dumps(status)
+
     def _handle_image_request(self, content_type='image/jpeg'):
         path = self.path
         filename = path.split('/')[-1]
         try:
-            this_dir = os.path.dirname(os.path.realpath(__file__))
-            file_path = os.path.join(this_dir, 'web', 'images', filename)
-            imgf = open(file_path, 'rb')
-            buff = imgf.read()
+            buff = self.static_files.get('images', filename)
             self.send_response(200)
             self.send_header('Content-type', content_type)
             self.send_header('Content-Length', '%d' % len(buff))
@@ -125,10 +436,7 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
                 if extension == 'js':
                     extension = 'javascript'
                 content_type = 'text/' + extension
-            this_dir = os.path.dirname(os.path.realpath(__file__))
-            file_path = os.path.join(this_dir, 'web', 'static', filename)
-            with open(file_path, 'rb') as the_file:
-                buff = the_file.read()
+            buff = self.static_files.get('static', filename)
             self.send_response(200)
             self.send_header('Content-type', content_type)
             self.send_header('Content-Length', '%d' % len(buff))
@@ -140,51 +448,171 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     def _handle_index(self):
         return self._handle_text_request('index.html', 'text/html')
 
-    def _get_eta(self, info):
-        end_index = info.end_index
-        current_index = info.current_index
-        start_index = info.start_index
-        tests_left = end_index - current_index
-        tests_passed = current_index - start_index
-        current_time = time.time()
-        time_passed = current_time - info.start_time
-        if tests_passed == 0:
-            return 'unknown'
-        else:
-            average_test_time = time_passed / tests_passed
-            eta = average_test_time * tests_left
-            return str(datetime.timedelta(seconds=int(eta)))
+    def _send_json(self, body, etag=None):
+        '''
+        Send the response headers for a JSON response,
+        or a 304 (Not Modified) response if the client already has this version
+
+        The response is compressed if it is large enough and the client accepts gzip.
+
+        :param body: the JSON response
+        :param etag: entity tag of the response (default: None)
+        :return: the body to send
+        '''
+        compress = len(body) >= self.gzip_min_size and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if compress and etag is not None:
+            etag = etag[:-1] + '-gzip"'
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return ''
+        if compress:
+            body = self._gzip(body)
+        self.send_response(200)
+        self.send_header('Content-type', 'text/json')
+        self.send_header('Content-Length', '%d' % len(body))
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Vary', 'Accept-Encoding')
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        return body
+
+    def _gzip(self, data):
+        buff = StringIO()
+        with gzip.GzipFile(fileobj=buff, mode='wb', compresslevel=6) as gz:
+            gz.write(data)
+        return buff.getvalue()
 
     def _get_stats(self):
-        is_paused = self.server.interface.is_paused()
-        session_info = self.dataman.get_session_info()
-        eta_s = self._get_eta(session_info)
-        stats = session_info.as_dict()
-        stats['fuzzer_name'] = self.dataman.get('fuzzer_name')
-        stats['session_file_name'] = self.dataman.get('session_file_name')
-        stats['log_file_name'] = self.dataman.get('log_file_name')
-        report_list = self.dataman.get_report_list()
-        resp_dict = {
-            'paused': is_paused,
-            'eta': eta_s,
-            'stats': stats,
-            'current_test': self.dataman.get('test_info'),
-            'reports_extended': report_list,
-        }
-        return json.dumps(resp_dict)
+        cache = self.server.interface._stats_cache
+        version, entries = cache.get()
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            after = self._get_int_param(query, 'reports_after')
+        except ValueError:
+            after = None
+        if after is not None and after == cache.last_report:
+            report_list, reports_next = [], after
+        else:
+            report_list, reports_next = self.dataman.get_report_page(after, self.report_page_size)
+        del entries['last_report']
+        entries['reports_extended'] = json.dumps(report_list)
+        entries['reports_next'] = json.dumps(reports_next)
+        return self._send_json(_json_object(entries), '"%d-%s-%s"' % (version, after, reports_next))
+
+    def _get_stats_delta(self):
+        '''
+        :return: the stats entries that changed since a given version
+            (query parameter: since)
+        '''
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            since = self._get_int_param(query, 'since', 0)
+        except ValueError:
+            return self._send_json(json.dumps({'error': 'since should be a version number'}))
+        version, changes = self.server.interface._stats_cache.get(since)
+        body = '{"version": %d, "changes": %s}' % (version, _json_object(changes))
+        return self._send_json(body, '"%d-%d"' % (version, since))
+
+    def _export_reports(self):
+        '''
+        Stream the reports, query parameters:
+        format (ndjson or tar), status, start and end (test id range),
+        after (cursor to resume an interrupted export).
+        '''
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            fmt = query['format'][0] if 'format' in query else 'ndjson'
+            if fmt not in FORMATS:
+                raise ValueError('format should be one of %s' % FORMATS)
+            after = self._get_int_param(query, 'after')
+            start = self._get_int_param(query, 'start')
+            end = self._get_int_param(query, 'end')
+            status = query['status'][0] if 'status' in query else None
+        except ValueError as ex:
+            return self._send_json(json.dumps({'error': 'Failed to export reports %s' % ex}))
+        self.send_response(200)
+        if fmt == 'tar':
+            self.send_header('Content-type', 'application/x-tar')
+            self.send_header('Content-Disposition', 'attachment; filename="reports.tar"')
+        else:
+            self.send_header('Content-type', 'application/x-ndjson')
+        self.end_headers()
+        count = export_reports(self.dataman, self.wfile, fmt, after, status, start, end)
+        self.logger.debug('exported %d reports' % count)
+        return ''
+
+    def _subscribe_events(self):
+        '''
+        Start a Server-Sent Events stream of the stats.
+        The first event contains all the entries (or the entries that changed since
+        the Last-Event-ID), later events contain only the changed entries.
+        '''
+        try:
+            since = int(self.headers.get('Last-Event-ID', 0))
+        except ValueError:
+            since = 0
+        version, changes = self.server.interface._stats_cache.get(since)
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if changes:
+            self.wfile.write(_format_event(version, changes))
+        self.wfile.flush()
+        self.close_connection = 1
+        self.server.detach(self.request)
+        self.server.interface._publisher.subscribe(self.request, version)
+        return ''
+
+    def _get_int_param(self, query, name, default=None):
+        if name in query:
+            return int(query[name][0])
+        return default
+
+    def _get_report_list(self):
+        '''
+        :return: page of the report list,
+            query parameters: after (cursor from previous page), limit and status
+        '''
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            after = self._get_int_param(query, 'after')
+            limit = min(self._get_int_param(query, 'limit', self.report_page_size), self.report_page_size)
+            status = query['status'][0] if 'status' in query else None
+            reports, next_cursor = self.dataman.get_report_page(after, limit, status)
+            response = {
+                'reports': reports,
+                'next': next_cursor,
+                'count': self.dataman.get_report_count(status),
+            }
+        except Exception as ex:
+            response = {'error': 'Failed to get report list %s' % ex}
+        return json.dumps(response)
 
     def _handle_api_request(self):
         parsed = urlparse(self.path)
         path = parsed.path.lower()[5:]
 
         response = None
-        data_type = 'text/json'
         if path == 'stats.json':
-            response = self._get_stats()
+            return self._get_stats()
+        elif path == 'stats_delta.json':
+            return self._get_stats_delta()
+        elif path == 'events':
+            return self._subscribe_events()
         elif path == 'template_info.json':
             response = json.dumps(self.dataman.get('template_info'))
         elif path == 'stages.json':
             response = json.dumps(self.dataman.get('stages'))
+        elif path == 'reports.json':
+            response = self._get_report_list()
+        elif path == 'export':
+            return self._export_reports()
         elif path.startswith('report'):
             response = self._get_report()
         elif path == 'action/pause':
@@ -193,10 +621,10 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
         elif path == 'action/resume':
             response = ''
             self._resume_fuzzer()
+        elif path == 'action/profile':
+            response = self._start_profiling()
         if response is not None:
-            self.send_response(200)
-            self.send_header('Content-type', data_type)
-            self.end_headers()
+            response = self._send_json(response)
         return response
 
     def _get_report(self):
@@ -261,18 +689,40 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
 
 class WebInterface(EmptyInterface):
     '''
-    Web UI for the fuzzer
+    Web UI for the fuzzer.
+
+    Besides the UI, the web server provides the following API:
+
+    - ``/api/stats.json`` - fuzzing stats, per-phase timing of the tests (see :mod:`kitty.data.timing`)
+      and a page of the report list (after the ``reports_after`` cursor)
+    - ``/api/stats_delta.json?since=<version>`` - only the stats entries that changed
+      since the given version
+    - ``/api/events`` - Server-Sent Events stream of the changes in the stats
+    - ``/api/reports.json`` - page of the report list
+    - ``/api/report?report_id=<id>`` - a single report
+    - ``/api/action/profile?duration=<seconds>`` - start the sampling profiler of the fuzzer
+      (see :func:`~kitty.fuzzers.base.BaseFuzzer.start_profiling`), its status is in the stats
+    - ``/api/export`` - stream of the reports (see :mod:`kitty.data.export`),
+      query parameters: ``format`` (ndjson or tar), ``status``, ``start``, ``end`` and ``after``
+
+    The stats are collected from the fuzzer at most once every ``stats_refresh_interval`` seconds,
+    regardless of the number of clients, and the stats responses support ETag / If-None-Match.
+    Requests are handled concurrently, large JSON responses are compressed
+    (if the client accepts gzip) and the static files are served from memory.
     '''
 
-    def __init__(self, host='127.0.0.1', port=26000):
+    def __init__(self, host='127.0.0.1', port=26000, stats_refresh_interval=0.5):
         '''
         :param host: listening address
         :param port: listening port
+        :param stats_refresh_interval: minimal time (in seconds) between two collections of the stats (default: 0.5)
         '''
         super(WebInterface, self).__init__('WebInterface')
         self._host = host
         self._port = port
         self._web_thread = FuncThread(self._server_func)
+        self._stats_cache = _StatsCache(self, stats_refresh_interval)
+        self._publisher = _StatsPublisher(self._stats_cache, max(stats_refresh_interval, 0.1), self.logger)
 
     def _start(self):
         self._web_thread.start()
@@ -290,9 +740,9 @@ class WebInterface(EmptyInterface):
     def _server_func(self):
         server = _WebInterfaceServer((self._host, self._port), _WebInterfaceHandler, self)
         self._server = server
-        server.allow_reuse_address = True
         server.serve_forever()
 
     def _stop(self, timeout=None):
+        self._publisher.stop()
         self._server.shutdown()
         self._server.server_close()
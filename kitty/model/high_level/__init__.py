@@ -20,6 +20,7 @@ This package contains the high level data model, which represents sequences and
 transition between messages.
 '''
 from kitty.model.high_level.base import *
+from kitty.model.high_level.combined import *
 from kitty.model.high_level.graph import *
 from kitty.model.high_level.random_sequence import *
 from kitty.model.high_level.staged_sequence import *
@@ -189,7 +189,7 @@ class BaseModel(KittyObject):
         sequence = self.get_sequence()
         return {
             'current': [e.dst.get_name() for e in sequence],
-            'stages': {e.src.get_name(): [e.dst.get_name()] for e in sequence}
+            'stages': {(e.src.get_name() if e.src else 'Start'): [e.dst.get_name()] for e in sequence}
         }
 
     def set_notification_handler(self, handler):
@@ -203,3 +203,29 @@ class BaseModel(KittyObject):
             - handle_stage_changed(data_model)
         '''
         self._notification_handler = handler
+
+    def get_feedback_context(self):
+        '''
+        Fuzzers that run multiple tests at the same time (e.g. ConcurrentServerFuzzer)
+        get the feedback of a test after the model moved on to other tests.
+        They keep the context of the test, and pass it to :func:`handle_feedback` with its feedback.
+
+        :return: context of the current test (default: None)
+        '''
+        return None
+
+    def handle_feedback(self, feedback, context=None):
+        '''
+        Handle feedback regarding the current test.
+        It is called by the fuzzer after each test with the feedback from the test report
+        (see :func:`~kitty.data.report.Report.get_feedback`).
+
+        :param feedback: numeric feedback signal, positive if the test exposed new behaviour
+        :param context: context of the test (see :func:`get_feedback_context`), None for the current test (default: None)
+
+        .. note::
+
+            by default, the feedback is ignored.
+            Take a look at StagedSequenceModel for actual implementation.
+        '''
+        pass
@@ -0,0 +1,230 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Model that interleaves the cases of a structural model (e.g. GraphModel)
+and a sequence model (e.g. StagedSequenceModel) in a single session.
+'''
+from kitty.model.high_level.base import BaseModel
+from kitty.core import KittyException, khash
+
+
+class CombinedModel(BaseModel):
+    '''
+    The CombinedModel interleaves the cases of two models in a single session,
+    so the setup of the target (and the environment test) is shared by both kinds of cases.
+    Usually, one of them is a :class:`~kitty.model.high_level.graph.GraphModel`,
+    that mutates the structure of the templates,
+    and the other is a :class:`~kitty.model.high_level.staged_sequence.StagedSequenceModel`,
+    that mutates the sequence of the templates.
+
+    The cases are split into rounds, each round contains **structural_weight** cases
+    of the structural model, followed by **sequence_weight** cases of the sequence model.
+    Once one of the models is exhausted, the rest of the cases are of the other model.
+    The total number of cases is the sum of the number of cases of both models,
+    so the budget of each kind of case is controlled by the models themselves,
+    and the weights control how they are interleaved.
+
+    Each index of the combined model is mapped directly to an index of one of the models,
+    so skipping to an index does not require generating the cases before it.
+
+    :example:
+
+        ::
+
+            structural = GraphModel()
+            structural.connect(CreateA)
+            structural.connect(CreateA, UseA)
+            sequence = StagedSequenceModel(num_mutations=1000)
+            sequence.add_stage(stage1)
+            sequence.add_stage(stage2)
+            # 3 structural cases for each sequence case
+            model = CombinedModel(structural, sequence, structural_weight=3, sequence_weight=1)
+    '''
+
+    def __init__(self, structural, sequence, structural_weight=1, sequence_weight=1, name='CombinedModel'):
+        '''
+        :type structural: :class:`~kitty.model.high_level.base.BaseModel`
+        :param structural: structural model (e.g. GraphModel)
+        :type sequence: :class:`~kitty.model.high_level.base.BaseModel`
+        :param sequence: sequence model (e.g. StagedSequenceModel)
+        :param structural_weight: number of structural cases in each round (default: 1)
+        :param sequence_weight: number of sequence cases in each round (default: 1)
+        :param name: name of the model (default: 'CombinedModel')
+        '''
+        super(CombinedModel, self).__init__(name)
+        if structural_weight < 0 or sequence_weight < 0:
+            raise KittyException('weights must not be negative (%s, %s)' % (structural_weight, sequence_weight))
+        if structural_weight + sequence_weight == 0:
+            raise KittyException('at least one of the weights should be positive')
+        self._models = [structural, sequence]
+        self._weights = [structural_weight, sequence_weight]
+        self._counts = None
+        self._active = structural
+        # while _mutate mutates the active model, its notifications are collected and sent once
+        self._mutating = False
+        self._active_changed = False
+        for model in self._models:
+            model.set_notification_handler(self)
+
+    def _get_ready(self):
+        if not self._ready:
+            self._counts = [model.num_mutations() for model in self._models]
+            for i in range(len(self._models)):
+                if not self._weights[i]:
+                    self._counts[i] = 0
+            self._num_mutations = sum(self._counts)
+            if self._counts[0] == 0 and self._counts[1]:
+                self._active = self._models[1]
+            self._ready = True
+
+    def _locate(self, index):
+        '''
+        :param index: index in the combined model
+        :return: tuple (model index, index in the model)
+        '''
+        (count_s, count_q) = self._counts
+        (weight_s, weight_q) = self._weights
+        rounds = min(count_s // weight_s if weight_s else 0, count_q // weight_q if weight_q else 0)
+        period = weight_s + weight_q
+        if index < rounds * period:
+            (round_idx, offset) = divmod(index, period)
+            if offset < weight_s:
+                return (0, round_idx * weight_s + offset)
+            return (1, round_idx * weight_q + offset - weight_s)
+        index -= rounds * period
+        left_s = count_s - rounds * weight_s
+        left_q = count_q - rounds * weight_q
+        # last (partial) round
+        partial_s = min(weight_s, left_s)
+        if index < partial_s:
+            return (0, rounds * weight_s + index)
+        index -= partial_s
+        partial_q = min(weight_q, left_q)
+        if index < partial_q:
+            return (1, rounds * weight_q + index)
+        index -= partial_q
+        # only one of the models may have cases left at this point
+        if index < left_s - partial_s:
+            return (0, rounds * weight_s + partial_s + index)
+        index -= left_s - partial_s
+        return (1, rounds * weight_q + partial_q + index)
+
+    def _mutate(self):
+        (model_idx, index) = self._locate(self._current_index)
+        model = self._models[model_idx]
+        self._active_changed = model is not self._active
+        self._active = model
+        self._mutating = True
+        try:
+            to_skip = index - model.current_index() - 1
+            if to_skip > 0:
+                model.skip(to_skip)
+            model.mutate()
+        finally:
+            self._mutating = False
+        if self._active_changed and self._notification_handler:
+            self._notification_handler.handle_stage_changed(self)
+
+    def skip(self, count):
+        '''
+        :param count: number of cases to skip
+        :return: number of cases skipped
+        '''
+        self._get_ready()
+        skipped = max(0, min(count, self.last_index() - self._current_index))
+        if skipped:
+            self._current_index += skipped
+            self._mutate()
+        return skipped
+
+    def handle_stage_changed(self, model):
+        '''
+        Forward stage change notifications of the active model
+
+        :param model: the model that was changed
+        '''
+        if model is not self._active:
+            return
+        if self._mutating:
+            self._active_changed = True
+        elif self._notification_handler:
+            self._notification_handler.handle_stage_changed(self)
+
+    def get_feedback_context(self):
+        '''
+        :return: the active model and its context of the current test
+        '''
+        return (self._active, self._active.get_feedback_context())
+
+    def handle_feedback(self, feedback, context=None):
+        '''
+        Pass the feedback of a test to the model of the test
+
+        :param feedback: numeric feedback signal, positive if the test exposed new behaviour
+        :param context: context of the test (see :func:`get_feedback_context`), None for the current test (default: None)
+        '''
+        if context is None:
+            self._active.handle_feedback(feedback)
+        else:
+            (model, model_context) = context
+            model.handle_feedback(feedback, model_context)
+
+    def get_active_model(self):
+        '''
+        :return: the model of the current case
+        '''
+        self._get_ready()
+        return self._active
+
+    def get_sequence(self):
+        self._get_ready()
+        return self._active.get_sequence()
+
+    def get_stages(self):
+        self._get_ready()
+        return self._active.get_stages()
+
+    def get_template_info(self):
+        self._get_ready()
+        return self._active.get_template_info()
+
+    def get_model_info(self):
+        self._get_ready()
+        info = {}
+        info['model_name'] = self.name
+        info['weights'] = {
+            'structural': self._weights[0],
+            'sequence': self._weights[1],
+        }
+        info['structural'] = self._models[0].get_model_info()
+        info['sequence'] = self._models[1].get_model_info()
+        return info
+
+    def get_test_info(self):
+        info = super(CombinedModel, self).get_test_info()
+        info['model'] = {
+            'name': self._active.get_name(),
+            'index': self._active.current_index(),
+            'info': self._active.get_test_info(),
+        }
+        return info
+
+    def hash(self):
+        hashed = super(CombinedModel, self).hash()
+        # ordered, as the weights and the order of the models determine the test of each index
+        return khash(hashed, tuple(self._weights), tuple(model.hash() for model in self._models))
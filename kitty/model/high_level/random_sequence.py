@@ -24,7 +24,7 @@ class RandomSequenceModel(StagedSequenceModel):
     It is like :class:`~kitty.model.high_level.staged_sequence.StagedSequenceModel` with a signle stage.
     '''
 
-    def __init__(self, name='RandomSequenceModel', seed=None, callback_generator=None, num_mutations=1000, max_sequence=10):
+    def __init__(self, name='RandomSequenceModel', seed=None, callback_generator=None, num_mutations=1000, max_sequence=10, corpus=None):
         '''
         :param name: name of the model object (default: 'RandomSequenceModel')
         :type seed: int
@@ -33,8 +33,10 @@ class RandomSequenceModel(StagedSequenceModel):
         :param callback_generator: a function that returns callback functions (default: None)
         :param num_mutations: number of mutations to perform (defualt: 1000)
         :param max_sequence: maximum sequence length (default: 10)
+        :type corpus: :class:`~kitty.model.high_level.staged_sequence.SequenceCorpus`
+        :param corpus: corpus for feedback based scheduling of sequences (default: None)
         '''
-        super(RandomSequenceModel, self).__init__(name, callback_generator, num_mutations)
+        super(RandomSequenceModel, self).__init__(name, callback_generator, num_mutations, corpus)
         self._max_sequence = max_sequence
         self.seed = seed
         strategy = '1-%d' % max_sequence
@@ -23,7 +23,7 @@ Currently, perform no special operation for mutations on the nodes.
 import random
 import re
 from kitty.model.high_level.base import Connection, BaseModel
-from kitty.core import KittyObject, KittyException, khash
+from kitty.core import KittyObject, KittyException, khash, kseed
 
 
 class Stage(KittyObject):
@@ -36,8 +36,13 @@ class Stage(KittyObject):
     - for exact length - '12'
     - for length in range - '1-3'
     - for all - 'all'
-    '''
 
+    When a mutation index is passed to :func:`mutate`,
+    the sequence is derived only from the seed of the stage, its name and the index,
+    so any sequence can be reproduced without generating the sequences before it.
+    Stages that are not seeded use a fixed seed for the index-derived sequences.
+    '''
+    _default_index_seed = 1235
     _const_pattern = r'^\d{1,10}$'
     _random_pattern = r'^random$'
     _all_pattern = r'^all$'
@@ -56,8 +61,11 @@ class Stage(KittyObject):
         self._max_sequence = None
         self._r = random.Random()
         self._seed = seed
-        if seed:
+        if seed is not None:
             self._r.seed(seed)
+            self._index_seed = seed
+        else:
+            self._index_seed = Stage._default_index_seed
         self._ready = False
         self._validate_strategy(selection_strategy)
 
@@ -115,10 +123,19 @@ class Stage(KittyObject):
                     raise KittyException('bad range strategy %s, max > template count(%s)' % (self._max_sequence, len(self._templates)))
             self._ready = True
 
-    def mutate(self):
+    def mutate(self, prefix=(), index=None):
+        '''
+        :param prefix: templates to start the sequence with (default: ())
+        :param index: mutation index to derive the sequence from,
+            if None - use the next sequence from the stage's RNG (default: None)
+        :return: templates of the new sequence mutation
+        '''
         self._get_ready()
-        sequence_size = self._r.randint(self._min_sequence, self._max_sequence)
-        self._current_sequence_templates = tuple(self._r.sample(self._templates, sequence_size))
+        if index is not None:
+            self._r.seed(kseed(self._index_seed, self.name, index))
+        sequence_size = self._r.randint(max(self._min_sequence, len(prefix)), self._max_sequence)
+        templates = [t for t in self._templates if t not in prefix]
+        self._current_sequence_templates = tuple(prefix) + tuple(self._r.sample(templates, sequence_size - len(prefix)))
         return self._current_sequence_templates
 
     def get_sequence_templates(self):
@@ -131,12 +148,148 @@ class Stage(KittyObject):
         return '%s(%s from %s)' % (self.name, self._strategy, len(self._templates))
 
     def hash(self):
-        hashed = khash(self._strategy, self._seed)
+        hashed = khash((self.name, self._strategy, self._seed))
         for t in self._templates:
             hashed = khash(hashed, t.hash())
         return hashed
 
 
+class _CorpusEntry(object):
+    '''
+    An entry in the :class:`~kitty.model.high_level.staged_sequence.SequenceCorpus`
+    '''
+
+    def __init__(self, stages, energy):
+        '''
+        :param stages: tuple of template tuples (one per stage)
+        :param energy: initial energy of the entry
+        '''
+        self.stages = stages
+        self.energy = energy
+        self.selected = 0
+
+
+#: default parent of :func:`SequenceCorpus.feedback`, the entry of the last selected prefix
+_LAST_SELECTED = object()
+
+
+class SequenceCorpus(KittyObject):
+    '''
+    A bounded corpus of sequences that exposed new behaviour of the target.
+    It is used by :class:`~kitty.model.high_level.staged_sequence.StagedSequenceModel`
+    to prioritise prefixes of sequences that produced novel feedback.
+
+    Each entry has an energy, which is initially the feedback signal of its sequence.
+    When asked for a prefix, the corpus selects an entry at random (weighted by energy)
+    and returns a random prefix of it.
+    The energy of the selected entry decays with each selection,
+    and is increased when a sequence that was derived from it produces novel feedback as well.
+    When the corpus is full, the entry with the lowest energy is evicted.
+    '''
+
+    def __init__(self, max_size=100, exploit_ratio=0.5, decay=0.8, seed=None, name='SequenceCorpus'):
+        '''
+        :param max_size: maximal number of entries in the corpus (default: 100)
+        :param exploit_ratio: ratio of sequences that are derived from the corpus (default: 0.5)
+        :param decay: energy decay factor for each selection of an entry (default: 0.8)
+        :param seed: RNG seed (default: None)
+        :param name: name of the corpus (default: 'SequenceCorpus')
+        '''
+        super(SequenceCorpus, self).__init__(name)
+        if max_size <= 0:
+            raise KittyException('max_size (%d) <= 0' % max_size)
+        if not (0 <= exploit_ratio <= 1):
+            raise KittyException('exploit_ratio (%s) is not between 0 and 1' % exploit_ratio)
+        if not (0 < decay <= 1):
+            raise KittyException('decay (%s) is not in the range (0, 1]' % decay)
+        self._max_size = max_size
+        self._exploit_ratio = exploit_ratio
+        self._decay = decay
+        self._seed = seed
+        self._r = random.Random()
+        self._entries = []
+        self._parent = None
+        self.reset()
+
+    def reset(self):
+        '''
+        Clear the corpus and reseed its RNG
+        '''
+        if self._seed is not None:
+            self._r.seed(self._seed)
+        self._entries = []
+        self._parent = None
+
+    def size(self):
+        '''
+        :return: number of entries in the corpus
+        '''
+        return len(self._entries)
+
+    def select(self):
+        '''
+        Select a prefix for the next sequence.
+
+        :return: list of template tuples (one per stage, the last one may be partial),
+            or None if the next sequence should not be derived from the corpus
+        '''
+        self._parent = None
+        if not self._entries:
+            return None
+        if self._r.random() >= self._exploit_ratio:
+            return None
+        point = self._r.uniform(0, sum(e.energy for e in self._entries))
+        for entry in self._entries:
+            point -= entry.energy
+            if point <= 0:
+                break
+        entry.energy *= self._decay
+        entry.selected += 1
+        self._parent = entry
+        stage_idx = self._r.randint(0, len(entry.stages) - 1)
+        cut = self._r.randint(0, len(entry.stages[stage_idx]))
+        return list(entry.stages[:stage_idx]) + [entry.stages[stage_idx][:cut]]
+
+    def get_parent(self):
+        '''
+        :return: the entry that the last selected prefix was taken from, None if no prefix was selected
+        '''
+        return self._parent
+
+    def feedback(self, stages, feedback, parent=_LAST_SELECTED):
+        '''
+        Handle the feedback of a sequence
+
+        :param stages: list of template tuples (one per stage) of the sequence
+        :param feedback: feedback signal of the sequence
+        :param parent: the entry that the prefix of the sequence was taken from (see :func:`get_parent`)
+            (default: the entry of the last selected prefix)
+        '''
+        if not feedback or feedback <= 0:
+            return
+        if parent is _LAST_SELECTED:
+            parent = self._parent
+        if parent is not None:
+            parent.energy += feedback
+        self._entries.append(_CorpusEntry(tuple(stages), feedback))
+        if len(self._entries) > self._max_size:
+            self._entries.remove(min(self._entries, key=lambda e: e.energy))
+
+    def get_info(self):
+        '''
+        :return: dictionary of information about the corpus
+        '''
+        return {
+            'size': len(self._entries),
+            'max_size': self._max_size,
+            'derived': self._parent is not None,
+        }
+
+    def hash(self):
+        # ordered, so swapped parameter values result in a different hash
+        return khash((self._max_size, self._exploit_ratio, self._decay, self._seed))
+
+
 class StagedSequenceModel(BaseModel):
     '''
     The StagedSequenceModel provides sequences that are constructed from multiple stages of sequences.
@@ -177,17 +330,34 @@ class StagedSequenceModel(BaseModel):
     we can't just provide a callback as we do in GraphModel.
     The solution in our case is to provide the model with a callback generator,
     which receives the from_template and to_template and returns a callback function as described in GraphModel in runtime.
+
+    If the target (or one of its monitors) can tell whether a test exposed new behaviour,
+    it can add a 'feedback' entry to its report (e.g. the number of new edges covered by the test).
+    Provide the model with a :class:`~kitty.model.high_level.staged_sequence.SequenceCorpus`
+    and it will prioritise prefixes of sequences that produced such feedback:
+
+        ::
+
+            model = StagedSequenceModel('use and delete mess', num_mutations=10000, corpus=SequenceCorpus(seed=1234))
+
+    Without a corpus, each sequence is derived only from the seeds and names of the stages and its index.
+    So a test can be reproduced by its index, and skipping to any index is immediate,
+    and the index space can be split between multiple fuzzer instances (using the same stages).
     '''
 
-    def __init__(self, name='StagedSequenceModel', callback_generator=None, num_mutations=1000):
+    def __init__(self, name='StagedSequenceModel', callback_generator=None, num_mutations=1000, corpus=None):
         '''
         :param name: name of the model object (default: 'StagedSequenceModel')
         :type callback_generator: func(from_template, to_template) -> func(fuzzer, edge, response) -> None
         :param callback_generator: a function that returns callback functions
         :param num_mutations: number of mutations to perform
+        :type corpus: :class:`~kitty.model.high_level.staged_sequence.SequenceCorpus`
+        :param corpus: corpus for feedback based scheduling of sequences (default: None)
         '''
         super(StagedSequenceModel, self).__init__(name)
         self._stages = []
+        self._corpus = corpus
+        self._current_stage_templates = []
         if not callback_generator:
             def null_generator(src, dst):
                 src = dst
@@ -211,11 +381,40 @@ class StagedSequenceModel(BaseModel):
         if not self._ready:
             self._ready = True
 
+    def skip(self, count):
+        '''
+        Each sequence is derived only from its index (see :class:`~kitty.model.high_level.staged_sequence.Stage`),
+        so skipping does not generate the skipped sequences.
+        When there is a corpus, the sequences depend on the feedback history,
+        so we fall back to mutating sequentially.
+
+        :param count: number of cases to skip
+        :return: number of cases skipped
+        '''
+        if self._corpus:
+            return super(StagedSequenceModel, self).skip(count)
+        self._get_ready()
+        skipped = max(0, min(count, self.last_index() - self._current_index))
+        if skipped:
+            self._current_index += skipped
+            self._mutate()
+        return skipped
+
     def _mutate(self):
+        prefix = self._corpus.select() if self._corpus else None
+        index = self._current_index
+        stage_templates = []
+        for i, stage in enumerate(self._stages):
+            if prefix is None or i >= len(prefix):
+                stage_templates.append(stage.mutate(index=index))
+            elif i < len(prefix) - 1:
+                stage_templates.append(prefix[i])
+            else:
+                stage_templates.append(stage.mutate(prefix[i], index=index))
+        self._current_stage_templates = stage_templates
         current_sequence_templates = []
-        for stage in self._stages:
-            stage.mutate()
-            current_sequence_templates.extend(stage.get_sequence_templates())
+        for templates in stage_templates:
+            current_sequence_templates.extend(templates)
         sequence = []
         cb = self.callback_generator(None, current_sequence_templates[0])
         sequence.append(Connection(None, current_sequence_templates[0], cb))
@@ -247,10 +446,36 @@ class StagedSequenceModel(BaseModel):
         info = super(StagedSequenceModel, self).get_test_info()
         seq = self._sequence
         info['sequence']['length'] = len(seq)
+        if self._corpus:
+            info['corpus'] = self._corpus.get_info()
         return info
 
+    def get_feedback_context(self):
+        '''
+        :return: the templates of the stages of the current sequence,
+            and the corpus entry that it was derived from
+        '''
+        parent = self._corpus.get_parent() if self._corpus else None
+        return (tuple(self._current_stage_templates), parent)
+
+    def handle_feedback(self, feedback, context=None):
+        '''
+        Pass the feedback of a sequence to the corpus (if there is one)
+
+        :param feedback: numeric feedback signal, positive if the test exposed new behaviour
+        :param context: context of the sequence (see :func:`get_feedback_context`), None for the current sequence (default: None)
+        '''
+        if self._corpus:
+            if context is None:
+                self._corpus.feedback(self._current_stage_templates, feedback)
+            else:
+                (stages, parent) = context
+                self._corpus.feedback(stages, feedback, parent)
+
     def hash(self):
         hashed = None
         for stage in self._stages:
             hashed = khash(hashed, stage.hash())
+        if self._corpus:
+            hashed = khash(hashed, self._corpus.hash())
         return hashed
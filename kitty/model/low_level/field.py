@@ -21,11 +21,12 @@ It contains all the basic building blocks for a Template.
 Each "field" type is a discrete component in the full Template.
 '''
 from random import Random
+from binascii import unhexlify
 import copy
 import os
 import logging
 from bitstring import Bits
-from kitty.core import KittyObject, KittyException, kassert, khash
+from kitty.core import KittyObject, KittyException, kassert, khash, kseed
 from kitty.model.low_level.encoder import ENC_STR_DEFAULT, StrEncoder
 from kitty.model.low_level.encoder import ENC_INT_DEFAULT, BitFieldEncoder
 from kitty.model.low_level.encoder import ENC_BITS_DEFAULT, BitsEncoder
@@ -124,6 +125,22 @@ class BaseField(KittyObject):
                 break
         return skipped
 
+    def _skip_by_index(self, count):
+        '''
+        Skip up to [count] cases by advancing the mutation index, without mutating.
+        Fields whose mutations depend only on the mutation index skip with this method.
+
+        :param count: number of cases to skip
+        :rtype: int
+        :return: number of cases skipped
+        '''
+        self._initialize()
+        skipped = 0
+        if not self._exhausted():
+            skipped = min(count, self._last_index() - self._current_index)
+            self._current_index += skipped
+        return skipped
+
     def mutate(self):
         '''
         Mutate the field
@@ -375,27 +392,35 @@ class _LibraryField(BaseField):
     there are two libraries for each instance:
     1. Shared library between all instances
     2. Instance library with mutations that are specific for this instance
+
+    The libraries are built when the field is first used,
+    not when it is constructed.
     '''
 
     def __init__(self, value, encoder, fuzzable=True, name=None):
         super(_LibraryField, self).__init__(value, encoder, fuzzable, name)
         self._lib = None
+
+    def num_mutations(self):
+        '''
+        :return: number of mutation in this field
+        '''
         self._initialize()
+        return super(_LibraryField, self).num_mutations()
 
-    def skip(self, count):
+    def set_current_value(self, value):
         '''
-        skip up to [count] cases
+        Sets the current value of the field
 
-        :param count: number of cases to skip
-        :rtype: int
-        :return: number of cases skipped
+        :param value: value to set
+        :return: rendered value
         '''
+        # initialization resets the field, so it should not happen after the value is set
         self._initialize()
-        skipped = 0
-        if not self._exhausted():
-            skipped = min(count, self._last_index() - self._current_index)
-            self._current_index += skipped
-        return skipped
+        return super(_LibraryField, self).set_current_value(value)
+
+    def skip(self, count):
+        return self._skip_by_index(count)
 
     def _mutate(self):
         value = self._lib.get(self._current_index)[0]  # [1] is the description
@@ -414,7 +439,12 @@ class _LibraryField(BaseField):
         self._filter_lib()
         self._num_mutations = self._lib.size()
 
+    def get_structure(self):
+        self._initialize()
+        return super(_LibraryField, self).get_structure()
+
     def get_info(self):
+        self._initialize()
         info = super(_LibraryField, self).get_info()
         idx = self._current_index
         if idx >= 0 and idx < self._lib.size():
@@ -967,12 +997,7 @@ class Dynamic(BaseField):
         return self._current_rendered
 
     def skip(self, count):
-        self._initialize()
-        skipped = 0
-        if not self._exhausted():
-            skipped = min(count, self.num_mutations() - self._current_index - 1)
-            self._current_index += skipped
-        return skipped
+        return self._skip_by_index(count)
 
     def set_session_data(self, session_data):
         if self._key in session_data:
@@ -997,12 +1022,47 @@ class Dynamic(BaseField):
         return False
 
 
+def _random_length(rng, seed, index, min_length, max_length, step):
+    '''
+    Seed the RNG for a single mutation and get the length of the mutation.
+    The RNG is seeded with (seed, index), so each mutation can be generated
+    directly, without generating the mutations before it.
+
+    :param rng: the random number generator
+    :param seed: seed of the field
+    :param index: index of the mutation
+    :param min_length: minimal length of the mutation
+    :param max_length: maximal length of the mutation
+    :param step: step between lengths of each mutation, None for random lengths
+    :return: length of the mutation
+    '''
+    rng.seed(kseed(seed, index))
+    if step:
+        return min_length + step * index
+    return rng.randint(min_length, max_length)
+
+
+def _random_bytes(rng, length):
+    '''
+    Generate a buffer of random bytes at once, rather than byte by byte
+
+    :param rng: the random number generator
+    :param length: length of the buffer (in bytes)
+    :return: the buffer
+    '''
+    if not length:
+        return ''
+    return unhexlify('%0*x' % (length * 2, rng.getrandbits(length * 8)))
+
+
 class RandomBits(BaseField):
     '''
     A random sequence of bits.
     The length of the sequence is between *min_length* and *max_length*,
     and decided either randomally (if *step* is *None*)
     or starts from *min_length* and inreased by *step* bits (if *step* has a value).
+    Each mutation is derived from the seed and the mutation index,
+    so the same seed always results in the same mutations.
     '''
     _encoder_type_ = BitsEncoder
 
@@ -1045,7 +1105,6 @@ class RandomBits(BaseField):
         self._step = step
         self._random = Random()
         self._seed = seed
-        self._random.seed(self._seed)
         if self._step:
             if self._step < 0:
                 raise KittyException('step (%d) < 0' % (step))
@@ -1061,19 +1120,12 @@ class RandomBits(BaseField):
         elif max_length <= 0:
             raise KittyException('max_length(%d) < 0' % (max_length))
 
-    def reset(self):
-        super(RandomBits, self).reset()
-        self._random.seed(self._seed)
+    def skip(self, count):
+        return self._skip_by_index(count)
 
     def _mutate(self):
-        if self._step:
-            length = self._min_length + self._step * self._current_index
-        else:
-            length = self._random.randint(self._min_length, self._max_length)
-        current_bytes = ''
-        for i in range(length / 8 + 1):
-            current_bytes += chr(self._random.randint(0, 255))
-        self._current_value = Bits(bytes=current_bytes)[:length]
+        length = _random_length(self._random, self._seed, self._current_index, self._min_length, self._max_length, self._step)
+        self._current_value = Bits(bytes=_random_bytes(self._random, (length + 7) / 8), length=length)
 
     def hash(self):
         '''
@@ -1089,6 +1141,8 @@ class RandomBytes(BaseField):
     A random sequence of bytes The length of the sequence is between *min_length* and *max_length*,
     and decided either randomally (if *step* is *None*) or starts from *min_length* and inreased by
     *step* bytes (if *step* has a value).
+    Each mutation is derived from the seed and the mutation index,
+    so the same seed always results in the same mutations.
     '''
     _encoder_type_ = StrEncoder
 
@@ -1122,7 +1176,6 @@ class RandomBytes(BaseField):
         self._step = step
         self._random = Random()
         self._seed = seed
-        self._random.seed(self._seed)
         if self._step:
             if self._step < 0:
                 raise KittyException('step (%d) < 0' % (step))
@@ -1138,19 +1191,12 @@ class RandomBytes(BaseField):
         elif max_length <= 0:
             raise KittyException('max_length(%d) < 0' % (max_length))
 
-    def reset(self):
-        super(RandomBytes, self).reset()
-        self._random.seed(self._seed)
+    def skip(self, count):
+        return self._skip_by_index(count)
 
     def _mutate(self):
-        if self._step:
-            length = self._min_length + self._step * self._current_index
-        else:
-            length = self._random.randint(self._min_length, self._max_length)
-        current = ''
-        for i in range(length):
-            current += chr(self._random.randint(0, 255))
-        self._current_value = current
+        length = _random_length(self._random, self._seed, self._current_index, self._min_length, self._max_length, self._step)
+        self._current_value = _random_bytes(self._random, length)
 
     def hash(self):
         '''
@@ -24,12 +24,22 @@ In these cases, it makes sense to perform mutation fuzzing.
 The strategy of mutation fuzzing is to take some valid messages and mutate them in various ways.
 Kitty supports the following strategies described below.
 The last one, `MutableField`, combines all strategies, with reasonable parameters, together.
+`CorpusField` applies the same strategies to each file in a corpus of seed files.
 
 Currently all strategies are inspired by this article:
 http://lcamtuf.blogspot.com/2014/08/binary-fuzzing-strategies-what-works.html
 '''
+import os
+import mmap
 import types
-from bitstring import Bits, BitArray
+from bisect import bisect_right
+from functools import partial
+from binascii import hexlify, unhexlify
+from bitstring import Bits
+try:
+    from bitstring import ConstByteStore
+except ImportError:
+    ConstByteStore = None
 from kitty.model.low_level.field import BaseField
 from kitty.model.low_level.container import OneOf
 from kitty.model.low_level.encoder import ENC_BITS_DEFAULT, ENC_BITS_BYTE_ALIGNED, BitsEncoder
@@ -37,7 +47,146 @@ from kitty.model.low_level.encoder import ENC_STR_DEFAULT, StrEncoder
 from kitty.core import kassert, KittyException, khash
 
 
-class BitFlip(BaseField):
+#: translation table that flips all the bits of a byte
+_FLIP_TABLE = ''.join(chr(i ^ 0xff) for i in range(256))
+
+
+def _flip_bits(base, start, num_bits):
+    '''
+    :return: patch (offset, length, replacement) that flips *num_bits* bits from bit *start* of *base*
+    '''
+    end = start + num_bits
+    start_byte = start // 8
+    end_byte = (end + 7) // 8
+    current = base[start_byte:end_byte]
+    mask = ((1 << num_bits) - 1) << (end_byte * 8 - end)
+    flipped = int(hexlify(current), 16) ^ mask
+    return start_byte, end_byte - start_byte, unhexlify('%0*x' % (len(current) * 2, flipped))
+
+
+def _flip_bytes(base, start, num_bytes):
+    '''
+    :return: patch (offset, length, replacement) that flips *num_bytes* bytes from byte *start* of *base*
+    '''
+    return start, num_bytes, base[start:start + num_bytes].translate(_FLIP_TABLE)
+
+
+def _remove_block(base, start, block_size):
+    '''
+    :return: patch (offset, length, replacement) that removes a block from *base*
+    '''
+    return start, block_size, ''
+
+
+def _duplicate_block(base, start, block_size, num_dups):
+    '''
+    :return: patch (offset, length, replacement) that duplicates a block of *base*
+    '''
+    return start, block_size, base[start:start + block_size] * num_dups
+
+
+def _set_block(base, start, block_size, set_chr):
+    '''
+    :return: patch (offset, length, replacement) that sets a block of *base* to *set_chr*
+    '''
+    return start, block_size, set_chr * block_size
+
+
+def _wrap_bytes(buff):
+    '''
+    :type buff: bytearray
+    :return: Bits over *buff*, the buffer is not copied when the bitstring version allows it,
+        so it should not be changed afterwards
+    '''
+    if ConstByteStore is None:
+        return Bits(bytes=buff)
+    bits = Bits()
+    bits._datastore = ConstByteStore(buff, len(buff) * 8, 0)
+    return bits
+
+
+class Patch(object):
+    '''
+    A mutation of an immutable base buffer -
+    *length* bytes at *offset* are replaced with *replacement*.
+    The base buffer is shared by all mutations of a field,
+    it is not copied until the mutation is rendered.
+    '''
+
+    __slots__ = ('base', 'offset', 'length', 'replacement')
+
+    def __init__(self, base, offset, length, replacement):
+        '''
+        :type base: str or mmap
+        :param base: the base buffer
+        :param offset: offset of the replaced bytes
+        :param length: number of replaced bytes
+        :type replacement: str
+        :param replacement: bytes to put instead of the replaced bytes
+        '''
+        self.base = base
+        self.offset = offset
+        self.length = length
+        self.replacement = replacement
+
+    def __len__(self):
+        return len(self.base) - self.length + len(self.replacement)
+
+    def tobytes(self):
+        '''
+        :rtype: bytearray
+        :return: the patched buffer, built in a single allocation
+        '''
+        replacement_end = self.offset + len(self.replacement)
+        buff = bytearray(len(self))
+        buff[:self.offset] = buffer(self.base, 0, self.offset)
+        buff[self.offset:replacement_end] = self.replacement
+        buff[replacement_end:] = buffer(self.base, self.offset + self.length)
+        return buff
+
+    def __str__(self):
+        return str(self.tobytes())
+
+    def __repr__(self):
+        return 'Patch(offset=%d, length=%d, replacement=%r)' % (self.offset, self.length, self.replacement)
+
+
+class _PatchField(BaseField):
+    '''
+    Base class for fields that mutate a value by patching a small part of it.
+    Sub classes implement :func:`_patch`, the current value of the field is
+    a :class:`~kitty.model.low_level.mutated_field.Patch` over the original value.
+    '''
+
+    def __init__(self, value, encoder, fuzzable=True, name=None):
+        '''
+        :type value: str
+        :param value: value to mutate
+        :param encoder: encoder for the default value
+        :param fuzzable: is field fuzzable (default: True)
+        :param name: name of the object (default: None)
+        '''
+        self._base = value
+        default = Bits(bytes=value) if isinstance(encoder, BitsEncoder) else value
+        super(_PatchField, self).__init__(value=default, encoder=encoder, fuzzable=fuzzable, name=name)
+
+    def _patch(self):
+        '''
+        :return: tuple (offset, length, replacement) of the current mutation
+        '''
+        self.not_implemented('_patch')
+
+    def _mutate(self):
+        (offset, length, replacement) = self._patch()
+        self._current_value = Patch(self._base, offset, length, replacement)
+
+    def _encode_value(self, value):
+        if isinstance(value, Patch):
+            return _wrap_bytes(value.tobytes())
+        return super(_PatchField, self)._encode_value(value)
+
+
+class BitFlip(_PatchField):
     '''
     Perform bit-flip mutations of N sequential bits on the value
 
@@ -65,7 +214,7 @@ class BitFlip(BaseField):
             raise KittyException('len of value in bits(%d) < num_bits(%d)' % (len(value) * 8, num_bits))
         if num_bits <= 0:
             raise KittyException('num_bits(%d) <= 0' % (num_bits))
-        super(BitFlip, self).__init__(value=Bits(bytes=value), encoder=ENC_BITS_DEFAULT, fuzzable=fuzzable, name=name)
+        super(BitFlip, self).__init__(value=value, encoder=ENC_BITS_DEFAULT, fuzzable=fuzzable, name=name)
         self._data_len = len(value) * 8
         self._num_bits = num_bits
         self._num_mutations = self._data_len - (num_bits - 1)
@@ -75,11 +224,8 @@ class BitFlip(BaseField):
         end_idx = start_idx + self._num_bits
         return start_idx, end_idx
 
-    def _mutate(self):
-        new_val = BitArray(self._default_value).copy()
-        start, end = self._start_end()
-        new_val.invert(range(start, end))
-        self.set_current_value(Bits(new_val))
+    def _patch(self):
+        return _flip_bits(self._base, self._current_index, self._num_bits)
 
     def get_info(self):
         info = super(BitFlip, self).get_info()
@@ -95,7 +241,7 @@ class BitFlip(BaseField):
         return khash(hashed, self._num_bits)
 
 
-class ByteFlip(BaseField):
+class ByteFlip(_PatchField):
     '''
     Flip number of sequential bytes in the message, each mutation moving one byte forward.
 
@@ -137,13 +283,8 @@ class ByteFlip(BaseField):
         end_idx = start_idx + self._num_bytes
         return start_idx, end_idx
 
-    def _mutate(self):
-        start, end = self._start_end()
-        pre = self._default_value[:start]
-        current = self._default_value[start:end]
-        mutated = ''.join(chr(ord(c) ^ 0xff) for c in current)
-        post = self._default_value[end:]
-        self.set_current_value(pre + mutated + post)
+    def _patch(self):
+        return _flip_bytes(self._base, self._current_index, self._num_bytes)
 
     def get_info(self):
         info = super(ByteFlip, self).get_info()
@@ -159,7 +300,7 @@ class ByteFlip(BaseField):
         return khash(hashed, self._num_bytes)
 
 
-class BlockOperation(BaseField):
+class BlockOperation(_PatchField):
     '''
     Base class for performing block-level mutations
     '''
@@ -185,12 +326,6 @@ class BlockOperation(BaseField):
         self._block_size = block_size
         self._num_mutations = len(value) - (self._block_size - 1)
 
-    def _split(self):
-        pre = self._default_value[:self._current_index]
-        current = self._default_value[self._current_index:self._current_index + self._block_size]
-        post = self._default_value[self._current_index + self._block_size:]
-        return pre, current, post
-
     def hash(self):
         hashed = super(BlockOperation, self).hash()
         return khash(hashed, self._block_size)
@@ -214,9 +349,8 @@ class BlockRemove(BlockOperation):
         '''
         super(BlockRemove, self).__init__(value, block_size, fuzzable, name)
 
-    def _mutate(self):
-        pre, _, post = self._split()
-        self.set_current_value(pre + post)
+    def _patch(self):
+        return _remove_block(self._base, self._current_index, self._block_size)
 
 
 class BlockDuplicate(BlockOperation):
@@ -241,9 +375,8 @@ class BlockDuplicate(BlockOperation):
         super(BlockDuplicate, self).__init__(value, block_size, fuzzable, name)
         self._num_dups = num_dups
 
-    def _mutate(self):
-        pre, current, post = self._split()
-        self.set_current_value(pre + (current * self._num_dups) + post)
+    def _patch(self):
+        return _duplicate_block(self._base, self._current_index, self._block_size, self._num_dups)
 
     def hash(self):
         hashed = super(BlockDuplicate, self).hash()
@@ -270,9 +403,8 @@ class BlockSet(BlockOperation):
         super(BlockSet, self).__init__(value, block_size, fuzzable, name)
         self._set_chr = set_chr
 
-    def _mutate(self):
-        pre, _, post = self._split()
-        self.set_current_value(pre + (self._set_chr * self._block_size) + post)
+    def _patch(self):
+        return _set_block(self._base, self._current_index, self._block_size, self._set_chr)
 
 
 class BitFlips(OneOf):
@@ -374,3 +506,157 @@ class MutableField(OneOf):
             fields.append(BlockDuplicates(value, block_size=size, fuzzable=fuzzable, name='duplicate_%d' % size))
             fields.append(BlockSet(value, block_size=size, set_chr='\x00', fuzzable=fuzzable, name='set_%d' % size))
         super(MutableField, self).__init__(fields=fields, encoder=encoder, fuzzable=fuzzable, name=name)
+
+
+def _corpus_strategies(length):
+    '''
+    The strategies of :class:`~kitty.model.low_level.mutated_field.MutableField`
+    for a value of a given length
+
+    :param length: length of the value (in bytes)
+    :return: list of tuples [(description, number of mutations, patch function) ..],
+        a patch function receives the value and the mutation offset and returns a patch
+    '''
+    strategies = []
+    for num_bytes in [x for x in [1, 2, 4] if x <= length]:
+        strategies.append(('byte flip %d' % num_bytes, length - num_bytes + 1, partial(_flip_bytes, num_bytes=num_bytes)))
+    for num_bits in range(1, 5):
+        strategies.append(('bit flip %d' % num_bits, length * 8 - num_bits + 1, partial(_flip_bits, num_bits=num_bits)))
+    for (min_length, size, dups_range) in [(4, 4, [2]), (8, 8, [2, 5, 10, 50, 200]), (16, 16, [2, 5, 10, 50, 200])]:
+        if length > min_length:
+            count = length - size + 1
+            strategies.append(('remove %d' % size, count, partial(_remove_block, block_size=size)))
+            for num_dups in dups_range:
+                strategies.append(('duplicate %d x%d' % (size, num_dups), count, partial(_duplicate_block, block_size=size, num_dups=num_dups)))
+            strategies.append(('set %d' % size, count, partial(_set_block, block_size=size, set_chr='\x00')))
+    return strategies
+
+
+class CorpusField(_PatchField):
+    '''
+    Mutation fuzzing over a corpus of seed files.
+    Each seed is mutated with the strategies of
+    :class:`~kitty.model.low_level.mutated_field.MutableField`.
+
+    The seeds are memory-mapped only when their mutations are reached,
+    and only one seed is mapped at a time (the default value, the first seed, is memory-mapped as well).
+    The mutation index is stable - it depends only on the names and sizes of the seeds,
+    so any mutation can be reached (e.g. by ``skip``) without reading the seeds before it.
+
+    :example:
+
+        ::
+
+            Template(name='png', fields=[
+                CorpusField('corpus/png', budget=10000, name='seed')
+            ])
+    '''
+    _encoder_type_ = StrEncoder
+
+    def __init__(self, seeds, budget=None, value=None, fuzzable=True, name=None):
+        '''
+        :param seeds: directory of seed files, or a list of seed file paths
+        :param budget: maximal number of mutations per seed,
+            the mutations of larger seeds are sampled evenly (default: None, all mutations)
+        :type value: str
+        :param value: default value (default: None, the content of the first seed)
+        :param fuzzable: is field fuzzable (default: True)
+        :param name: name of the object (default: None)
+
+        :raises: ``KittyException`` if there are no non-empty seed files
+        :raises: ``KittyException`` if budget is not positive
+        '''
+        if isinstance(seeds, types.StringTypes):
+            if not os.path.isdir(seeds):
+                raise KittyException('seeds directory %s does not exist' % seeds)
+            seeds = [os.path.join(seeds, filename) for filename in sorted(os.listdir(seeds))]
+            seeds = [path for path in seeds if os.path.isfile(path)]
+        self._seeds = [(path, os.path.getsize(path)) for path in seeds]
+        self._seeds = [(path, size) for (path, size) in self._seeds if size]
+        if not self._seeds:
+            raise KittyException('no seed files to mutate')
+        if budget is not None and budget <= 0:
+            raise KittyException('budget(%d) <= 0' % (budget))
+        self._budget = budget
+        # index of the first mutation of each seed
+        self._seed_starts = []
+        num_mutations = 0
+        for (_, size) in self._seeds:
+            self._seed_starts.append(num_mutations)
+            num_mutations += self._seed_mutations(size)
+        if value is None:
+            # the first seed is memory-mapped by Bits, it is not read into memory
+            value = Bits(filename=self._seeds[0][0])
+        super(CorpusField, self).__init__(value=value, encoder=ENC_STR_DEFAULT, fuzzable=fuzzable, name=name)
+        self._num_mutations = num_mutations
+        self._mapped_seed = None
+        self._strategies = None
+        self._strategy_starts = None
+        self._current_mutation = None
+
+    def _seed_mutations(self, size):
+        '''
+        :return: number of mutations of a seed of the given size
+        '''
+        total = sum(count for (_, count, _) in _corpus_strategies(size))
+        return min(total, self._budget) if self._budget else total
+
+    def _map_seed(self, seed_index):
+        '''
+        Memory-map a seed file and prepare its strategies, unless it is already mapped
+        '''
+        if self._mapped_seed == seed_index:
+            return
+        (path, size) = self._seeds[seed_index]
+        if self._mapped_seed is not None:
+            self._base.close()
+        with open(path, 'rb') as f:
+            self._base = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self._mapped_seed = seed_index
+        self._strategies = _corpus_strategies(size)
+        self._strategy_starts = []
+        total = 0
+        for (_, count, _) in self._strategies:
+            self._strategy_starts.append(total)
+            total += count
+
+    def skip(self, count):
+        return self._skip_by_index(count)
+
+    def _encode_value(self, value):
+        if isinstance(value, Bits):
+            # the default value, the memory-mapped first seed
+            return value
+        return super(CorpusField, self)._encode_value(value)
+
+    def _patch(self):
+        seed_index = bisect_right(self._seed_starts, self._current_index) - 1
+        self._map_seed(seed_index)
+        index = self._current_index - self._seed_starts[seed_index]
+        if self._budget:
+            total = self._strategy_starts[-1] + self._strategies[-1][1]
+            index = index * total // min(total, self._budget)
+        strategy_index = bisect_right(self._strategy_starts, index) - 1
+        (description, _, func) = self._strategies[strategy_index]
+        offset = index - self._strategy_starts[strategy_index]
+        self._current_mutation = (self._seeds[seed_index][0], description, offset)
+        return func(self._base, offset)
+
+    def reset(self):
+        super(CorpusField, self).reset()
+        self._current_mutation = None
+
+    def get_info(self):
+        info = super(CorpusField, self).get_info()
+        if self._current_mutation:
+            (path, description, offset) = self._current_mutation
+            info['seed'] = path
+            info['strategy'] = description
+            info['offset'] = offset
+        return info
+
+    def hash(self):
+        hashed = super(CorpusField, self).hash()
+        for (path, size) in self._seeds:
+            hashed = khash(hashed, os.path.basename(path), size)
+        return khash(hashed, self._budget)
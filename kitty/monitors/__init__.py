@@ -19,6 +19,9 @@
 The ``kitty.monitors`` package provides the basic monitor class
 BaseMonitor should not be instantiated, only extended.
 By default, it runs a separate thread and calls _monitor_func in a loop.
+Monitors that are constructed with a poll_interval share a single thread,
+that is managed by the MonitorScheduler.
 If a non-threaded monitor is required, one should re-implement multiple parts of the BaseMonitor class.
 '''
 from kitty.monitors.base import BaseMonitor
+from kitty.monitors.scheduler import MonitorScheduler
@@ -21,36 +21,81 @@ This module defines BaseMonitor - the base (abstract) monitor class
 
 from kitty.core.actor import KittyActorInterface
 from kitty.core.threading_utils import LoopFuncThread
+from kitty.monitors.scheduler import get_default_scheduler, thread_time
 
 
 class BaseMonitor(KittyActorInterface):
     '''
-    Base (abstract) monitor class
+    Base (abstract) monitor class.
+
+    By default, the monitor runs a separate thread that calls _monitor_func in a loop.
+    If a poll_interval is provided, the monitor does not get a thread of its own.
+    Instead, _monitor_func is called by a shared :class:`~kitty.monitors.scheduler.MonitorScheduler`
+    every poll_interval seconds, or as soon as one of the file descriptors returned by get_fds is readable.
+    In this mode, _monitor_func should not block.
+
+    :example:
+
+        ::
+
+            class SerialMonitor(BaseMonitor):
+
+                def __init__(self, name, port):
+                    super(SerialMonitor, self).__init__(name, poll_interval=1)
+                    self.port = port
+
+                def get_fds(self):
+                    return [self.port]
+
+                def _monitor_func(self):
+                    data = self.port.read(self.port.in_waiting)
+                    # ...
     '''
 
-    def __init__(self, name, logger=None, victim_alive_check_delay=0.3):
+    def __init__(self, name, logger=None, victim_alive_check_delay=0.3, poll_interval=None, scheduler=None):
         '''
         :param name: name of the actor
         :param logger: logger for the actor (default: None)
         :param victim_alive_check_delay: delay between checks if alive (default: 0.3)
+        :param poll_interval: if not None, call _monitor_func from the shared scheduler
+            every poll_interval seconds, instead of from a dedicated thread (default: None)
+        :type scheduler: :class:`~kitty.monitors.scheduler.MonitorScheduler`
+        :param scheduler: scheduler to use if poll_interval is set (default: None - the default shared scheduler)
         '''
         super(BaseMonitor, self).__init__(name, logger, victim_alive_check_delay)
         self.monitor_thread = None
+        self.poll_interval = poll_interval
+        self._scheduler = scheduler
+        self._cpu_time = 0
+        self._call_count = 0
+        self._test_start_cost = (0, 0)
+
+    def _get_scheduler(self):
+        if self._scheduler is None:
+            self._scheduler = get_default_scheduler()
+        return self._scheduler
 
     def setup(self):
         '''
         Make sure the monitor is ready for fuzzing
         '''
         super(BaseMonitor, self).setup()
-        self.monitor_thread = LoopFuncThread(self._monitor_func)
-        self.monitor_thread.start()
+        if self.poll_interval is None:
+            self.monitor_thread = LoopFuncThread(self._monitor_func)
+            self.monitor_thread.name = 'Monitor-%s' % self.name
+            self.monitor_thread.start()
+        else:
+            self._get_scheduler().register(self)
 
     def teardown(self):
         '''
         cleanup the monitor data and
         '''
-        self.monitor_thread.stop()
-        self.monitor_thread = None
+        if self.poll_interval is None:
+            self.monitor_thread.stop()
+            self.monitor_thread = None
+        else:
+            self._get_scheduler().unregister(self)
         super(BaseMonitor, self).teardown()
 
     def pre_test(self, test_number):
@@ -62,16 +107,61 @@ class BaseMonitor(KittyActorInterface):
         if not self._is_alive():
             self.setup()
         super(BaseMonitor, self).pre_test(test_number)
+        self._test_start_cost = (self._cpu_time, self._call_count)
+
+    def post_test(self):
+        '''
+        Called when a test is done.
+        If the monitor is called by the scheduler, adds the CPU time of _monitor_func
+        (and number of calls) since pre_test to the report.
+        '''
+        super(BaseMonitor, self).post_test()
+        if self.poll_interval is not None:
+            (cpu_time, call_count) = self._test_start_cost
+            self.report.add('monitor_cpu_time', self._cpu_time - cpu_time)
+            self.report.add('monitor_calls', self._call_count - call_count)
+
+    def get_cost(self):
+        '''
+        :return: dictionary with the total CPU time of _monitor_func (in seconds) and the number of calls to it,
+            the cost is accounted only for monitors that are called by the scheduler (with a poll_interval),
+            the loop of a dedicated monitor thread is not slowed down by it
+        '''
+        return {'cpu_time': self._cpu_time, 'calls': self._call_count}
+
+    def get_fds(self):
+        '''
+        :return: list of file descriptors (or objects with fileno()) that, when readable,
+            should trigger a call to _monitor_func (only used if poll_interval is set)
+
+        .. note::
+
+            by default, it returns an empty list, override it if your monitor waits on files or sockets
+        '''
+        return []
 
     def _is_alive(self):
         '''
         Check if the monitor is alive
         '''
+        if self.poll_interval is not None:
+            return self._get_scheduler().is_registered(self)
         if self.monitor_thread is not None:
             if self.monitor_thread.is_alive():
                 return True
         return False
 
+    def _call_monitor_func(self):
+        '''
+        Call _monitor_func (from the scheduler) and account for its CPU time
+        '''
+        start = thread_time()
+        try:
+            self._monitor_func()
+        finally:
+            self._cpu_time += thread_time() - start
+            self._call_count += 1
+
     def _monitor_func(self):
         '''
         Called in a loop in a separate thread (self.monitor_thread).
@@ -0,0 +1,169 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+This module defines MonitorScheduler - a single thread that runs
+the ``_monitor_func`` of multiple monitors.
+'''
+import time
+import select
+import threading
+import traceback
+from kitty.core.kitty_object import KittyObject
+from kitty.core.threading_utils import FuncThread
+
+try:
+    import resource
+    _RUSAGE_THREAD = getattr(resource, 'RUSAGE_THREAD', None)
+except ImportError:
+    resource = None
+    _RUSAGE_THREAD = None
+
+
+def thread_time():
+    '''
+    :return: CPU time of the current thread (in seconds),
+        or wall clock time if it is not available (e.g. python 2, where resource has no RUSAGE_THREAD)
+    '''
+    if _RUSAGE_THREAD is not None:
+        usage = resource.getrusage(_RUSAGE_THREAD)
+        return usage.ru_utime + usage.ru_stime
+    return time.time()
+
+
+class MonitorScheduler(KittyObject):
+    '''
+    MonitorScheduler runs the ``_monitor_func`` of the registered monitors in a single thread.
+    Each monitor is called every ``poll_interval`` seconds,
+    or as soon as one of the file descriptors it returns from ``get_fds`` is readable.
+
+    Monitors are registered by :class:`~kitty.monitors.base.BaseMonitor` when they are
+    constructed with a ``poll_interval``, so usually there is no need to use it directly.
+    '''
+
+    #: maximal time (in seconds) to wait in select before checking for changes in the registered monitors
+    max_select_wait = 0.1
+
+    def __init__(self, name='MonitorScheduler', logger=None):
+        '''
+        :param name: name of the scheduler (default: 'MonitorScheduler')
+        :param logger: logger for the scheduler (default: None)
+        '''
+        super(MonitorScheduler, self).__init__(name, logger)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._monitors = []
+        self._next_call = {}
+        self._thread = None
+
+    def register(self, monitor):
+        '''
+        Start calling the monitor's _monitor_func
+
+        :type monitor: :class:`~kitty.monitors.base.BaseMonitor`
+        :param monitor: the monitor to register
+        '''
+        with self._lock:
+            if monitor not in self._monitors:
+                self._monitors.append(monitor)
+                self._next_call[monitor] = 0
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = FuncThread(self._loop)
+                self._thread.name = 'MonitorScheduler'
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+
+    def unregister(self, monitor):
+        '''
+        Stop calling the monitor's _monitor_func.
+        The scheduler thread stops when there are no registered monitors.
+
+        :param monitor: the monitor to unregister
+        '''
+        with self._lock:
+            if monitor in self._monitors:
+                self._monitors.remove(monitor)
+                del self._next_call[monitor]
+            thread = self._thread if not self._monitors else None
+        self._wakeup.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1)
+
+    def is_registered(self, monitor):
+        '''
+        :return: True if the monitor is registered and the scheduler thread is running
+        '''
+        with self._lock:
+            return monitor in self._monitors and self._thread is not None and self._thread.is_alive()
+
+    def _get_due(self, monitors):
+        '''
+        Wait until at least one of the monitors should be called
+
+        :return: list of monitors to call
+        '''
+        now = time.time()
+        timeout = max(0, min(self._next_call[m] for m in monitors) - now)
+        fds = {}
+        for monitor in monitors:
+            for fd in monitor.get_fds():
+                fds[fd] = monitor
+        ready = set()
+        if fds:
+            readable = select.select(fds.keys(), [], [], min(timeout, self.max_select_wait))[0]
+            ready.update(fds[fd] for fd in readable)
+        elif timeout:
+            self._wakeup.wait(timeout)
+        now = time.time()
+        return [m for m in monitors if m in ready or self._next_call[m] <= now]
+
+    def _loop(self):
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                if not self._monitors:
+                    self._thread = None
+                    return
+                monitors = self._monitors[:]
+            for monitor in self._get_due(monitors):
+                with self._lock:
+                    if monitor not in self._next_call:
+                        continue
+                    self._next_call[monitor] = time.time() + monitor.poll_interval
+                try:
+                    monitor._call_monitor_func()
+                except Exception as ex:
+                    self.logger.error('monitor %s raised an exception, unregistering it: %s' % (monitor.get_name(), ex))
+                    self.logger.error(traceback.format_exc())
+                    with self._lock:
+                        if monitor in self._monitors:
+                            self._monitors.remove(monitor)
+                            del self._next_call[monitor]
+
+
+_default_scheduler = None
+
+
+def get_default_scheduler():
+    '''
+    :return: the scheduler that is shared by all monitors that do not specify one
+    '''
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = MonitorScheduler()
+    return _default_scheduler
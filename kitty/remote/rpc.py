@@ -19,7 +19,6 @@
 RPC implementation, based on jsonrpc
 https://json-rpc.readthedocs.io/
 '''
-import requests
 import json
 import six
 import traceback
@@ -154,6 +153,7 @@ class RpcClient(object):
             '''
             always use named arguments
             '''
+            import requests
             msg_id = self.get_unique_msg_id()
             params = encode_data(kwargs)
             payload = {
@@ -34,9 +34,14 @@ when no communication should be done.
 :class:`~kitty.targets.server.ServerTarget` should be used when fuzzing a
 server. In most cases it should be extended to provide the appropriate
 communication means with the server.
+
+:class:`~kitty.targets.network.TcpTarget` and
+:class:`~kitty.targets.network.UdpTarget` are server targets that
+communicate with the server over TCP and UDP.
 '''
 
 from kitty.targets.base import BaseTarget
 from kitty.targets.client import ClientTarget
 from kitty.targets.empty import EmptyTarget
 from kitty.targets.server import ServerTarget
+from kitty.targets.network import NetworkTarget, TcpTarget, UdpTarget
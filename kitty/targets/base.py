@@ -19,6 +19,8 @@
 This module defines BaseTarget - the basic target
 '''
 
+import time
+from kitty.core import KittyException
 from kitty.core.kitty_object import KittyObject
 from kitty.data.report import Report
 
@@ -36,6 +38,11 @@ class BaseTarget(KittyObject):
         self.test_number = None
         self.fuzzer = None
         self.session_data = {}
+        self.actor_times = {}
+        self._max_actor_workers = 1
+        self._actor_timeout = None
+        self._actor_pool = None
+        self._actor_timeout_exceeded = False
 
     def set_fuzzer(self, fuzzer):
         self.fuzzer = fuzzer
@@ -52,24 +59,149 @@ class BaseTarget(KittyObject):
         '''
         self.monitors.append(monitor)
 
+    def set_actor_concurrency(self, max_workers, timeout=None):
+        '''
+        Call setup, teardown, pre_test and post_test of the controller and the monitors
+        concurrently, on a thread pool.
+
+        :param max_workers: maximal number of concurrent actor calls,
+            1 to call the actors one after the other in the caller thread (default: 1)
+        :param timeout: timeout (in seconds) for each actor call, from the time the call starts
+            (not while it waits for a free worker), None for no timeout (default: None).
+            The calls in the caller thread (max_workers=1) can not be interrupted,
+            so the timeout is not enforced for them, only logged when exceeded.
+
+        The time of each actor call is added to the test report (as ``actor_times``)
+        when the calls are concurrent, or when a call exceeded the timeout.
+
+        :example:
+
+            ::
+
+                target.set_actor_concurrency(max_workers=4, timeout=60)
+        '''
+        if max_workers < 1:
+            raise KittyException('max_workers (%s) < 1' % max_workers)
+        self._max_actor_workers = max_workers
+        self._actor_timeout = timeout
+        return self
+
+    def _get_actors(self):
+        '''
+        :return: list of the actors of the target (controller first)
+        '''
+        actors = [self.controller] if self.controller else []
+        return actors + self.monitors
+
+    def _call_actors(self, func_name, **kwargs):
+        '''
+        Call a method of all actors, concurrently if configured so,
+        and record how long each call took in self.actor_times[func_name].
+
+        :param func_name: name of the method to call
+        :param kwargs: arguments for the method
+        :raise: KittyException if an actor call timed out, or the exception that was raised by an actor
+        '''
+        times = {}
+        self.actor_times[func_name] = times
+        actors = self._get_actors()
+        if self._max_actor_workers == 1 or (len(actors) < 2 and self._actor_timeout is None):
+            for actor in actors:
+                start = time.time()
+                getattr(actor, func_name)(**kwargs)
+                times[actor.get_name()] = time.time() - start
+                if self._actor_timeout is not None and times[actor.get_name()] > self._actor_timeout:
+                    self._actor_timeout_exceeded = True
+                    self.logger.warning('%s.%s took %.3f seconds, more than the timeout (%s seconds)' % (actor.get_name(), func_name, times[actor.get_name()], self._actor_timeout))
+            return
+        # multiprocessing is imported only by targets that call their actors concurrently
+        from multiprocessing.pool import ThreadPool
+        from multiprocessing import TimeoutError
+        workers = min(self._max_actor_workers, len(actors))
+        if self._actor_pool is None:
+            self._actor_pool = ThreadPool(workers)
+        started = {}
+
+        def timed_call(actor):
+            start = started[actor.get_name()] = time.time()
+            getattr(actor, func_name)(**kwargs)
+            return time.time() - start
+
+        results = [(actor, self._actor_pool.apply_async(timed_call, (actor,))) for actor in actors]
+        # a call may wait for a free worker, while up to one timeout passes for each call ahead of it
+        queue_deadline = None if self._actor_timeout is None else time.time() + self._actor_timeout * ((len(actors) + workers - 1) // workers)
+        failed = []
+        timed_out = []
+        not_started = []
+        for actor, result in results:
+            name = actor.get_name()
+            try:
+                times[name] = self._wait_actor_call(result, started, name, queue_deadline)
+            except TimeoutError:
+                if name in started:
+                    self.logger.error('%s.%s timed out after %s seconds' % (name, func_name, self._actor_timeout))
+                    timed_out.append(name)
+                else:
+                    self.logger.error('%s.%s did not start, all workers are busy' % (name, func_name))
+                    not_started.append(name)
+            except Exception as ex:
+                self.logger.error('%s.%s failed: %s' % (name, func_name, ex))
+                failed.append((name, ex))
+        if timed_out or not_started:
+            # the pool is busy with the calls that timed out, use a new one from now on
+            self._actor_pool.close()
+            self._actor_pool = None
+            errors = []
+            if timed_out:
+                errors.append('%s of %s timed out after %s seconds' % (func_name, ', '.join(timed_out), self._actor_timeout))
+            if not_started:
+                errors.append('%s of %s did not start' % (func_name, ', '.join(not_started)))
+            if failed:
+                errors.append('%s of %s failed' % (func_name, ', '.join(name for (name, _) in failed)))
+            raise KittyException('; '.join(errors))
+        if failed:
+            raise failed[0][1]
+
+    def _wait_actor_call(self, result, started, name, queue_deadline):
+        '''
+        Wait for an actor call, up to the timeout from the time it started
+
+        :param result: AsyncResult of the call
+        :param started: dictionary of the start time of the calls, by actor name
+        :param name: name of the actor
+        :param queue_deadline: time until which the call may wait for a free worker, None for no timeout
+        :return: duration of the call
+        :raise: multiprocessing.TimeoutError if the call timed out or did not start until the queue deadline
+        '''
+        if queue_deadline is None:
+            # get() without timeout is not interruptible in python 2
+            return result.get(0xffffffff)
+        while name not in started and not result.ready() and time.time() < queue_deadline:
+            result.wait(min(0.01, self._actor_timeout))
+        if name not in started:
+            # did not start until the queue deadline
+            return result.get(0)
+        return result.get(max(0, started[name] + self._actor_timeout - time.time()))
+
     def setup(self):
         '''
         Make sure the target is ready for fuzzing, including monitors and
         controllers
         '''
-        if self.controller:
-            self.controller.setup()
-        for monitor in self.monitors:
-            monitor.setup()
+        self._call_actors('setup')
+        self.logger.info('actor setup times: %s' % self.actor_times['setup'])
 
     def teardown(self):
         '''
         Clean up the target once all tests are completed
         '''
-        if self.controller:
-            self.controller.teardown()
-        for monitor in self.monitors:
-            monitor.teardown()
+        try:
+            self._call_actors('teardown')
+            self.logger.info('actor teardown times: %s' % self.actor_times['teardown'])
+        finally:
+            if self._actor_pool is not None:
+                self._actor_pool.terminate()
+                self._actor_pool = None
 
     def pre_test(self, test_num):
         '''
@@ -77,10 +209,8 @@ class BaseTarget(KittyObject):
         '''
         self.test_number = test_num
         self.report = Report(self.name)
-        if self.controller:
-            self.controller.pre_test(test_number=self.test_number)
-        for monitor in self.monitors:
-            monitor.pre_test(test_number=self.test_number)
+        self._actor_timeout_exceeded = False
+        self._call_actors('pre_test', test_number=self.test_number)
         self.report.add('test_number', test_num)
         self.report.add('state', 'STARTED')
 
@@ -88,11 +218,14 @@ class BaseTarget(KittyObject):
         '''
         Called when test is completed, a report should be prepared now
         '''
-        if self.controller:
-            self.controller.post_test()
-        for monitor in self.monitors:
-            monitor.post_test()
+        self._call_actors('post_test')
         self.report.add('state', 'COMPLETED')
+        # the actor times are reported only when they are of interest, to keep the reports small
+        if self._max_actor_workers > 1 or self._actor_timeout_exceeded:
+            self.report.add('actor_times', {
+                'pre_test': self.actor_times.get('pre_test', {}),
+                'post_test': self.actor_times['post_test'],
+            })
         if self.controller:
             controller_report = self.controller.get_report()
             self.report.add('controller', controller_report)
@@ -108,6 +241,12 @@ class BaseTarget(KittyObject):
     def get_report(self):
         return self.report
 
+    def get_victim_alive_wait(self):
+        '''
+        :return: the longest time (in seconds) an actor waited for the victim to be alive in the last pre_test
+        '''
+        return max([getattr(actor, 'victim_alive_wait', 0) for actor in self._get_actors()] or [0])
+
     def get_session_data(self):
         '''
         Session related data dictionary to be used by data model.
@@ -0,0 +1,151 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+This module defines network targets (TCP and UDP).
+They can be used with :class:`~kitty.fuzzers.server.ServerFuzzer`,
+and also provide non-blocking connections for
+:class:`~kitty.fuzzers.concurrent.ConcurrentServerFuzzer`,
+which keeps multiple connections to the victim in flight.
+'''
+import socket
+from kitty.core import KittyException
+from kitty.targets.server import ServerTarget
+
+
+class NetworkTarget(ServerTarget):
+    '''
+    Base class for the TCP and UDP targets.
+    A new connection (socket) is opened for each test,
+    and it is closed at the end of the test.
+    '''
+
+    #: socket type, set by subclasses
+    socket_type = None
+
+    def __init__(self, name, host, port, timeout=None, max_response_size=0x10000, logger=None, expect_response=False):
+        '''
+        :param name: name of the target
+        :param host: host of the victim
+        :param port: port of the victim
+        :param timeout: socket timeout (in seconds), None for no timeout (default: None)
+        :param max_response_size: maximal size of a single response (default: 0x10000)
+        :param logger: logger for this object (default: None)
+        :param expect_response: should wait for response from the victim (default: False)
+        '''
+        super(NetworkTarget, self).__init__(name, logger, expect_response)
+        self.host = host
+        self.port = port
+        if (host is None) or (port is None):
+            raise KittyException('host and port are required (host: %s, port: %s)' % (host, port))
+        self.timeout = timeout
+        self.max_response_size = max_response_size
+        self.socket = None
+
+    def get_description(self):
+        return '%s(%s:%s)' % (type(self).__name__, self.host, self.port)
+
+    def _new_socket(self):
+        return socket.socket(socket.AF_INET, self.socket_type)
+
+    def open_connection(self):
+        '''
+        Open a non-blocking connection to the victim.
+        For TCP, the connection may still be in progress when this method returns,
+        it is established once the socket is writable.
+
+        :return: non-blocking socket
+        '''
+        sock = self._new_socket()
+        sock.setblocking(0)
+        sock.connect_ex((self.host, self.port))
+        return sock
+
+    def _connect(self):
+        if self.socket is None:
+            self.socket = self._new_socket()
+            if self.timeout is not None:
+                self.socket.settimeout(self.timeout)
+            self.socket.connect((self.host, self.port))
+
+    def _close(self):
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            finally:
+                self.socket = None
+
+    def pre_test(self, test_num):
+        '''
+        Called before each test, closes the connection of the previous test (if any)
+
+        :param test_num: the test number
+        '''
+        self._close()
+        super(NetworkTarget, self).pre_test(test_num)
+
+    def post_test(self, test_num):
+        '''
+        Called after each test, closes the connection of the test
+
+        :param test_num: the test number
+        '''
+        self._close()
+        super(NetworkTarget, self).post_test(test_num)
+
+    def teardown(self):
+        self._close()
+        super(NetworkTarget, self).teardown()
+
+    def _send_to_target(self, payload):
+        self._connect()
+        self.socket.sendall(payload)
+
+    def _receive_from_target(self):
+        response = self.socket.recv(self.max_response_size)
+        if not response and self.socket_type == socket.SOCK_STREAM:
+            raise KittyException('connection closed by the victim')
+        return response
+
+
+class TcpTarget(NetworkTarget):
+    '''
+    Target that sends the payloads over a TCP connection
+
+    :example:
+
+        ::
+
+            target = TcpTarget('http server', host='127.0.0.1', port=8080, timeout=2)
+            target.set_expect_response(True)
+    '''
+
+    socket_type = socket.SOCK_STREAM
+
+
+class UdpTarget(NetworkTarget):
+    '''
+    Target that sends each payload in a UDP datagram
+
+    :example:
+
+        ::
+
+            target = UdpTarget('dns server', host='127.0.0.1', port=53, timeout=2)
+    '''
+
+    socket_type = socket.SOCK_DGRAM
@@ -18,7 +18,17 @@
 import time
 import traceback
 from kitty.targets.base import BaseTarget
-from kitty.data.report import Report
+from kitty.data.report import Report, LazyValue, hexlify
+
+
+def _printable_hex(data, max_bytes=50):
+    '''
+    Hex representation of the data for logging,
+    only the first ``max_bytes`` bytes are encoded.
+    '''
+    if len(data) <= max_bytes:
+        return hexlify(data)
+    return hexlify(data[:max_bytes]) + ' ...'
 
 
 class ServerTarget(BaseTarget):
@@ -64,12 +74,37 @@ class ServerTarget(BaseTarget):
         self.receive_failure = False
         self.transmission_count = 0
 
+    def save_snapshot(self):
+        '''
+        Save the state of the victim.
+        It is called by the fuzzer after the prefix of the sequence was transmitted,
+        if snapshots are enabled (see :func:`~kitty.fuzzers.server.ServerFuzzer.set_snapshot_interval`).
+        Override it (along with restore_snapshot) if the victim supports it
+        (e.g. a VM snapshot, or a fork server).
+
+        :return: True if the state was saved (default implementation returns False)
+        '''
+        return False
+
+    def restore_snapshot(self):
+        '''
+        Restore the state of the victim to the last saved snapshot.
+        It is called by the fuzzer after pre_test, instead of transmitting the prefix of the sequence.
+
+        :return: True if the state was restored (default implementation returns False)
+        '''
+        return False
+
     def transmit(self, payload):
         '''
         Transmit single payload, and receive response, if expected.
         The actual implementation of the send/receive should be in
         ``_send_to_target`` and ``_receive_from_target``.
 
+        The hex representation of the request and the response is not calculated here,
+        it is added to the report as a :class:`~kitty.data.report.LazyValue`,
+        so it is calculated only if the report is stored.
+
         :type payload: str
         :param payload: payload to send
         :rtype: str
@@ -81,14 +116,12 @@ class ServerTarget(BaseTarget):
         self.transmission_report = trans_report
         self.report.add(trans_report_name, trans_report)
         try:
-            trans_report.add('request (hex)', payload.encode('hex'))
-            trans_report.add('request (raw)', '%s' % payload)
+            trans_report.add('request (hex)', LazyValue(hexlify, payload))
+            trans_report.add('request (raw)', payload)
             trans_report.add('request length', len(payload))
             trans_report.add('request time', time.time())
 
-            request = payload.encode('hex')
-            request = request if len(request) < 100 else (request[:100] + ' ...')
-            self.logger.info('request(%d): %s' % (len(payload), request))
+            self.logger.info('request(%d): %s' % (len(payload), _printable_hex(payload)))
             self._send_to_target(payload)
             trans_report.success()
 
@@ -96,12 +129,10 @@ class ServerTarget(BaseTarget):
                 try:
                     response = self._receive_from_target()
                     trans_report.add('response time', time.time())
-                    trans_report.add('response (hex)', response.encode('hex'))
-                    trans_report.add('response (raw)', '%s' % response)
+                    trans_report.add('response (hex)', LazyValue(hexlify, response))
+                    trans_report.add('response (raw)', response)
                     trans_report.add('response length', len(response))
-                    printed_response = response.encode('hex')
-                    printed_response = printed_response if len(printed_response) < 100 else (printed_response[:100] + ' ...')
-                    self.logger.info('response(%d): %s' % (len(response), printed_response))
+                    self.logger.info('response(%d): %s' % (len(response), _printable_hex(response)))
                 except Exception as ex2:
                     trans_report.failed('failed to receive response: %s' % ex2)
                     trans_report.add('traceback', traceback.format_exc())
@@ -0,0 +1,107 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Local stand-in servers for the network target tests.
+They echo each request back, unless it contains the crash marker,
+in which case they "crash" - close the connection (TCP) or drop the request (UDP)
+without a response.
+'''
+import threading
+import SocketServer
+
+
+class _TcpHandler(SocketServer.BaseRequestHandler):
+
+    def handle(self):
+        while True:
+            data = self.request.recv(0x10000)
+            if not data:
+                return
+            if self.server.record(data):
+                return
+            self.request.sendall(data)
+
+
+class _UdpHandler(SocketServer.BaseRequestHandler):
+
+    def handle(self):
+        (data, sock) = self.request
+        if not self.server.record(data):
+            sock.sendto(data, self.client_address)
+
+
+class _MockServerMixin:
+
+    def init_mock(self, crash_marker):
+        self.crash_marker = crash_marker
+        self.requests = []
+        self.crashes = []
+        self.lock = threading.Lock()
+
+    def record(self, data):
+        '''
+        :return: True if the server should "crash"
+        '''
+        with self.lock:
+            self.requests.append(data)
+            crash = self.crash_marker is not None and self.crash_marker in data
+            if crash:
+                self.crashes.append(data)
+            return crash
+
+
+class _TcpServer(SocketServer.ThreadingTCPServer, _MockServerMixin):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UdpServer(SocketServer.ThreadingUDPServer, _MockServerMixin):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class EchoServer(object):
+    '''
+    Echo server that runs in a thread, on a random local port
+    '''
+
+    def __init__(self, protocol='tcp', crash_marker='crash'):
+        cls, handler = (_TcpServer, _TcpHandler) if protocol == 'tcp' else (_UdpServer, _UdpHandler)
+        self.server = cls(('127.0.0.1', 0), handler)
+        self.server.init_mock(crash_marker)
+        self.host, self.port = self.server.server_address
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    @property
+    def crashes(self):
+        return self.server.crashes
@@ -16,9 +16,16 @@
 # along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
 import os
 import unittest
+from test_core_profiler import *
+from test_data_analytics import *
+from test_data_export import *
+from test_data_manager import *
 from test_data_report import *
+from test_data_timing import *
 from test_fuzzer_client import *
+from test_fuzzer_pacing import *
 from test_fuzzer_server import *
+from test_imports import *
 from test_interface_web import *
 from test_model_high_level import *
 from test_model_low_level_calculated import *
@@ -29,8 +36,10 @@ from test_model_low_level_encoders import *
 from test_model_low_level_fields import *
 from test_model_low_level_full import *
 from test_model_low_level_mutated import *
+from test_monitors import *
 from test_remote_rpc import *
 from test_target import *
+from test_target_network import *
 
 
 if __name__ == '__main__':
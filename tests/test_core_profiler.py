@@ -0,0 +1,104 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the sampling profiler
+'''
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from common import get_test_logger
+from kitty.core.profiler import SamplingProfiler
+
+
+def _busy_loop(stop_event):
+    while not stop_event.is_set():
+        sum(range(100))
+
+
+class SamplingProfilerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = get_test_logger()
+        self.tmpdir = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.tmpdir, 'session.sqlite')
+        self.profiler = SamplingProfiler(self.prefix, interval=0.001, logger=self.logger)
+
+    def tearDown(self):
+        self.profiler.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def _read_profile(self, filename):
+        with open(filename, 'rb') as f:
+            lines = f.read().splitlines()
+        stacks = {}
+        for line in lines:
+            (stack, count) = line.rsplit(' ', 1)
+            stacks[stack] = int(count)
+        return stacks
+
+    def testProfileIsWrittenNextToPrefix(self):
+        filename = self.profiler.start(duration=0.05)
+        self.assertTrue(filename.startswith(self.prefix + '.profile-'))
+        self.assertTrue(filename.endswith('.folded'))
+        self.profiler.stop()
+        self.assertTrue(os.path.exists(filename))
+        self.assertEqual(self.profiler.last_filename, filename)
+
+    def testStacksOfOtherThreads(self):
+        stop_event = threading.Event()
+        worker = threading.Thread(target=_busy_loop, args=(stop_event,), name='busy worker')
+        worker.start()
+        try:
+            filename = self.profiler.start(duration=0.2)
+            time.sleep(0.3)
+            self.profiler.stop()
+        finally:
+            stop_event.set()
+            worker.join()
+        stacks = self._read_profile(filename)
+        self.assertTrue(stacks)
+        busy = [stack for stack in stacks if stack.startswith('busy_worker;')]
+        self.assertTrue(busy)
+        self.assertTrue(any('_busy_loop (test_core_profiler.py:' in stack for stack in busy))
+        self.assertFalse(any(stack.startswith('SamplingProfiler;') for stack in stacks))
+
+    def testStartWhileRunning(self):
+        filename = self.profiler.start(duration=10)
+        self.assertTrue(self.profiler.is_running())
+        self.assertIsNone(self.profiler.start(duration=10))
+        status = self.profiler.get_status()
+        self.assertTrue(status['running'])
+        self.assertEqual(status['filename'], filename)
+        self.profiler.stop()
+        self.assertFalse(self.profiler.is_running())
+        self.assertTrue(os.path.exists(filename))
+
+    def testSamplingEndsAfterDuration(self):
+        self.profiler.start(duration=0.05)
+        time.sleep(0.5)
+        self.assertFalse(self.profiler.is_running())
+        status = self.profiler.get_status()
+        self.assertGreater(status['samples'], 0)
+        self.assertIsNotNone(status['last_filename'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
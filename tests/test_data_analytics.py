@@ -0,0 +1,131 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the offline session analytics
+'''
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from common import get_test_logger
+from mocks.mock_target import ServerTargetMock
+from kitty.core import KittyException
+from kitty.model import GraphModel, Template, String, UInt8
+from kitty.fuzzers import ServerFuzzer
+from kitty.interfaces.base import EmptyInterface
+from kitty.data.report import Report
+from kitty.data.export import SessionReader
+from kitty.data.analytics import analyze_sessions, SessionStats
+
+
+class AnalyticsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = get_test_logger()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_session(self, name, failures, num_tests=20):
+        filename = os.path.join(self.tmpdir, name)
+        config = {}
+        for test_id in failures:
+            config[str(test_id)] = {'report': {'status': 'failed', 'reason': 'reason %d' % (test_id % 2)}}
+        template = Template(name='template_%s' % name, fields=[String(name='str1', value='kitty'), UInt8(name='u8', value=1)])
+        model = GraphModel()
+        model.connect(template)
+        fuzzer = ServerFuzzer(name='TestServerFuzzer', logger=self.logger)
+        fuzzer.set_interface(EmptyInterface())
+        fuzzer.set_model(model)
+        fuzzer.set_target(ServerTargetMock(config, logger=self.logger))
+        fuzzer.set_range(0, num_tests - 1)
+        fuzzer.set_session_file(filename)
+        fuzzer.set_store_all_reports(True)
+        fuzzer.start()
+        fuzzer.stop()
+        return filename
+
+    def testAggregations(self):
+        filename = self.run_session('s1.sqlite', [1, 2, 3, 7])
+        stats = analyze_sessions([filename])
+        self.assertEqual(stats.reports, 20)
+        self.assertEqual(stats.statuses, {Report.PASSED: 16, Report.FAILED: 4})
+        self.assertEqual(dict(stats.failures['reason']), {'reason 1': 3, 'reason 0': 1})
+        self.assertEqual(dict(stats.failures['template']), {'template_s1.sqlite': 4})
+        self.assertEqual(dict(stats.failures['field']), {'template_s1.sqlite/str1': 4})
+        self.assertEqual(sum(stats.failures['category'].values()), 4)
+        for category in stats.failures['category']:
+            self.assertTrue(category.startswith('String'))
+
+    def testThroughput(self):
+        filename = self.run_session('s1.sqlite', [])
+        stats = analyze_sessions([filename], bucket_size=3600)
+        series = stats.get_throughput(filename)
+        self.assertIn(len(series), [1, 2])
+        self.assertEqual(sum(entry[1] for entry in series), 20)
+        self.assertAlmostEqual(sum(entry[3] for entry in series) * 3600, 20)
+
+    def testParallelAnalysisOfMultipleSessions(self):
+        filenames = [self.run_session('s1.sqlite', [1, 5]), self.run_session('s2.sqlite', [3])]
+        serial = analyze_sessions(filenames, jobs=1, chunk_size=3)
+        parallel = analyze_sessions(filenames, jobs=3, chunk_size=3)
+        self.assertEqual(serial.reports, 40)
+        self.assertEqual(serial.to_dict(), parallel.to_dict())
+        self.assertEqual(dict(parallel.failures['template']), {'template_s1.sqlite': 2, 'template_s2.sqlite': 1})
+
+    def testSessionIsNotModified(self):
+        filename = self.run_session('s1.sqlite', [1])
+        with open(filename, 'rb') as f:
+            before = f.read()
+        analyze_sessions([filename], jobs=2, chunk_size=5)
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read(), before)
+
+    def testSessionReaderIsReadOnly(self):
+        filename = self.run_session('s1.sqlite', [1])
+        reader = SessionReader(filename)
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                reader.reports.store(Report('new'), 100)
+        finally:
+            reader.close()
+
+    def testNotASessionFile(self):
+        filename = os.path.join(self.tmpdir, 'empty.sqlite')
+        sqlite3.connect(filename).close()
+        with self.assertRaises(KittyException):
+            analyze_sessions([filename])
+
+    def testMerge(self):
+        summary = {'test_id': 1, 'status': Report.FAILED, 'reason': 'r', 'time': 100, 'field': 'f', 'category': 'c', 'template': 't'}
+        first = SessionStats(10)
+        first.add('s', summary)
+        second = SessionStats(10)
+        second.add('s', dict(summary, test_id=5, time=105))
+        first.merge(second)
+        self.assertEqual(first.reports, 2)
+        self.assertEqual(first.failures['field']['f'], 2)
+        self.assertEqual(first.series['s'][100], [2, 2, 1, 5])
+
+
+if __name__ == '__main__':
+    if not os.path.exists('logs'):
+        os.mkdir('logs')
+    unittest.main(verbosity=2)
@@ -0,0 +1,129 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the bulk export of reports
+'''
+import os
+import json
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import unittest
+from cStringIO import StringIO
+from common import get_test_logger
+from kitty.core import KittyException
+from kitty.data.report import Report
+from kitty.data.data_manager import ReportsTable
+from kitty.data.export import SessionReader, export_reports, iter_reports, get_ndjson_cursor
+
+
+class ExportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = get_test_logger()
+        self.tmpdir = tempfile.mkdtemp()
+        self.session_file = os.path.join(self.tmpdir, 'session.sqlite')
+        connection = sqlite3.connect(self.session_file)
+        reports = ReportsTable(connection, connection.cursor())
+        for i in range(10):
+            report = Report('test')
+            report.add('payload', 'payload %d' % i)
+            if i % 2:
+                report.failed('odd test')
+            reports.store(report, i)
+        connection.close()
+        self.reader = SessionReader(self.session_file)
+
+    def tearDown(self):
+        self.reader.close()
+        shutil.rmtree(self.tmpdir)
+
+    def testSessionReaderRequiresExistingFile(self):
+        with self.assertRaises(KittyException):
+            SessionReader(os.path.join(self.tmpdir, 'no_such_session.sqlite'))
+
+    def testSessionReaderRequiresSessionFile(self):
+        other_file = os.path.join(self.tmpdir, 'other.sqlite')
+        sqlite3.connect(other_file).close()
+        with self.assertRaises(KittyException):
+            SessionReader(other_file)
+        # the file was not turned into a session file
+        connection = sqlite3.connect(other_file)
+        self.assertEqual(connection.execute('SELECT name FROM sqlite_master').fetchall(), [])
+        connection.close()
+
+    def testIterReportsPages(self):
+        entries = list(iter_reports(self.reader, page_size=3))
+        self.assertEqual([test_id for (_, test_id, _) in entries], range(10))
+        self.assertEqual(entries[4][2].get('payload'), 'payload 4')
+
+    def testIterReportsFilters(self):
+        entries = list(iter_reports(self.reader, status=Report.FAILED, page_size=2))
+        self.assertEqual([test_id for (_, test_id, _) in entries], [1, 3, 5, 7, 9])
+        entries = list(iter_reports(self.reader, start=3, end=6))
+        self.assertEqual([test_id for (_, test_id, _) in entries], [3, 4, 5, 6])
+
+    def testExportNdjson(self):
+        out = StringIO()
+        self.assertEqual(export_reports(self.reader, out, 'ndjson'), 10)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 10)
+        entry = json.loads(lines[3])
+        self.assertEqual(entry['test_id'], 3)
+        report = Report.from_dict(entry['report'])
+        self.assertEqual(report.get('payload'), 'payload 3')
+        self.assertEqual(report.get_status(), Report.FAILED)
+
+    def testExportTar(self):
+        out = StringIO()
+        self.assertEqual(export_reports(self.reader, out, 'tar', status=Report.PASSED), 5)
+        out.seek(0)
+        tar = tarfile.open(fileobj=out)
+        self.assertEqual(sorted(tar.getnames()), ['reports/report_%d.json' % i for i in [0, 2, 4, 6, 8]])
+        content = json.loads(tar.extractfile('reports/report_2.json').read())
+        self.assertEqual(Report.from_dict(content['report']).get('payload'), 'payload 2')
+
+    def testExportUnsupportedFormat(self):
+        with self.assertRaises(KittyException):
+            export_reports(self.reader, StringIO(), 'xml')
+
+    def testResumeNdjson(self):
+        out = StringIO()
+        export_reports(self.reader, out, 'ndjson')
+        full = out.getvalue()
+        lines = full.splitlines(True)
+        filename = os.path.join(self.tmpdir, 'export.ndjson')
+        # interrupted in the middle of the 5th line
+        with open(filename, 'wb') as f:
+            f.write(''.join(lines[:4]) + lines[4][:10])
+        cursor = get_ndjson_cursor(filename)
+        self.assertEqual(cursor, json.loads(lines[3])['cursor'])
+        with open(filename, 'ab') as f:
+            export_reports(self.reader, f, 'ndjson', after=cursor)
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read(), full)
+
+    def testResumeCursorOfMissingFile(self):
+        self.assertIsNone(get_ndjson_cursor(os.path.join(self.tmpdir, 'no_such_file.ndjson')))
+
+
+if __name__ == '__main__':
+    if not os.path.exists('logs'):
+        os.mkdir('logs')
+    unittest.main(verbosity=2)
@@ -0,0 +1,200 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the data manager tables
+'''
+import os
+import zlib
+import sqlite3
+import cPickle
+import unittest
+from common import get_test_logger
+from kitty.data.report import Report
+from kitty.data.data_manager import ReportsTable, BlobsTable, SessionInfoTable, SessionInfo
+
+
+class ReportsTableTests(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = get_test_logger()
+        self.connection = sqlite3.connect(':memory:')
+        self.cursor = self.connection.cursor()
+        self.reports = ReportsTable(self.connection, self.cursor)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def get_report(self, payload, response='ok', status=Report.PASSED):
+        report = Report('test')
+        if status == Report.FAILED:
+            report.failed('failure reason')
+        sub = Report('transmission')
+        sub.add('request (raw)', payload)
+        sub.add('response (raw)', response)
+        sub.add('request length', len(payload))
+        report.add('transmission', sub)
+        return report
+
+    def count(self, table):
+        return self.cursor.execute('SELECT COUNT(*) FROM %s' % table).fetchone()[0]
+
+    def testStoreAndGet(self):
+        payload = 'A' * 1000 + '\x00\xff'
+        self.reports.store(self.get_report(payload, status=Report.FAILED), 5)
+        report = self.reports.get(5)
+        self.assertEqual(report.get_status(), Report.FAILED)
+        self.assertEqual(report.get('reason'), 'failure reason')
+        self.assertEqual(report.get('transmission').get('request (raw)'), payload)
+        self.assertEqual(report.get('transmission').get('response (raw)'), 'ok')
+        self.assertEqual(report.get('transmission').get('request length'), len(payload))
+
+    def testGetMissingReport(self):
+        with self.assertRaises(KeyError):
+            self.reports.get(1)
+
+    def testIdenticalValuesAreStoredOnce(self):
+        payload = 'B' * 1000
+        for i in range(10):
+            self.reports.store(self.get_report(payload), i)
+        self.assertEqual(self.count('reports'), 10)
+        self.assertEqual(self.count('blobs'), 1)
+        for i in range(10):
+            self.assertEqual(self.reports.get(i).get('transmission').get('request (raw)'), payload)
+
+    def testSmallValuesAreNotStoredAsBlobs(self):
+        self.reports.store(self.get_report('short'), 1)
+        self.assertEqual(self.count('blobs'), 0)
+
+    def testContentIsStoredAsBlob(self):
+        self.reports.store(self.get_report('C' * 1000), 1)
+        self.assertEqual(self.cursor.execute('SELECT typeof(content) FROM reports').fetchone()[0], 'blob')
+        self.assertEqual(self.cursor.execute('SELECT typeof(content) FROM blobs').fetchone()[0], 'blob')
+        blob = self.cursor.execute('SELECT content FROM blobs').fetchone()[0]
+        self.assertEqual(zlib.decompress(blob), 'C' * 1000)
+
+    def testTestIdIsIndexed(self):
+        plan = self.cursor.execute('EXPLAIN QUERY PLAN SELECT * FROM reports WHERE test_id=?', (1,)).fetchall()
+        self.assertIn('reports_test_id', ' '.join(str(row) for row in plan))
+
+    def testStatusIsIndexed(self):
+        plan = self.cursor.execute('EXPLAIN QUERY PLAN SELECT COUNT(*) FROM reports WHERE status=?', ('failed',)).fetchall()
+        self.assertIn('reports_status', ' '.join(str(row) for row in plan))
+
+    def store_reports(self, failed_ids, passed_ids):
+        for i in sorted(failed_ids + passed_ids):
+            self.reports.store(self.get_report('x', status=Report.FAILED if i in failed_ids else Report.PASSED), i)
+
+    def testGetReportPage(self):
+        self.store_reports(range(10), [])
+        reports, cursor = self.reports.get_report_page(limit=4)
+        self.assertEqual([r[0] for r in reports], [0, 1, 2, 3])
+        self.assertEqual(reports[0][1:], (Report.FAILED, 'failure reason'))
+        reports, cursor = self.reports.get_report_page(cursor, limit=4)
+        self.assertEqual([r[0] for r in reports], [4, 5, 6, 7])
+        reports, cursor = self.reports.get_report_page(cursor, limit=4)
+        self.assertEqual([r[0] for r in reports], [8, 9])
+        reports, next_cursor = self.reports.get_report_page(cursor, limit=4)
+        self.assertEqual(reports, [])
+        self.assertEqual(next_cursor, cursor)
+
+    def testGetReportPageReturnsNewReports(self):
+        self.store_reports([5, 6], [])
+        reports, cursor = self.reports.get_report_page()
+        self.assertEqual([r[0] for r in reports], [5, 6])
+        self.store_reports([1], [])
+        reports, cursor = self.reports.get_report_page(cursor)
+        self.assertEqual([r[0] for r in reports], [1])
+
+    def testGetReportPageByStatus(self):
+        self.store_reports([1, 3, 5], [0, 2, 4])
+        reports, _ = self.reports.get_report_page(status=Report.FAILED)
+        self.assertEqual([r[0] for r in reports], [1, 3, 5])
+        reports, _ = self.reports.get_report_page(status=Report.PASSED, limit=2)
+        self.assertEqual([r[0] for r in reports], [0, 2])
+
+    def testCount(self):
+        self.assertEqual(self.reports.count(), 0)
+        self.store_reports([1, 3, 5], [0, 2])
+        self.assertEqual(self.reports.count(), 5)
+        self.assertEqual(self.reports.count(Report.FAILED), 3)
+        self.assertEqual(self.reports.get_status_counts(), {Report.FAILED: 3, Report.PASSED: 2})
+
+    def testGetLegacyReport(self):
+        report = self.get_report('D' * 1000)
+        content = zlib.compress(cPickle.dumps(report.to_dict(), protocol=2)).encode('base64')
+        self.reports.insert(['test_id', 'content', 'status', 'reason'], [3, content, report.get_status(), None])
+        self.assertEqual(self.reports.get(3).get('transmission').get('request (raw)'), 'D' * 1000)
+
+
+class SessionInfoTableTests(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def testStoreAndGet(self):
+        table = SessionInfoTable(self.connection, self.cursor)
+        info = SessionInfo()
+        info.current_index = 7
+        info.phase_timing = '{"phases": {}}'
+        table.set_session_info(info)
+        stored = SessionInfoTable(self.connection, self.cursor).get_session_info()
+        self.assertEqual(stored.current_index, 7)
+        self.assertEqual(stored.phase_timing, '{"phases": {}}')
+
+    def testTableOfOlderVersion(self):
+        self.cursor.execute('CREATE TABLE info (start_time INT, start_index INT, end_index INT, current_index INT, failure_count INT, kitty_version BLOB, data_model_hash INT)')
+        self.cursor.execute('INSERT INTO info VALUES (0, 0, 10, 5, 0, "0.7.0", 1234)')
+        table = SessionInfoTable(self.connection, self.cursor)
+        info = table.get_session_info()
+        self.assertEqual(info.current_index, 5)
+        self.assertIsNone(info.phase_timing)
+        info.phase_timing = '{"phases": {}}'
+        table.set_session_info(info)
+        self.assertEqual(SessionInfoTable(self.connection, self.cursor).get_session_info().phase_timing, '{"phases": {}}')
+
+
+class BlobsTableTests(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.blobs = BlobsTable(self.connection, self.connection.cursor())
+
+    def tearDown(self):
+        self.connection.close()
+
+    def testPutReturnsSameHashForSameContent(self):
+        self.assertEqual(self.blobs.put('kitty' * 100), self.blobs.put('kitty' * 100))
+        self.assertNotEqual(self.blobs.put('kitty' * 100), self.blobs.put('katty' * 100))
+
+    def testGet(self):
+        blob_hash = self.blobs.put('\x00\x01kitty')
+        self.assertEqual(self.blobs.get(blob_hash), '\x00\x01kitty')
+
+    def testGetMissingBlob(self):
+        with self.assertRaises(KeyError):
+            self.blobs.get('0' * 40)
+
+
+if __name__ == '__main__':
+    if not os.path.exists('logs'):
+        os.mkdir('logs')
+    unittest.main(verbosity=2)
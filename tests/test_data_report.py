@@ -21,7 +21,7 @@ Tests for the report class
 
 import unittest
 from common import get_test_logger
-from kitty.data.report import Report
+from kitty.data.report import Report, LazyValue, hexlify
 
 
 class ReportTests(unittest.TestCase):
@@ -124,6 +124,18 @@ class ReportTests(unittest.TestCase):
         with self.assertRaises(Exception):
             report.set_status('custom status')
 
+    def testDefaultFeedbackIsZero(self):
+        report = Report(self.report_name)
+        self.assertEqual(report.get_feedback(), 0)
+
+    def testFeedbackIncludesSubReports(self):
+        report = Report(self.report_name)
+        report.add('feedback', 1)
+        sub_report = Report('sub report')
+        sub_report.add('feedback', 2)
+        report.add('sub report', sub_report)
+        self.assertEqual(report.get_feedback(), 3)
+
     def testDataEntry(self):
         report = Report(self.report_name)
         entry_name = 'my entry'
@@ -151,6 +163,29 @@ class ReportTests(unittest.TestCase):
         report.clear()
         self.assertEqual(report.get(entry_name), None)
 
+    def testLazyDataEntryIsComputedOnGet(self):
+        calls = []
+
+        def compute(data):
+            calls.append(data)
+            return hexlify(data)
+        report = Report(self.report_name)
+        report.add('hex', LazyValue(compute, 'kitty'))
+        self.assertEqual(calls, [])
+        self.assertEqual(report.get('hex'), 'kitty'.encode('hex'))
+        self.assertEqual(report.get('hex'), 'kitty'.encode('hex'))
+        self.assertEqual(calls, ['kitty'])
+
+    def testLazyDataEntryIsComputedOnToDict(self):
+        report = Report(self.report_name)
+        subreport = Report('sub')
+        subreport.add('hex', LazyValue(hexlify, memoryview('kitty')))
+        report.add('sub', subreport)
+        d = report.to_dict()
+        self.assertEqual(d['sub']['hex'], 'kitty'.encode('hex').encode('base64')[:-1])
+        restored = Report.from_dict(d)
+        self.assertEqual(restored.get('sub').get('hex'), 'kitty'.encode('hex'))
+
     def testSubReportEntry(self):
         entry_name = 'sub report'
         report = Report(self.report_name)
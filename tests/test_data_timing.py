@@ -0,0 +1,129 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the per-phase timing
+'''
+import os
+import json
+import tempfile
+import unittest
+from kitty.data.timing import PhaseTimer, PhaseHistogram, BUCKET_BOUNDS
+
+
+class PhaseHistogramTests(unittest.TestCase):
+
+    def testEmpty(self):
+        hist = PhaseHistogram()
+        self.assertEqual(hist.count, 0)
+        self.assertIsNone(hist.get_mean())
+        self.assertIsNone(hist.get_percentile(50))
+
+    def testBuckets(self):
+        hist = PhaseHistogram()
+        hist.add(0.000001)
+        hist.add(0.00001)
+        hist.add(0.0015)
+        hist.add(100)
+        self.assertEqual(hist.buckets[0], 2)
+        self.assertEqual(hist.buckets[BUCKET_BOUNDS.index(0.002)], 1)
+        self.assertEqual(hist.buckets[-1], 1)
+        self.assertEqual(sum(hist.buckets), hist.count)
+        self.assertEqual(hist.min, 0.000001)
+        self.assertEqual(hist.max, 100)
+
+    def testPercentiles(self):
+        hist = PhaseHistogram()
+        for i in range(90):
+            hist.add(0.0015)
+        for i in range(10):
+            hist.add(0.3)
+        self.assertEqual(hist.get_percentile(50), 0.002)
+        self.assertEqual(hist.get_percentile(90), 0.002)
+        self.assertEqual(hist.get_percentile(99), 0.3)
+        self.assertAlmostEqual(hist.get_mean(), (90 * 0.0015 + 10 * 0.3) / 100)
+
+    def testMerge(self):
+        first = PhaseHistogram()
+        first.add(0.1)
+        second = PhaseHistogram()
+        second.add(0.001)
+        second.add(1)
+        first.merge(second)
+        self.assertEqual(first.count, 3)
+        self.assertEqual(first.min, 0.001)
+        self.assertEqual(first.max, 1)
+        self.assertAlmostEqual(first.total, 1.101)
+
+
+class PhaseTimerTests(unittest.TestCase):
+
+    def testMeasure(self):
+        timer = PhaseTimer()
+        for i in range(3):
+            with timer.measure('phase'):
+                pass
+        self.assertEqual(timer.get_phases(), ['phase'])
+        self.assertEqual(timer.get_histogram('phase').count, 3)
+        self.assertIsNone(timer.get_histogram('other'))
+
+    def testMeasureException(self):
+        timer = PhaseTimer()
+        with self.assertRaises(ValueError):
+            with timer.measure('phase'):
+                raise ValueError()
+        self.assertEqual(timer.get_histogram('phase').count, 1)
+
+    def testReset(self):
+        timer = PhaseTimer()
+        timer.add('phase', 1)
+        timer.reset()
+        self.assertEqual(timer.get_phases(), [])
+
+    def testDictRoundTrip(self):
+        timer = PhaseTimer()
+        timer.add('render', 0.001)
+        timer.add('transmit', 0.5)
+        timer.add('transmit', 0.25)
+        timer_d = json.loads(json.dumps(timer.to_dict()))
+        self.assertEqual(timer_d['buckets'], BUCKET_BOUNDS)
+        self.assertEqual(PhaseTimer.from_dict(timer_d).to_dict(), timer.to_dict())
+
+    def testExport(self):
+        timer = PhaseTimer()
+        timer.add('transmit', 0.5)
+        (fd, filename) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            timer.export(filename)
+            with open(filename, 'rb') as f:
+                self.assertEqual(json.load(f)['phases']['transmit']['count'], 1)
+        finally:
+            os.remove(filename)
+
+    def testSummary(self):
+        timer = PhaseTimer()
+        timer.add('render', 0.001)
+        timer.add('transmit', 0.003)
+        lines = timer.get_summary().split('\n')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith('transmit'))
+        self.assertTrue(lines[1].endswith('75.0%'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
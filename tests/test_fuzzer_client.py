@@ -16,6 +16,7 @@
 # along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
 
 import unittest
+import time
 import logging
 
 from kitty.model import Template, GraphModel, String, UInt32
@@ -353,3 +354,26 @@ class TestClientFuzzer(unittest.TestCase):
         self.assertIn(0, self.mutations)
         self.assertEquals(self.mutations[0][0][0], ClientFuzzer.STAGE_ANY)
         self.assertIsNotNone(self.mutations[0][0][1])
+
+    def testPhaseTiming(self):
+        self.fuzzer.start()
+        self.fuzzer.wait_until_done()
+        num_tests = self.end_index - self.start_index + 1
+        timer = self.fuzzer.timer
+        for phase in ['pre_test', 'target.pre_test', 'trigger', 'target.post_test', 'get_report', 'store_session']:
+            self.assertEqual(timer.get_histogram(phase).count, num_tests, phase)
+        payloads = [resp for responses in self.mutations.values() for (stage, resp) in responses if resp is not None]
+        self.assertEqual(timer.get_histogram('render').count, len(payloads))
+
+    def testTriggerTimeExcludesRenderTime(self):
+        original_render = self.t_str.render
+
+        def slow_render(ctx=None):
+            time.sleep(0.01)
+            return original_render(ctx)
+
+        self.t_str.render = slow_render
+        self.fuzzer.start()
+        self.fuzzer.wait_until_done()
+        timer = self.fuzzer.timer
+        self.assertLess(timer.get_histogram('trigger').total, timer.get_histogram('render').total / 2)
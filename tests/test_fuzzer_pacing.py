@@ -0,0 +1,102 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the adaptive delay between tests
+'''
+import time
+import unittest
+from common import get_test_logger
+from kitty.core import KittyException
+from kitty.fuzzers.pacing import AdaptiveDelay
+
+
+class AdaptiveDelayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = get_test_logger()
+        self.pacer = AdaptiveDelay(min_delay=0, max_delay=1, step=0.01, logger=self.logger)
+
+    def testInvalidBounds(self):
+        with self.assertRaises(KittyException):
+            AdaptiveDelay(min_delay=2, max_delay=1)
+        with self.assertRaises(KittyException):
+            AdaptiveDelay(min_delay=-1, max_delay=1)
+        with self.assertRaises(KittyException):
+            AdaptiveDelay(recovery=1)
+
+    def testNoDelayWhenVictimIsHealthy(self):
+        for i in range(20):
+            self.pacer.observe(latency=0.001)
+        self.assertEqual(self.pacer.delay, 0)
+        self.assertEqual(self.pacer.backoffs, 0)
+
+    def testBackoffOnReceiveFailure(self):
+        self.assertEqual(self.pacer.observe(receive_failure=True), 0.01)
+        self.assertEqual(self.pacer.observe(receive_failure=True), 0.02)
+        self.assertEqual(self.pacer.observe(receive_failure=True), 0.04)
+        self.assertEqual(self.pacer.backoffs, 3)
+        self.assertEqual(self.pacer.last_backoff_reason, 'receive failure')
+
+    def testBackoffOnVictimAliveWait(self):
+        self.pacer.observe(alive_wait=0.05)
+        self.assertEqual(self.pacer.delay, 0)
+        self.pacer.observe(alive_wait=0.5)
+        self.assertEqual(self.pacer.delay, 0.01)
+
+    def testBackoffOnHighLatency(self):
+        for i in range(10):
+            self.pacer.observe(latency=0.01)
+        self.assertEqual(self.pacer.delay, 0)
+        for i in range(3):
+            self.pacer.observe(latency=0.5)
+        self.assertGreater(self.pacer.delay, 0)
+        self.assertTrue(self.pacer.last_backoff_reason.startswith('latency'))
+
+    def testDelayIsBounded(self):
+        pacer = AdaptiveDelay(min_delay=0.1, max_delay=0.5, logger=self.logger)
+        self.assertEqual(pacer.delay, 0.1)
+        for i in range(10):
+            pacer.observe(receive_failure=True)
+        self.assertEqual(pacer.delay, 0.5)
+        for i in range(100):
+            pacer.observe()
+        self.assertEqual(pacer.delay, 0.1)
+
+    def testRecovery(self):
+        for i in range(5):
+            self.pacer.observe(receive_failure=True)
+        high = self.pacer.delay
+        self.pacer.observe()
+        self.assertAlmostEqual(self.pacer.delay, high * 0.9)
+        for i in range(100):
+            self.pacer.observe()
+        self.assertEqual(self.pacer.delay, 0)
+
+    def testRate(self):
+        self.assertIsNone(self.pacer.get_rate())
+        for i in range(5):
+            self.pacer.observe()
+            time.sleep(0.01)
+        rate = self.pacer.get_rate()
+        self.assertGreater(rate, 10)
+        self.assertLess(rate, 110)
+        self.assertEqual(self.pacer.get_status()['rate'], rate)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -19,8 +19,11 @@ import unittest
 import logging
 import time
 import os
+import signal
+import json
 
 from kitty.model import Template, GraphModel, String, UInt32
+from kitty.model import CombinedModel, StagedSequenceModel, Stage
 from kitty.fuzzers import ServerFuzzer
 from kitty.interfaces.base import EmptyInterface
 from mocks.mock_target import ServerTargetMock
@@ -28,6 +31,41 @@ from mocks.mock_target import ServerTargetMock
 test_logger = None
 
 
+class SnapshotTargetMock(ServerTargetMock):
+
+    def __init__(self, config=None, logger=None, support_snapshot=True):
+        super(SnapshotTargetMock, self).__init__(config, logger=logger)
+        self.support_snapshot = support_snapshot
+        self.payloads = []
+        self.saved = 0
+        self.restored = 0
+
+    def _send_to_target(self, data):
+        super(SnapshotTargetMock, self)._send_to_target(data)
+        self.payloads.append(data)
+
+    def save_snapshot(self):
+        if self.support_snapshot:
+            self.saved += 1
+        return self.support_snapshot
+
+    def restore_snapshot(self):
+        if self.support_snapshot:
+            self.restored += 1
+        return self.support_snapshot
+
+
+class ReceiveFailureTargetMock(ServerTargetMock):
+
+    def __init__(self, failing_tests, logger=None):
+        super(ReceiveFailureTargetMock, self).__init__({}, logger=logger)
+        self.failing_tests = failing_tests
+
+    def post_test(self, test_num):
+        super(ReceiveFailureTargetMock, self).post_test(test_num)
+        self.receive_failure = test_num in self.failing_tests
+
+
 def get_test_logger():
     global test_logger
     if test_logger is None:
@@ -353,3 +391,222 @@ class TestServerFuzzer(unittest.TestCase):
         self.fuzzer.start()
         self.assertEqual(template2.num_mutations() + template3.num_mutations(), self.cb2_call_count)
         self.assertEqual(template3.num_mutations(), self.cb3_call_count)
+
+    def testFeedbackIsPassedToModel(self):
+        config = {
+            '12': {'report': {'feedback': 3}},
+            '14': {'report': {'feedback': 5}},
+        }
+        feedbacks = {}
+        original_handle_feedback = self.model.handle_feedback
+
+        def handle_feedback(feedback):
+            feedbacks[self.model.current_index()] = feedback
+            original_handle_feedback(feedback)
+
+        self.model.handle_feedback = handle_feedback
+        target = ServerTargetMock(config, logger=self.logger)
+        self.fuzzer.set_target(target)
+        self.fuzzer.start()
+        self.assertEqual(feedbacks[12], 3)
+        self.assertEqual(feedbacks[14], 5)
+        self.assertEqual(feedbacks[13], 0)
+        self.assertEqual(sorted(feedbacks.keys()), range(self.start_index, self.end_index + 1))
+
+    def testCombinedModelRunsAllCases(self):
+        stage = Stage('stage', '1-2', 1234)
+        stage.add_template(self.t_str)
+        stage.add_template(self.t_int)
+        sequence = StagedSequenceModel(num_mutations=20)
+        sequence.add_stage(stage)
+        model = CombinedModel(self.model, sequence, structural_weight=2, sequence_weight=1)
+        paths = []
+        original_mutate = model.mutate
+
+        def mutate():
+            res = original_mutate()
+            if res:
+                paths.append(model.get_sequence_str())
+            return res
+
+        model.mutate = mutate
+        self.fuzzer.set_model(model)
+        self.fuzzer.set_range()
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, model.last_index())
+        self.assertEqual(len(paths), self.t_str.num_mutations() + 20)
+        self.assertEqual(paths[:3], [self.t_str.get_name()] * 2 + [paths[2]])
+        self.assertNotEqual(paths[2], self.t_str.get_name())
+
+    def _prepare_prefix_model(self):
+        model = GraphModel()
+        model.connect(self.t_int)
+        model.connect(self.t_int, self.t_str)
+        self.fuzzer.set_model(model)
+        # only the cases of t_str
+        self.fuzzer.set_range(self.t_int.num_mutations())
+        return model
+
+    def testPrefixIsRenderedOnce(self):
+        self._prepare_prefix_model()
+        target = SnapshotTargetMock({}, logger=self.logger)
+        self.fuzzer.set_target(target)
+        rendered = []
+        original_render = self.t_int.render
+
+        def render(*args, **kwargs):
+            res = original_render(*args, **kwargs)
+            rendered.append(res)
+            return res
+
+        self.t_int.render = render
+        self.fuzzer.start()
+        default_payload = self.t_int.render().tobytes()
+        # the environment test sends only t_int
+        prefix_payloads = target.payloads[1::2]
+        self.assertEqual(len(prefix_payloads), self.t_str.num_mutations())
+        self.assertEqual(set(prefix_payloads), set([default_payload]))
+        # rendered only a few times, not once per test
+        self.assertLess(len(rendered), 10)
+        self.assertGreater(self.t_str.num_mutations(), 10)
+
+    def testSnapshotIsNotUsedByDefault(self):
+        self._prepare_prefix_model()
+        target = SnapshotTargetMock({}, logger=self.logger)
+        self.fuzzer.set_target(target)
+        self.fuzzer.start()
+        self.assertEqual(target.saved, 0)
+        self.assertEqual(target.restored, 0)
+        self.assertEqual(len(target.payloads), 1 + self.t_str.num_mutations() * 2)
+
+    def testPrefixIsSentOncePerSnapshotInterval(self):
+        interval = 4
+        self._prepare_prefix_model()
+        target = SnapshotTargetMock({}, logger=self.logger)
+        self.fuzzer.set_target(target)
+        self.fuzzer.set_snapshot_interval(interval)
+        self.fuzzer.start()
+        num_tests = self.t_str.num_mutations()
+        expected_saved = (num_tests + interval - 1) // interval
+        self.assertEqual(target.saved, expected_saved)
+        self.assertEqual(target.restored, num_tests - expected_saved)
+        # environment test + prefix per snapshot + mutated payload per test
+        self.assertEqual(len(target.payloads), 1 + expected_saved + num_tests)
+
+    def testSnapshotIsDroppedAfterFailure(self):
+        interval = 100
+        self._prepare_prefix_model()
+        first = self.t_int.num_mutations()
+        config = {str(first + 2): {'report': {'status': 'failed', 'reason': 'crash'}}}
+        target = SnapshotTargetMock(config, logger=self.logger)
+        self.fuzzer.set_target(target)
+        self.fuzzer.set_snapshot_interval(interval)
+        self.fuzzer.start()
+        self.assertEqual(target.saved, 2)
+        self.assertEqual(target.restored, self.t_str.num_mutations() - 2)
+
+    def testSnapshotNotSupportedByTarget(self):
+        self._prepare_prefix_model()
+        target = SnapshotTargetMock({}, logger=self.logger, support_snapshot=False)
+        self.fuzzer.set_target(target)
+        self.fuzzer.set_snapshot_interval(4)
+        self.fuzzer.start()
+        self.assertEqual(len(target.payloads), 1 + self.t_str.num_mutations() * 2)
+
+    def testPhaseTiming(self):
+        config = {'13': {'report': {'status': 'failed', 'reason': 'failure reason'}}}
+        self.fuzzer.set_target(ServerTargetMock(config, logger=self.logger))
+        self.fuzzer.start()
+        num_tests = self.end_index - self.start_index + 1
+        timer = self.fuzzer.timer
+        for phase in ['pre_test', 'target.pre_test', 'render', 'transmit', 'target.post_test', 'get_report', 'store_session']:
+            self.assertEqual(timer.get_histogram(phase).count, num_tests, phase)
+        self.assertEqual(timer.get_histogram('store_report').count, 1)
+        self.assertIsNone(timer.get_histogram('delay'))
+        self.assertIs(self.fuzzer.dataman.get('phase_timing'), timer)
+
+    def testPhaseTimingOfDelay(self):
+        self.fuzzer.set_delay_between_tests(0.01)
+        self.fuzzer.start()
+        hist = self.fuzzer.timer.get_histogram('delay')
+        self.assertEqual(hist.count, self.end_index - self.start_index + 1)
+        self.assertGreaterEqual(hist.min, 0.01)
+
+    def testPhaseTimingIsExportedToFile(self):
+        timing_file = 'test_phase_timing.json'
+        self.fuzzer.set_timing_file(timing_file)
+        try:
+            self.fuzzer.start()
+            self.fuzzer.stop()
+            self.fuzzer = None
+            with open(timing_file, 'rb') as f:
+                timing = json.load(f)
+            self.assertEqual(timing['phases']['transmit']['count'], self.end_index - self.start_index + 1)
+        finally:
+            if os.path.exists(timing_file):
+                os.remove(timing_file)
+
+    def _run_session(self, session_file_name, config={}, max_failures=None):
+        fuzzer = ServerFuzzer(name='TestServerFuzzer', logger=self.logger)
+        fuzzer.set_interface(EmptyInterface())
+        model = GraphModel()
+        model.connect(self.t_str)
+        fuzzer.set_model(model)
+        fuzzer.set_target(ServerTargetMock(config, logger=self.logger))
+        fuzzer.set_range(self.start_index, self.end_index)
+        fuzzer.set_session_file(session_file_name)
+        fuzzer.set_max_failures(max_failures)
+        fuzzer.start()
+        fuzzer.stop()
+        return fuzzer
+
+    def testPhaseTimingIsStoredInSession(self):
+        self.session_file_name = 'test_timing_session.sqlite'
+        self.fuzzer = None
+        # the first run stops at the failure, the second run resumes the session
+        config = {'13': {'report': {'status': 'failed', 'reason': 'failure reason'}}}
+        first = self._run_session(self.session_file_name, config, max_failures=1)
+        first_count = first.timer.get_histogram('transmit').count
+        stored = json.loads(first.session_info.phase_timing)
+        self.assertEqual(stored['phases']['transmit']['count'], first_count)
+        second = self._run_session(self.session_file_name)
+        self.assertGreater(second.timer.get_histogram('transmit').count, first_count)
+
+    def testProfilingOnSignal(self):
+        self.session_file_name = 'test_profiling_session.sqlite'
+        self.fuzzer.set_session_file(self.session_file_name)
+        self.fuzzer.start()
+        filename = None
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertTrue(self.fuzzer.profiler.is_running())
+            filename = self.fuzzer.profiler.get_status()['filename']
+            self.assertTrue(filename.startswith(self.session_file_name + '.profile-'))
+            self.fuzzer.stop()
+            self.fuzzer = None
+            self.assertTrue(os.path.exists(filename))
+            self.assertEqual(signal.getsignal(signal.SIGUSR1), signal.SIG_DFL)
+        finally:
+            if filename and os.path.exists(filename):
+                os.remove(filename)
+
+    def testAdaptiveDelay(self):
+        self.fuzzer.set_target(ReceiveFailureTargetMock([12, 13], logger=self.logger))
+        self.fuzzer.set_adaptive_delay(max_delay=0.05)
+        self.fuzzer.start()
+        pacer = self.fuzzer.pacer
+        self.assertEqual(pacer.backoffs, 2)
+        self.assertEqual(pacer.last_backoff_reason, 'receive failure')
+        # delayed after the failures, until the delay dropped below the minimal step
+        self.assertGreater(self.fuzzer.timer.get_histogram('delay').count, 2)
+        self.assertLess(self.fuzzer.timer.get_histogram('delay').count, self.end_index - 11)
+        self.assertIsNotNone(pacer.get_rate())
+        self.assertIs(self.fuzzer.dataman.get('pacer'), pacer)
+
+    def testAdaptiveDelayOption(self):
+        fuzzer = ServerFuzzer(name="TestServerFuzzer", logger=self.logger, option_line='--adaptive-delay=2 --delay=0.5')
+        self.assertEqual(fuzzer.pacer.max_delay, 2)
+        self.assertEqual(fuzzer.pacer.min_delay, 0.5)
+        self.assertIsNone(self.fuzzer.pacer)
+        self.fuzzer = None
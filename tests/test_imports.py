@@ -0,0 +1,66 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests that importing kitty does not load the modules that are slow to import
+and are needed only by some of the features
+'''
+import os
+import sys
+import json
+import subprocess
+import unittest
+import kitty
+
+#: modules that should be imported only when they are used
+SLOW_MODULES = ['pkg_resources', 'requests', 'docopt', 'multiprocessing']
+
+
+def _get_loaded_modules(modules):
+    '''
+    :param modules: modules to import in a new python process
+    :return: the slow modules that were loaded by the import
+    '''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(kitty.__file__)))
+    code = 'import sys, json\nimport %s\nprint(json.dumps([m for m in %r if m in sys.modules]))' % (', '.join(modules), SLOW_MODULES)
+    env = dict(os.environ, PYTHONPATH=root)
+    output = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return json.loads(output.splitlines()[-1])
+
+
+class ImportTests(unittest.TestCase):
+
+    def _testNoSlowImports(self, *modules):
+        self.assertEqual(_get_loaded_modules(modules), [])
+
+    def testModel(self):
+        self._testNoSlowImports('kitty.model')
+
+    def testFuzzers(self):
+        self._testNoSlowImports('kitty.fuzzers')
+
+    def testTargets(self):
+        self._testNoSlowImports('kitty.targets')
+
+    def testControllers(self):
+        self._testNoSlowImports('kitty.controllers')
+
+    def testRemote(self):
+        self._testNoSlowImports('kitty.remote')
+
+    def testFuzzerSession(self):
+        self._testNoSlowImports('kitty.model', 'kitty.fuzzers', 'kitty.targets', 'kitty.interfaces')
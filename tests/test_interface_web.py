@@ -20,9 +20,15 @@ Tests for the web interface (server side)
 from kitty.model import GraphModel, Template, String, UInt32
 from kitty.fuzzers import ServerFuzzer
 from kitty.interfaces import WebInterface
+from kitty.interfaces.web import _WebInterfaceHandler, _StaticFiles
 from mocks.mock_target import ServerTargetMock
 from common import BaseTestCase
 import requests
+import socket
+import tarfile
+from cStringIO import StringIO
+import json
+import time
 import os
 
 
@@ -106,6 +112,225 @@ class WebInterfaceTest(BaseTestCase):
     def testStatsApiReportListAll(self):
         self._testStatsApiReportList([x for x in range(self.end_index)])
 
+    def testStatsApiReportCounts(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1, 2, 3])
+        self.assertEqual(self._webGetStats()['report_counts'], {'failed': 3})
+
+    def testStatsApiPhaseTiming(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1])
+        timing = self._webGetStats()['phase_timing']
+        self.assertEqual(timing['phases']['transmit']['count'], self.model.num_mutations())
+        self.assertEqual(timing['phases']['store_report']['count'], 1)
+        self.assertEqual(len(timing['phases']['transmit']['buckets']), len(timing['buckets']) + 1)
+
+    def testProfileAction(self):
+        uut = WebInterface(host=self.host, port=self.port, stats_refresh_interval=0)
+        self._runFuzzerWithReportList(uut, [])
+        self.assertFalse(self._webGetStats()['profiler']['running'])
+        resp = requests.post('%s/api/action/profile?duration=0.1' % self.url).json()
+        self.assertTrue(resp['running'])
+        filename = resp['filename']
+        try:
+            self.fuzzer.profiler.stop()
+            self.assertEqual(self._webGetStats()['profiler']['last_filename'], filename)
+            self.assertTrue(os.path.exists(filename))
+        finally:
+            os.remove(filename)
+
+    def testProfileActionInvalidDuration(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [])
+        for duration in ['x', '0', '-1', 'nan', 'inf', '-inf']:
+            resp = requests.post('%s/api/action/profile?duration=%s' % (self.url, duration)).json()
+            self.assertIn('error', resp)
+            self.assertFalse(self.fuzzer.profiler.is_running())
+
+    def testProfileActionDurationIsCapped(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [])
+        resp = requests.post('%s/api/action/profile?duration=1e9' % self.url).json()
+        filename = resp['filename']
+        try:
+            self.assertTrue(resp['running'])
+            self.assertLessEqual(resp['remaining'], 600)
+        finally:
+            self.fuzzer.profiler.stop()
+            os.remove(filename)
+
+    def testStatsApiReportListIsPaginated(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1, 2, 3, 4, 5])
+        page_size = _WebInterfaceHandler.report_page_size
+        _WebInterfaceHandler.report_page_size = 2
+        try:
+            resp = self._webGetStats()
+            self.assertEqual([x[0] for x in resp['reports_extended']], [1, 2])
+            resp = self._webValidRequest('%s/api/stats.json?reports_after=%s' % (self.url, resp['reports_next']))
+            self.assertEqual([x[0] for x in resp['reports_extended']], [3, 4])
+        finally:
+            _WebInterfaceHandler.report_page_size = page_size
+
+    def testReportListApi(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1, 2, 3, 4, 5])
+        resp = self._webValidRequest('%s/api/reports.json?limit=3' % self.url)
+        self.assertEqual([x[0] for x in resp['reports']], [1, 2, 3])
+        self.assertEqual(resp['count'], 5)
+        resp = self._webValidRequest('%s/api/reports.json?after=%s' % (self.url, resp['next']))
+        self.assertEqual([x[0] for x in resp['reports']], [4, 5])
+        resp = self._webValidRequest('%s/api/reports.json?status=passed' % self.url)
+        self.assertEqual(resp['reports'], [])
+        self.assertEqual(resp['count'], 0)
+
+    def testReportListApiError(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1])
+        resp = self._webValidRequest('%s/api/reports.json?limit=x' % self.url)
+        self.assertIn('error', resp)
+
+    def testStatsAreCollectedOncePerRefreshInterval(self):
+        uut = WebInterface(host=self.host, port=self.port, stats_refresh_interval=60)
+        self._runFuzzerWithReportList(uut, [1])
+        calls = []
+        get_session_info = uut.dataman.get_session_info
+
+        def counting_get_session_info():
+            calls.append(1)
+            return get_session_info()
+        uut.dataman.get_session_info = counting_get_session_info
+        for i in range(5):
+            self._webGetStats()
+            self._webValidRequest('%s/api/stats_delta.json' % self.url)
+        self.assertEqual(len(calls), 1)
+
+    def testStatsApiNotModified(self):
+        uut = WebInterface(host=self.host, port=self.port, stats_refresh_interval=60)
+        self._runFuzzerWithReportList(uut, [1])
+        resp = requests.get('%s/api/stats.json' % self.url)
+        self.assertEqual(resp.status_code, 200)
+        etag = resp.headers['etag']
+        reports_next = resp.json()['reports_next']
+        resp = requests.get('%s/api/stats.json' % self.url, headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.text, '')
+        url = '%s/api/stats.json?reports_after=%s' % (self.url, reports_next)
+        resp = requests.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['reports_extended'], [])
+        resp = requests.get(url, headers={'If-None-Match': resp.headers['etag']})
+        self.assertEqual(resp.status_code, 304)
+
+    def testStatsDeltaApi(self):
+        uut = WebInterface(host=self.host, port=self.port, stats_refresh_interval=60)
+        self._runFuzzerWithReportList(uut, [1])
+        resp = self._webValidRequest('%s/api/stats_delta.json' % self.url)
+        self.assertGreater(resp['version'], 0)
+        for key in ['paused', 'eta', 'stats', 'current_test', 'report_counts', 'last_report', 'phase_timing', 'profiler']:
+            self.assertIn(key, resp['changes'])
+        self.assertEqual(resp['changes']['report_counts'], {'failed': 1})
+        resp = self._webValidRequest('%s/api/stats_delta.json?since=%d' % (self.url, resp['version']))
+        self.assertEqual(resp['changes'], {})
+
+    def testStatsDeltaApiReturnsChangedEntries(self):
+        uut = WebInterface(host=self.host, port=self.port, stats_refresh_interval=0)
+        self._runFuzzerWithReportList(uut, [1])
+        version = self._webValidRequest('%s/api/stats_delta.json' % self.url)['version']
+        uut.pause()
+        resp = self._webValidRequest('%s/api/stats_delta.json?since=%d' % (self.url, version))
+        self.assertEqual(resp['changes'], {'paused': True})
+        uut.resume()
+
+    def _readEvent(self, lines):
+        event = {}
+        for line in lines:
+            if not line:
+                return event
+            key, value = line.split(': ', 1)
+            event[key] = value
+
+    def testEventsApi(self):
+        uut = WebInterface(host=self.host, port=self.port, stats_refresh_interval=0)
+        self._runFuzzerWithReportList(uut, [1])
+        streams = [requests.get('%s/api/events' % self.url, stream=True, timeout=5) for i in range(3)]
+        for resp in streams:
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.headers['content-type'], 'text/event-stream')
+            event = self._readEvent(resp.iter_lines(chunk_size=1))
+            self.assertEqual(event['event'], 'stats')
+            self.assertIn('report_counts', json.loads(event['data']))
+        # the server is not blocked by the open streams
+        self._webGetStats()
+        uut.pause()
+        for resp in streams:
+            event = self._readEvent(resp.iter_lines(chunk_size=1))
+            self.assertEqual(json.loads(event['data']), {'paused': True})
+        uut.resume()
+        self.assertEqual(uut._publisher.subscriber_count(), 3)
+        for resp in streams:
+            resp.close()
+
+    def testSlowClientDoesNotBlockServer(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1])
+        slow = socket.create_connection((self.host, self.port))
+        try:
+            slow.sendall('GET /api/stats.json HTTP/1.1\r\n')
+            start = time.time()
+            self._webGetStats()
+            self._webGetReport(1)
+            self.assertLess(time.time() - start, 1)
+        finally:
+            slow.close()
+
+    def testJsonIsCompressed(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1])
+        min_size = _WebInterfaceHandler.gzip_min_size
+        _WebInterfaceHandler.gzip_min_size = 0
+        try:
+            resp = requests.get('%s/api/report?report_id=1' % self.url)
+            self.assertEqual(resp.headers['content-encoding'], 'gzip')
+            self.assertIn('report', resp.json())
+            resp = requests.get('%s/api/report?report_id=1' % self.url, headers={'Accept-Encoding': 'identity'})
+            self.assertNotIn('content-encoding', resp.headers)
+            self.assertIn('report', resp.json())
+        finally:
+            _WebInterfaceHandler.gzip_min_size = min_size
+
+    def testStaticFilesAreCached(self):
+        self.fuzzer = None
+        files = _StaticFiles(_WebInterfaceHandler.static_files._root)
+        self.assertEqual(files.get('static', 'index.html'), self.get_static_content('index.html'))
+        self.assertIs(files.get('static', 'index.html'), files.get('static', 'index.html'))
+        with self.assertRaises(IOError):
+            files.get('static', 'no_such_file.html')
+
+    def testExportApi(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1, 2, 3, 4, 5])
+        resp = requests.get('%s/api/export?start=2&end=4' % self.url, stream=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['content-type'], 'application/x-ndjson')
+        entries = [json.loads(line) for line in resp.iter_lines() if line]
+        self.assertEqual([entry['test_id'] for entry in entries], [2, 3, 4])
+        resp = requests.get('%s/api/export?after=%d' % (self.url, entries[-1]['cursor']), stream=True)
+        self.assertEqual([json.loads(line)['test_id'] for line in resp.iter_lines() if line], [5])
+
+    def testExportApiTar(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1, 2])
+        resp = requests.get('%s/api/export?format=tar&status=failed' % self.url)
+        self.assertEqual(resp.headers['content-type'], 'application/x-tar')
+        tar = tarfile.open(fileobj=StringIO(resp.content))
+        self.assertEqual(sorted(tar.getnames()), ['reports/report_1.json', 'reports/report_2.json'])
+
+    def testExportApiError(self):
+        uut = WebInterface(host=self.host, port=self.port)
+        self._runFuzzerWithReportList(uut, [1])
+        self.assertIn('error', self._webValidRequest('%s/api/export?format=xml' % self.url))
+
     def _testStatsApi(self):
         '''
         .. todo:: other stats API tests
@@ -25,7 +25,8 @@ import unittest
 import logging
 from kitty.model import GraphModel
 from kitty.model import RandomSequenceModel
-from kitty.model import StagedSequenceModel, Stage
+from kitty.model import StagedSequenceModel, Stage, SequenceCorpus
+from kitty.model import CombinedModel
 from kitty.model import Template
 from kitty.model import String, UInt32
 from kitty.core import KittyException
@@ -367,6 +368,36 @@ class StagedSequenceModelTests(unittest.TestCase):
             self.dst_templates = []
             self.cb_call_count = 0
 
+    def _get_all_sequences(self, num_mutations):
+        model = StagedSequenceModel(num_mutations=num_mutations)
+        for stage in self.stages:
+            model.add_stage(stage)
+        sequences = []
+        while model.mutate():
+            sequences.append(model.get_sequence_str())
+        return sequences
+
+    def testSkipReproducesSequence(self):
+        num_mutations = 100
+        sequences = self._get_all_sequences(num_mutations)
+        for to_skip in [1, 7, 50, 99]:
+            model = StagedSequenceModel(num_mutations=num_mutations)
+            for stage in self.stages:
+                model.add_stage(stage)
+            self.assertEqual(model.skip(to_skip), to_skip)
+            self.assertEqual(model.current_index(), to_skip - 1)
+            self.assertEqual(model.get_sequence_str(), sequences[to_skip - 1])
+            self.assertTrue(model.mutate())
+            self.assertEqual(model.get_sequence_str(), sequences[to_skip])
+
+    def testSequenceDependsOnlyOnIndex(self):
+        num_mutations = 100
+        sequences = self._get_all_sequences(num_mutations)
+        # generate some sequences in between, using the same stages
+        self._get_all_sequences(13)
+        self.assertEqual(sequences, self._get_all_sequences(num_mutations))
+        self.assertGreater(len(set(sequences)), 1)
+
     def testFailureToTo(self):
         self.assertEqual(len(self.todo), 0)
 
@@ -570,6 +601,64 @@ class StageTests(unittest.TestCase):
         seqs2 = [stage2.mutate() for i in range(10)]
         self.assertNotEqual(seqs1, seqs2)
 
+    def testSameSeedSameIndex(self):
+        stage1 = Stage(name='uut', selection_strategy='1-7', seed=1111)
+        stage2 = Stage(name='uut', selection_strategy='1-7', seed=1111)
+        for template in self.templates:
+            stage1.add_template(template)
+            stage2.add_template(template)
+        indices = range(100)
+        seqs1 = [stage1.mutate(index=i) for i in indices]
+        seqs2 = [stage2.mutate(index=i) for i in reversed(indices)]
+        self.assertEqual(seqs1, seqs2[::-1])
+        self.assertGreater(len(set(seqs1)), 1)
+
+    def testDifferentSeedSameIndex(self):
+        stage1 = Stage(name='uut1', selection_strategy='1-7', seed=1111)
+        stage2 = Stage(name='uut2', selection_strategy='1-7', seed=1112)
+        for template in self.templates:
+            stage1.add_template(template)
+            stage2.add_template(template)
+        seqs1 = [stage1.mutate(index=i) for i in range(10)]
+        seqs2 = [stage2.mutate(index=i) for i in range(10)]
+        self.assertNotEqual(seqs1, seqs2)
+
+    def testDifferentNameSameIndex(self):
+        stage1 = Stage(name='uut1', selection_strategy='1-7', seed=1111)
+        stage2 = Stage(name='uut2', selection_strategy='1-7', seed=1111)
+        for template in self.templates:
+            stage1.add_template(template)
+            stage2.add_template(template)
+        seqs1 = [stage1.mutate(index=i) for i in range(10)]
+        seqs2 = [stage2.mutate(index=i) for i in range(10)]
+        self.assertNotEqual(seqs1, seqs2)
+
+    def _check_seed_same_index(self, seed):
+        stage1 = Stage(name='uut', selection_strategy='1-7', seed=seed)
+        stage2 = Stage(name='uut', selection_strategy='1-7', seed=seed)
+        for template in self.templates:
+            stage1.add_template(template)
+            stage2.add_template(template)
+        seqs1 = [stage1.mutate(index=i) for i in range(10)]
+        seqs2 = [stage2.mutate(index=i) for i in range(10)]
+        self.assertEqual(seqs1, seqs2)
+
+    def testNoSeedSameIndex(self):
+        self._check_seed_same_index(None)
+
+    def testZeroSeedSameIndex(self):
+        self._check_seed_same_index(0)
+
+    def testZeroSeedIsNotDefault(self):
+        stage1 = Stage(name='uut', selection_strategy='1-7', seed=0)
+        stage2 = Stage(name='uut', selection_strategy='1-7')
+        for template in self.templates:
+            stage1.add_template(template)
+            stage2.add_template(template)
+        seqs1 = [stage1.mutate(index=i) for i in range(10)]
+        seqs2 = [stage2.mutate(index=i) for i in range(10)]
+        self.assertNotEqual(seqs1, seqs2)
+
     def testSameSeedRandom(self):
         self._check_same_seed('random')
 
@@ -763,6 +852,257 @@ class RandomSequenceModelTests(unittest.TestCase):
     def testFailureToTo(self):
         self.assertEqual(len(self.todo), 0)
 
+
+class SequenceCorpusTests(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = get_test_logger()
+        self.logger.debug('TESTING METHOD: %s', self._testMethodName)
+        self.templates = self.get_templates()
+        self.todo = []
+
+    def get_templates(self):
+        res = []
+        for i in range(20):
+            name = 't%d' % i
+            value = 'd%d' % i
+            res.append(Template(name=name, fields=[String(value)]))
+        return res
+
+    def get_model(self, corpus, num_mutations=200):
+        model = RandomSequenceModel(seed=1111, max_sequence=10, num_mutations=num_mutations, corpus=corpus)
+        for template in self.templates:
+            model.add_template(template)
+        return model
+
+    def _run_with_feedback(self, model, feedback_func):
+        sequences = []
+        while model.mutate():
+            sequence = [e.dst for e in model.get_sequence()]
+            sequences.append(sequence)
+            model.handle_feedback(feedback_func(sequence))
+        return sequences
+
+    def testNoFeedbackSameAsNoCorpus(self):
+        model1 = self.get_model(None)
+        model2 = self.get_model(SequenceCorpus(seed=1234))
+        seqs1 = self._run_with_feedback(model1, lambda s: 0)
+        seqs2 = self._run_with_feedback(model2, lambda s: 0)
+        self.assertEqual(seqs1, seqs2)
+
+    def testSameSeedSameFeedback(self):
+        model1 = self.get_model(SequenceCorpus(seed=1234))
+        model2 = self.get_model(SequenceCorpus(seed=1234))
+        feedback = lambda s: len(s) if self.templates[0] in s else 0
+        seqs1 = self._run_with_feedback(model1, feedback)
+        seqs2 = self._run_with_feedback(model2, feedback)
+        self.assertEqual(seqs1, seqs2)
+
+    def testCorpusIsBounded(self):
+        max_size = 5
+        corpus = SequenceCorpus(max_size=max_size, seed=1234)
+        model = self.get_model(corpus)
+        self._run_with_feedback(model, lambda s: 1)
+        self.assertEqual(corpus.size(), max_size)
+
+    def testSelectReturnsPrefixOfEntry(self):
+        corpus = SequenceCorpus(exploit_ratio=1, seed=1234)
+        stages = [tuple(self.templates[:3]), tuple(self.templates[3:8])]
+        corpus.feedback(stages, 1)
+        for i in range(100):
+            prefix = corpus.select()
+            self.assertLessEqual(len(prefix), len(stages))
+            for j in range(len(prefix) - 1):
+                self.assertEqual(prefix[j], stages[j])
+            last = prefix[-1]
+            self.assertEqual(last, stages[len(prefix) - 1][:len(last)])
+
+    def testDerivedSequencesAreValid(self):
+        corpus = SequenceCorpus(max_size=1, exploit_ratio=1, seed=1234)
+        model = self.get_model(corpus)
+        model.mutate()
+        model.handle_feedback(1)
+        while model.mutate():
+            sequence = [e.dst for e in model.get_sequence()]
+            self.assertTrue(model.get_test_info()['corpus']['derived'])
+            self.assertEqual(len(set(sequence)), len(sequence))
+            self.assertLessEqual(len(sequence), 10)
+            model.handle_feedback(0)
+
+    def testNovelPrefixesArePrioritised(self):
+        interesting = self.templates[0]
+        corpus = SequenceCorpus(seed=1234)
+        model = self.get_model(corpus, num_mutations=1000)
+        feedback = lambda s: 1 if s[0] == interesting else 0
+        sequences = self._run_with_feedback(model, feedback)
+        model_no_corpus = self.get_model(None, num_mutations=1000)
+        sequences_no_corpus = self._run_with_feedback(model_no_corpus, feedback)
+        count = len([s for s in sequences if s[0] == interesting])
+        count_no_corpus = len([s for s in sequences_no_corpus if s[0] == interesting])
+        self.assertGreater(count, count_no_corpus * 2)
+
+    def testFeedbackWithContextOfEarlierSequence(self):
+        corpus = SequenceCorpus(exploit_ratio=1, seed=1234)
+        model = self.get_model(corpus)
+        model.mutate()
+        context = model.get_feedback_context()
+        first = [e.dst for e in model.get_sequence()]
+        model.mutate()
+        model.handle_feedback(1, context)
+        self.assertEqual(corpus.size(), 1)
+        # the only entry is the first sequence, so every prefix is taken from it
+        for _ in range(20):
+            prefix = [t for templates in corpus.select() for t in templates]
+            self.assertEqual(prefix, first[:len(prefix)])
+
+    def testCorpusChangesModelHash(self):
+        model1 = self.get_model(None)
+        model2 = self.get_model(SequenceCorpus(seed=1234))
+        self.assertNotEqual(model1.hash(), model2.hash())
+
+    def testCorpusHashDependsOnParameterOrder(self):
+        self.assertNotEqual(SequenceCorpus(max_size=10, seed=20).hash(), SequenceCorpus(max_size=20, seed=10).hash())
+        self.assertNotEqual(SequenceCorpus(exploit_ratio=0.8, decay=0.5).hash(), SequenceCorpus(exploit_ratio=0.5, decay=0.8).hash())
+
+    def testInvalidParameters(self):
+        with self.assertRaises(KittyException):
+            SequenceCorpus(max_size=0)
+        with self.assertRaises(KittyException):
+            SequenceCorpus(exploit_ratio=1.5)
+        with self.assertRaises(KittyException):
+            SequenceCorpus(decay=0)
+
+    def testFailureToTo(self):
+        self.assertEqual(len(self.todo), 0)
+
+class CombinedModelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = get_test_logger()
+        self.logger.debug('TESTING METHOD: %s', self._testMethodName)
+        self.todo = []
+        self.handled = []
+
+    def get_structural(self):
+        model = GraphModel()
+        t1 = Template(name='t1', fields=[UInt32(100)])
+        t2 = Template(name='t2', fields=[UInt32(200)])
+        model.connect(t1)
+        model.connect(t1, t2)
+        return model
+
+    def get_sequence_model(self, num_mutations=30):
+        model = StagedSequenceModel(num_mutations=num_mutations)
+        stage = Stage('s', '1-3', 1234)
+        for i in range(4):
+            stage.add_template(Template(name='s%d' % i, fields=[String('d%d' % i)]))
+        model.add_stage(stage)
+        return model
+
+    def get_model(self, structural_weight=1, sequence_weight=1, num_sequences=30):
+        return CombinedModel(
+            self.get_structural(), self.get_sequence_model(num_sequences),
+            structural_weight=structural_weight, sequence_weight=sequence_weight
+        )
+
+    def _run(self, model):
+        cases = []
+        while model.mutate():
+            active = model.get_active_model()
+            cases.append((active.get_name(), active.current_index(), model.get_sequence_str()))
+        return cases
+
+    def testNumMutations(self):
+        structural = self.get_structural()
+        sequence = self.get_sequence_model()
+        expected = structural.num_mutations() + sequence.num_mutations()
+        model = CombinedModel(self.get_structural(), self.get_sequence_model())
+        self.assertEqual(model.num_mutations(), expected)
+        self.assertEqual(len(self._run(model)), expected)
+
+    def _check_all_cases(self, structural_weight, sequence_weight, num_sequences):
+        model = self.get_model(structural_weight, sequence_weight, num_sequences)
+        cases = self._run(model)
+        for name, expected_count in [('GraphModel', self.get_structural().num_mutations()), ('StagedSequenceModel', num_sequences)]:
+            indices = [c[1] for c in cases if c[0] == name]
+            self.assertEqual(indices, range(expected_count))
+        return cases
+
+    def testAllCasesEqualWeights(self):
+        cases = self._check_all_cases(1, 1, 30)
+        self.assertEqual([c[0] for c in cases[:4]], ['GraphModel', 'StagedSequenceModel'] * 2)
+
+    def testAllCasesStructuralWeight(self):
+        cases = self._check_all_cases(3, 1, 30)
+        self.assertEqual([c[0] for c in cases[:8]], (['GraphModel'] * 3 + ['StagedSequenceModel']) * 2)
+
+    def testAllCasesSequenceExhaustedFirst(self):
+        cases = self._check_all_cases(1, 2, 5)
+        self.assertEqual([c[0] for c in cases[-3:]], ['GraphModel'] * 3)
+
+    def testAllCasesStructuralExhaustedFirst(self):
+        self._check_all_cases(1, 1, 1000)
+
+    def testZeroWeight(self):
+        model = self.get_model(0, 1)
+        cases = self._run(model)
+        self.assertEqual(len(cases), 30)
+        self.assertEqual(set(c[0] for c in cases), set(['StagedSequenceModel']))
+
+    def testInvalidWeights(self):
+        with self.assertRaises(KittyException):
+            self.get_model(0, 0)
+        with self.assertRaises(KittyException):
+            self.get_model(-1, 1)
+
+    def testSkipReproducesCase(self):
+        cases = self._run(self.get_model(2, 1))
+        for to_skip in [0, 1, 5, 17, len(cases) - 1]:
+            model = self.get_model(2, 1)
+            self.assertEqual(model.skip(to_skip), to_skip)
+            self.assertEqual(self._run(model), cases[to_skip:])
+
+    def testSkipTooMuch(self):
+        model = self.get_model()
+        num_mutations = model.num_mutations()
+        self.assertEqual(model.skip(num_mutations + 10), num_mutations)
+        self.assertEqual(model.current_index(), model.last_index())
+        self.assertFalse(model.mutate())
+
+    def testHash(self):
+        self.assertEqual(self.get_model(2, 1).hash(), self.get_model(2, 1).hash())
+        self.assertNotEqual(self.get_model(2, 1).hash(), self.get_model(1, 1).hash())
+        self.assertNotEqual(self.get_model(num_sequences=30).hash(), CombinedModel(self.get_structural(), GraphModel()).hash())
+
+    def testHashDependsOnOrder(self):
+        self.assertNotEqual(self.get_model(2, 1).hash(), self.get_model(1, 2).hash())
+        swapped = CombinedModel(self.get_sequence_model(), self.get_structural())
+        self.assertNotEqual(self.get_model().hash(), swapped.hash())
+
+    def handle_stage_changed(self, model):
+        self.handled.append(model)
+
+    def testNotificationsAreForCombinedModel(self):
+        model = self.get_model()
+        model.set_notification_handler(self)
+        self._run(model)
+        self.assertGreater(len(self.handled), 0)
+        for handled in self.handled:
+            self.assertIs(handled, model)
+
+    def testSingleNotificationPerCase(self):
+        model = self.get_model()
+        model.set_notification_handler(self)
+        while True:
+            handled = len(self.handled)
+            if not model.mutate():
+                break
+            self.assertLessEqual(len(self.handled) - handled, 1)
+
+    def testFailureToTo(self):
+        self.assertEqual(len(self.todo), 0)
+
+
 import os
 
 if __name__ == '__main__':
@@ -327,6 +327,17 @@ class StringTests(ValueTestCase):
             else:
                 self.assertIn(mutation, mutations)
 
+    def testLibraryIsBuiltOnFirstUse(self):
+        field = self.cls(value=self.default_value)
+        self.assertIsNone(field._lib)
+        self.assertGreater(field.num_mutations(), 0)
+        self.assertIsNotNone(field._lib)
+
+    def testSetCurrentValueBeforeFirstUse(self):
+        field = self.cls(value=self.default_value)
+        field.set_current_value('other value')
+        self.assertEqual(field.render(), Bits(bytes='other value'))
+
     def _testStringsFromFile(self):
         values = [
             'It was the summer of 95 (so what!)',
@@ -562,6 +573,33 @@ class RandomBitsTests(ValueTestCase):
         mutations = self._get_all_mutations(field)
         self.assertNotEqual(len(set(mutations)), 1)
 
+    def testSameSeedSameMutations(self):
+        field1 = self.cls(value=self.default_value, seed=11111, min_length=10, max_length=100, unused_bits=self.default_unused_bits)
+        field2 = self.cls(value=self.default_value, seed=11111, min_length=10, max_length=100, unused_bits=self.default_unused_bits)
+        self.assertEqual(self._get_all_mutations(field1), self._get_all_mutations(field2))
+
+    def testMutationsAfterResetAreTheSame(self):
+        field = self.cls(value=self.default_value, min_length=10, max_length=100, unused_bits=self.default_unused_bits)
+        res1 = self._get_all_mutations(field)
+        res2 = self._get_all_mutations(field)
+        self.assertEqual(res1, res2)
+
+    def testSkipIsConsistentWithMutate(self):
+        field = self.cls(value=self.default_value, min_length=10, max_length=100, unused_bits=self.default_unused_bits)
+        mutations = self._get_all_mutations(field)
+        for skip in [0, 1, 7, len(mutations) - 1]:
+            field.reset()
+            self.assertEqual(field.skip(skip), skip)
+            self.assertTrue(field.mutate())
+            self.assertEqual(field.render(), mutations[skip])
+
+    def testLargeLength(self):
+        max_length = 8 * 1024 * 1024
+        field = self.cls(value=self.default_value, min_length=max_length, max_length=max_length, num_mutations=2, unused_bits=self.default_unused_bits)
+        res = self._get_all_mutations(field)
+        self.assertEqual([len(r) for r in res], [max_length, max_length])
+        self.assertNotEqual(res[0], res[1])
+
 
 class RandomBytesTests(ValueTestCase):
 
@@ -672,6 +710,33 @@ class RandomBytesTests(ValueTestCase):
         mutations = self._get_all_mutations(field)
         self.assertNotEqual(len(set(mutations)), 1)
 
+    def testSameSeedSameMutations(self):
+        field1 = self.cls(value=self.default_value, seed=11111, min_length=10, max_length=100)
+        field2 = self.cls(value=self.default_value, seed=11111, min_length=10, max_length=100)
+        self.assertEqual(self._get_all_mutations(field1), self._get_all_mutations(field2))
+
+    def testMutationsAfterResetAreTheSame(self):
+        field = self.cls(value=self.default_value, min_length=10, max_length=100)
+        res1 = self._get_all_mutations(field)
+        res2 = self._get_all_mutations(field)
+        self.assertEqual(res1, res2)
+
+    def testSkipIsConsistentWithMutate(self):
+        field = self.cls(value=self.default_value, min_length=10, max_length=100)
+        mutations = self._get_all_mutations(field)
+        for skip in [0, 1, 7, len(mutations) - 1]:
+            field.reset()
+            self.assertEqual(field.skip(skip), skip)
+            self.assertTrue(field.mutate())
+            self.assertEqual(field.render(), mutations[skip])
+
+    def testLargeLength(self):
+        max_length = 8 * 1024 * 1024
+        field = self.cls(value=self.default_value, min_length=max_length, max_length=max_length, num_mutations=2)
+        res = self._get_all_mutations(field)
+        self.assertEqual([len(r.bytes) for r in res], [max_length, max_length])
+        self.assertNotEqual(res[0], res[1])
+
 
 class StaticTests(ValueTestCase):
 
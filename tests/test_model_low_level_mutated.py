@@ -1,14 +1,20 @@
 '''
 Tests for mutation based fields
 
-.. todo:: BlockDuplicates, MutableField
+.. todo:: BlockDuplicates
 '''
 
+import os
+import shutil
+import tempfile
 from common import BaseTestCase, metaTest
 from kitty.core import KittyException
 from kitty.model.low_level.mutated_field import BitFlip, ByteFlip
 from kitty.model.low_level.mutated_field import BitFlips, ByteFlips
 from kitty.model.low_level.mutated_field import BlockRemove, BlockDuplicate, BlockSet
+from kitty.model.low_level.mutated_field import Patch, MutableField, CorpusField
+from kitty.model.low_level.mutated_field import ConstByteStore, _wrap_bytes
+from bitstring import BitArray
 from struct import pack
 
 
@@ -93,6 +99,28 @@ class BitFlipTests(BaseTestCase):
         uut2 = self.get_field(value=b'\x12\x33')
         self.assertNotEqual(uut1.hash(), uut2.hash())
 
+    def testFlipAcrossBytesOfNonZeroValue(self):
+        value = b'\x12\x34\x56'
+        for num_bits in [1, 3, 9, 24]:
+            uut = self.get_field(value=value, num_bits=num_bits)
+            expected = []
+            for i in range(len(value) * 8 - num_bits + 1):
+                flipped = BitArray(bytes=value)
+                flipped.invert(range(i, i + num_bits))
+                expected.append(flipped.tobytes())
+            self.assertEqual([m.tobytes() for m in self.get_all_mutations(uut)], expected)
+
+    def testMutationIsPatchOfTheValue(self):
+        value = b'\x00' * 1000
+        uut = self.get_field(value=value, num_bits=3)
+        uut.skip(4000)
+        uut.mutate()
+        patch = uut._current_value
+        self.assertIsInstance(patch, Patch)
+        self.assertIs(patch.base, value)
+        self.assertEqual((patch.offset, patch.length), (500, 1))
+        self.assertEqual(len(uut.render().tobytes()), 1000)
+
 
 class BitFlipsTests(BaseTestCase):
 
@@ -520,3 +548,141 @@ class BlockDuplicateTests(BlockOperationTests):
     def testExceptionIfNumDupsNotPositive(self):
         with self.assertRaises(KittyException):
             BlockDuplicate(b'\x00\x00\x00', 2, num_dups=-1)
+
+
+class PatchTests(BaseTestCase):
+
+    def setUp(self):
+        super(PatchTests, self).setUp(None)
+
+    def testReplaceWithSameLength(self):
+        patch = Patch('kitty', 1, 2, 'aa')
+        self.assertEqual(len(patch), 5)
+        self.assertEqual(patch.tobytes(), bytearray('kaaty'))
+        self.assertEqual(str(patch), 'kaaty')
+
+    def testRemove(self):
+        self.assertEqual(str(Patch('kitty', 0, 2, '')), 'tty')
+        self.assertEqual(str(Patch('kitty', 3, 2, '')), 'kit')
+
+    def testInsert(self):
+        self.assertEqual(str(Patch('kitty', 2, 1, 'ttt')), 'kitttty')
+        self.assertEqual(str(Patch('kitty', 5, 0, '!')), 'kitty!')
+
+    def testReprDoesNotIncludeBase(self):
+        self.assertNotIn('kitty', repr(Patch('kitty' * 100, 5, 1, 'x')))
+
+    def testRenderedPatch(self):
+        uut = ByteFlip('kitty', 1)
+        uut.mutate()
+        self.assertEqual(uut.render().tobytes(), '\x94itty')
+
+    def testWrappedBytesAreNotCopied(self):
+        buff = bytearray('kitty')
+        bits = _wrap_bytes(buff)
+        self.assertEqual(bits.tobytes(), 'kitty')
+        self.assertEqual(bits.len, 40)
+        if ConstByteStore is not None:
+            self.assertIs(bits._datastore._rawarray, buff)
+
+
+class CorpusFieldTests(BaseTestCase):
+
+    def setUp(self):
+        super(CorpusFieldTests, self).setUp(CorpusField)
+        self.tmpdir = tempfile.mkdtemp()
+        self.seeds = [('a.bin', 'kitty'), ('b.bin', ''.join(chr(i) for i in range(20))), ('c.bin', '')]
+        for (name, content) in self.seeds:
+            with open(os.path.join(self.tmpdir, name), 'wb') as f:
+                f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testMutationsAreTheMutationsOfEachSeed(self):
+        uut = CorpusField(self.tmpdir)
+        expected = []
+        for (_, content) in self.seeds[:2]:
+            # unlike the MutableField, the corpus field does not render the unmutated seed
+            expected.extend(m.tobytes() for m in self.get_all_mutations(MutableField(content)) if m.tobytes() != content)
+        self.assertEqual(uut.num_mutations(), len(expected))
+        self.assertEqual([m.tobytes() for m in self.get_all_mutations(uut)], expected)
+
+    def testDefaultValueIsTheFirstSeed(self):
+        uut = CorpusField(self.tmpdir)
+        self.assertEqual(uut.render().tobytes(), 'kitty')
+        uut = CorpusField(self.tmpdir, value='default')
+        self.assertEqual(uut.render().tobytes(), 'default')
+
+    def testListOfSeeds(self):
+        uut = CorpusField([os.path.join(self.tmpdir, 'b.bin')])
+        self.assertEqual(uut.render().tobytes(), self.seeds[1][1])
+        self.assertGreater(uut.num_mutations(), 0)
+
+    def testSkipIsConsistentWithMutate(self):
+        uut = CorpusField(self.tmpdir)
+        mutations = self.get_all_mutations(uut)
+        for count in [0, 1, 50, len(mutations) - 1]:
+            uut.reset()
+            self.assertEqual(uut.skip(count), count)
+            self.assertTrue(uut.mutate())
+            self.assertEqual(uut.render(), mutations[count])
+
+    def testSeedsAreMappedLazily(self):
+        uut = CorpusField(self.tmpdir, value='default')
+        os.remove(os.path.join(self.tmpdir, 'a.bin'))
+        uut.skip(uut.num_mutations() - 1)
+        self.assertTrue(uut.mutate())
+        self.assertEqual(uut.get_info()['seed'], os.path.join(self.tmpdir, 'b.bin'))
+
+    def testDefaultSeedIsNotRead(self):
+        uut = CorpusField(self.tmpdir)
+        # the first seed is memory-mapped, so a change of the file is seen when the field is rendered
+        with open(os.path.join(self.tmpdir, 'a.bin'), 'r+b') as f:
+            f.write('KITTY')
+        self.assertEqual(uut.render().tobytes(), 'KITTY')
+
+    def testPreviousSeedIsUnmapped(self):
+        uut = CorpusField(self.tmpdir)
+        self.assertTrue(uut.mutate())
+        first_seed = uut._base
+        self.assertEqual(first_seed[0], 'k')
+        uut.skip(uut.num_mutations() - 2)
+        self.assertTrue(uut.mutate())
+        self.assertEqual(uut.get_info()['seed'], os.path.join(self.tmpdir, 'b.bin'))
+        with self.assertRaises(ValueError):
+            first_seed[0]
+
+    def testBudget(self):
+        full = [m.tobytes() for m in self.get_all_mutations(CorpusField(self.tmpdir))]
+        uut = CorpusField(self.tmpdir, budget=10)
+        self.assertEqual(uut.num_mutations(), 20)
+        mutations = [m.tobytes() for m in self.get_all_mutations(uut)]
+        self.assertEqual(len(set(mutations)), 20)
+        self.assertTrue(set(mutations).issubset(set(full)))
+
+    def testInfo(self):
+        uut = CorpusField(self.tmpdir)
+        uut.skip(6)
+        uut.mutate()
+        info = uut.get_info()
+        self.assertEqual(info['seed'], os.path.join(self.tmpdir, 'a.bin'))
+        self.assertEqual(info['strategy'], 'byte flip 2')
+        self.assertEqual(info['offset'], 1)
+
+    def testExceptionIfNoSeeds(self):
+        with self.assertRaises(KittyException):
+            CorpusField([os.path.join(self.tmpdir, 'c.bin')])
+        with self.assertRaises(KittyException):
+            CorpusField(os.path.join(self.tmpdir, 'no_such_dir'))
+
+    def testExceptionIfBudgetNotPositive(self):
+        with self.assertRaises(KittyException):
+            CorpusField(self.tmpdir, budget=0)
+
+    def testHashChangesWithSeeds(self):
+        hash1 = CorpusField(self.tmpdir).hash()
+        self.assertEqual(hash1, CorpusField(self.tmpdir).hash())
+        with open(os.path.join(self.tmpdir, 'd.bin'), 'wb') as f:
+            f.write('new seed')
+        self.assertNotEqual(hash1, CorpusField(self.tmpdir).hash())
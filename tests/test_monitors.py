@@ -0,0 +1,151 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the monitor classes
+'''
+import os
+import time
+import select
+import unittest
+import threading
+from kitty.monitors import BaseMonitor, MonitorScheduler
+from common import BaseTestCase
+
+
+class CountingMonitor(BaseMonitor):
+
+    def __init__(self, name, logger=None, poll_interval=None, scheduler=None, fds=None, fail=False):
+        super(CountingMonitor, self).__init__(name, logger, poll_interval=poll_interval, scheduler=scheduler)
+        self.calls = 0
+        self.fds = fds if fds else []
+        self.data = ''
+        self.fail = fail
+
+    def get_fds(self):
+        return self.fds
+
+    def _monitor_func(self):
+        self.calls += 1
+        if self.fail:
+            self.fail = False
+            raise Exception('monitor failure')
+        for fd in select.select(self.fds, [], [], 0)[0]:
+            self.data += os.read(fd, 100)
+        if self.poll_interval is None:
+            time.sleep(0.01)
+
+
+class MonitorSchedulerTests(BaseTestCase):
+
+    def setUp(self):
+        super(MonitorSchedulerTests, self).setUp(MonitorScheduler)
+        self.scheduler = MonitorScheduler(logger=self.logger)
+        self.monitors = []
+
+    def tearDown(self):
+        for monitor in self.monitors:
+            monitor.teardown()
+
+    def get_monitor(self, **kwargs):
+        kwargs.setdefault('scheduler', self.scheduler)
+        monitor = CountingMonitor('monitor%d' % len(self.monitors), logger=self.logger, **kwargs)
+        self.monitors.append(monitor)
+        return monitor
+
+    def testMonitorIsCalledPeriodically(self):
+        monitor = self.get_monitor(poll_interval=0.05)
+        monitor.setup()
+        time.sleep(0.5)
+        self.assertGreaterEqual(monitor.calls, 5)
+        self.assertLessEqual(monitor.calls, 12)
+
+    def testMonitorsShareAThread(self):
+        threads_before = threading.active_count()
+        for i in range(5):
+            self.get_monitor(poll_interval=0.05).setup()
+        time.sleep(0.2)
+        self.assertEqual(threading.active_count(), threads_before + 1)
+        for monitor in self.monitors:
+            self.assertGreater(monitor.calls, 0)
+
+    def testSchedulerThreadStopsAfterTeardown(self):
+        threads_before = threading.active_count()
+        monitor = self.get_monitor(poll_interval=0.05)
+        monitor.setup()
+        monitor.teardown()
+        self.monitors = []
+        time.sleep(0.2)
+        self.assertEqual(threading.active_count(), threads_before)
+        calls = monitor.calls
+        time.sleep(0.2)
+        self.assertEqual(monitor.calls, calls)
+
+    def testMonitorIsCalledWhenFdIsReadable(self):
+        (rfd, wfd) = os.pipe()
+        try:
+            monitor = self.get_monitor(poll_interval=10, fds=[rfd])
+            monitor.setup()
+            time.sleep(0.2)
+            calls = monitor.calls
+            os.write(wfd, 'kitty')
+            time.sleep(0.3)
+            self.assertEqual(monitor.calls, calls + 1)
+            self.assertEqual(monitor.data, 'kitty')
+        finally:
+            os.close(rfd)
+            os.close(wfd)
+
+    def testFailedMonitorIsRestartedInPreTest(self):
+        monitor = self.get_monitor(poll_interval=0.05, fail=True)
+        monitor.setup()
+        time.sleep(0.2)
+        self.assertFalse(monitor._is_alive())
+        self.assertEqual(monitor.calls, 1)
+        monitor.pre_test(1)
+        self.assertTrue(monitor._is_alive())
+        time.sleep(0.2)
+        self.assertGreater(monitor.calls, 1)
+
+    def testCostIsReported(self):
+        monitor = self.get_monitor(poll_interval=0.01)
+        monitor.setup()
+        monitor.pre_test(1)
+        time.sleep(0.2)
+        monitor.post_test()
+        report = monitor.get_report()
+        self.assertGreater(report.get('monitor_calls'), 0)
+        self.assertGreaterEqual(report.get('monitor_cpu_time'), 0)
+        cost = monitor.get_cost()
+        self.assertGreaterEqual(cost['calls'], report.get('monitor_calls'))
+        self.assertGreaterEqual(cost['cpu_time'], report.get('monitor_cpu_time'))
+
+    def testThreadedMonitorCostIsNotAccounted(self):
+        monitor = self.get_monitor(poll_interval=None)
+        monitor.setup()
+        monitor.pre_test(1)
+        time.sleep(0.2)
+        monitor.post_test()
+        self.assertGreater(monitor.calls, 0)
+        self.assertIsNone(monitor.get_report().get('monitor_calls'))
+        self.assertEqual(monitor.get_cost()['calls'], 0)
+
+
+if __name__ == '__main__':
+    if not os.path.exists('logs'):
+        os.mkdir('logs')
+    unittest.main(verbosity=2)
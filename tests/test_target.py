@@ -18,6 +18,9 @@
 Tests for the target classes
 '''
 import logging
+import time
+import threading
+from kitty.core import KittyException
 from kitty.targets import BaseTarget, ServerTarget, ClientTarget
 from kitty.core.actor import KittyActorInterface
 from mocks.mock_config import Config
@@ -106,6 +109,25 @@ class TestActor(KittyActorInterface):
         pass
 
 
+class SlowActor(TestActor):
+
+    def __init__(self, name, logger=None, delay=0.2, exception=None, pre_test_delay=0):
+        super(SlowActor, self).__init__(name, logger)
+        self.delay = delay
+        self.exception = exception
+        self.pre_test_delay = pre_test_delay
+
+    def pre_test(self, test_number):
+        time.sleep(self.pre_test_delay)
+        super(SlowActor, self).pre_test(test_number)
+
+    def setup(self):
+        time.sleep(self.delay)
+        if self.exception:
+            raise self.exception
+        super(SlowActor, self).setup()
+
+
 class BaseTargetTests(BaseTestCase):
 
     def setUp(self, cls=BaseTarget):
@@ -229,6 +251,115 @@ class BaseTargetTests(BaseTestCase):
         self.check_calls('get_report', 1)
         self.assertEqual(report.get_status(), report.ERROR)
 
+    def testActorTimesAreReported(self):
+        self.add_actors()
+        self.uut.set_actor_concurrency(3)
+        self.uut.setup()
+        self.uut.pre_test(1)
+        self.uut.post_test(1)
+        actor_times = self.uut.get_report().get('actor_times')
+        names = set(['controller', 'Monitor1', 'Monitor2'])
+        self.assertEqual(set(actor_times['pre_test'].keys()), names)
+        self.assertEqual(set(actor_times['post_test'].keys()), names)
+        self.assertEqual(set(self.uut.actor_times['setup'].keys()), names)
+        self.uut.teardown()
+
+    def testActorTimesAreNotReportedByDefault(self):
+        self.add_actors()
+        self.uut.setup()
+        self.uut.pre_test(1)
+        self.uut.post_test(1)
+        self.assertIsNone(self.uut.get_report().get('actor_times'))
+        self.assertEqual(set(self.uut.actor_times['pre_test'].keys()), set(['controller', 'Monitor1', 'Monitor2']))
+
+    def testActorTimesAreReportedWhenTimeoutExceeded(self):
+        self.controller = SlowActor('controller', logger=self.logger, delay=0, pre_test_delay=0.1)
+        self.add_actors()
+        self.uut.set_actor_concurrency(1, timeout=0.05)
+        self.uut.setup()
+        self.uut.pre_test(1)
+        self.uut.post_test(1)
+        self.assertGreaterEqual(self.uut.get_report().get('actor_times')['pre_test']['controller'], 0.1)
+        self.controller.pre_test_delay = 0
+        self.uut.pre_test(2)
+        self.uut.post_test(2)
+        self.assertIsNone(self.uut.get_report().get('actor_times'))
+
+    def _add_slow_actors(self, delay=0.2, exception=None):
+        self.controller = SlowActor('controller', logger=self.logger, delay=delay)
+        self.monitor1 = SlowActor('Monitor1', logger=self.logger, delay=delay, exception=exception)
+        self.monitor2 = SlowActor('Monitor2', logger=self.logger, delay=delay)
+        self.add_actors()
+
+    def testConcurrentSetup(self):
+        self._add_slow_actors(delay=0.3)
+        self.uut.set_actor_concurrency(3)
+        start = time.time()
+        self.uut.setup()
+        self.assertLess(time.time() - start, 0.6)
+        self.check_calls('setup', 1)
+        for name in ['controller', 'Monitor1', 'Monitor2']:
+            self.assertGreaterEqual(self.uut.actor_times['setup'][name], 0.25)
+        self.uut.pre_test(1)
+        self.uut.post_test(1)
+        self.check_calls('pre_test', 1)
+        self.check_calls('post_test', 1)
+        self.uut.teardown()
+        self.check_calls('teardown', 1)
+
+    def testConcurrentSetupTimeout(self):
+        self._add_slow_actors(delay=0.5)
+        self.uut.set_actor_concurrency(3, timeout=0.1)
+        with self.assertRaises(KittyException):
+            self.uut.setup()
+        self.uut.teardown()
+
+    def testConcurrentSetupException(self):
+        self._add_slow_actors(delay=0, exception=ValueError('setup failed'))
+        self.uut.set_actor_concurrency(3)
+        with self.assertRaises(ValueError):
+            self.uut.setup()
+        self.uut.teardown()
+
+    def testConcurrentTimeoutStartsWithTheCall(self):
+        self._add_slow_actors(delay=0.3)
+        # the third call waits for a free worker, longer than the timeout would allow from the start
+        self.uut.set_actor_concurrency(2, timeout=0.5)
+        self.uut.setup()
+        self.check_calls('setup', 1)
+        self.uut.teardown()
+
+    def testConcurrentSetupExceptionWithTimeout(self):
+        self._add_slow_actors(delay=0, exception=ValueError('setup failed'))
+        self.uut.set_actor_concurrency(3, timeout=1)
+        with self.assertRaises(ValueError):
+            self.uut.setup()
+        self.uut.teardown()
+
+    def testConcurrentSetupExceptionIsNotReportedAsTimeout(self):
+        self.controller = SlowActor('controller', logger=self.logger, delay=0.5)
+        self.monitor1 = SlowActor('Monitor1', logger=self.logger, delay=0, exception=ValueError('setup failed'))
+        self.monitor2 = SlowActor('Monitor2', logger=self.logger, delay=0)
+        self.add_actors()
+        self.uut.set_actor_concurrency(3, timeout=0.1)
+        with self.assertRaises(KittyException) as cm:
+            self.uut.setup()
+        self.assertIn('setup of controller timed out', str(cm.exception))
+        self.assertIn('setup of Monitor1 failed', str(cm.exception))
+        self.uut.teardown()
+
+    def testSingleActorTimeout(self):
+        self.controller = SlowActor('controller', logger=self.logger, delay=0.5)
+        self.uut.set_controller(self.controller)
+        self.uut.set_actor_concurrency(2, timeout=0.1)
+        with self.assertRaises(KittyException):
+            self.uut.setup()
+        self.uut.teardown()
+
+    def testInvalidActorConcurrency(self):
+        with self.assertRaises(KittyException):
+            self.uut.set_actor_concurrency(0)
+
 
 class ServerTargetTest(BaseTargetTests):
 
@@ -252,3 +383,51 @@ class ClientTargetTest(BaseTargetTests):
         self.assertEqual(self.controller.get_call_count('trigger'), 1)
         self.assertEqual(self.monitor1.get_call_count('trigger'), 0)
         self.assertEqual(self.monitor2.get_call_count('trigger'), 0)
+
+
+class DelayedAliveActor(TestActor):
+
+    def __init__(self, name, logger=None, victim_alive_check_delay=0.3, alive_after=0.2):
+        super(DelayedAliveActor, self).__init__(name, logger, victim_alive_check_delay)
+        self.alive_time = time.time() + alive_after
+
+    @count_calls('is_victim_alive')
+    def is_victim_alive(self):
+        return time.time() >= self.alive_time
+
+
+class ActorTests(BaseTestCase):
+
+    def setUp(self):
+        super(ActorTests, self).setUp(KittyActorInterface)
+
+    def testNoWaitIfVictimIsAlive(self):
+        actor = TestActor('actor', logger=self.logger)
+        actor.pre_test(1)
+        self.assertEqual(actor.get_call_count('is_victim_alive'), 1)
+        self.assertEqual(actor.get_report().get('victim_alive_wait'), 0)
+
+    def testPollWithBackoff(self):
+        actor = DelayedAliveActor('actor', logger=self.logger, victim_alive_check_delay=0.3, alive_after=0.5)
+        actor.pre_test(1)
+        wait = actor.get_report().get('victim_alive_wait')
+        self.assertGreaterEqual(wait, 0.5)
+        self.assertLess(wait, 0.5 + 0.3 + 0.1)
+        # 0.01, 0.02, 0.04, 0.08, 0.16, 0.3, 0.3 ...
+        self.assertLessEqual(actor.get_call_count('is_victim_alive'), 9)
+
+    def testSignalVictimAlive(self):
+        actor = DelayedAliveActor('actor', logger=self.logger, victim_alive_check_delay=5, alive_after=1000)
+        timer = threading.Timer(0.3, actor.signal_victim_alive)
+        timer.start()
+        start = time.time()
+        actor.pre_test(1)
+        self.assertLess(time.time() - start, 1)
+        self.assertGreaterEqual(actor.get_report().get('victim_alive_wait'), 0.25)
+        timer.join()
+
+    def testSignalBeforePreTestIsIgnored(self):
+        actor = DelayedAliveActor('actor', logger=self.logger, victim_alive_check_delay=0.1, alive_after=0.3)
+        actor.signal_victim_alive()
+        actor.pre_test(1)
+        self.assertGreaterEqual(actor.get_report().get('victim_alive_wait'), 0.3)
@@ -0,0 +1,175 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the network targets and the concurrent server fuzzer
+'''
+import os
+import logging
+import unittest
+from kitty.core import KittyException
+from kitty.model import Template, GraphModel, String, Group
+from kitty.fuzzers import ServerFuzzer, ConcurrentServerFuzzer
+from kitty.interfaces.base import EmptyInterface
+from kitty.targets import TcpTarget, UdpTarget
+from kitty.data.report import Report
+from mocks.mock_server import EchoServer
+
+test_logger = None
+
+
+def get_test_logger():
+    global test_logger
+    if test_logger is None:
+        logger = logging.getLogger('TestNetworkTarget')
+        logger.setLevel(logging.DEBUG)
+        formatter = logging.Formatter('[%(asctime)s] [%(levelname)s] -> %(message)s')
+        handler = logging.FileHandler('logs/test_target_network.log', mode='w')
+        handler.setFormatter(formatter)
+        handler.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        test_logger = logger
+    return test_logger
+
+
+class NetworkTargetTests(unittest.TestCase):
+
+    protocol = 'tcp'
+    target_cls = TcpTarget
+
+    def setUp(self):
+        self.logger = get_test_logger()
+        self.logger.debug('TESTING METHOD: %s', self._testMethodName)
+        self.server = EchoServer(self.protocol).start()
+        self.values = ['a', 'b', 'crash', 'c', 'd', 'crash2', 'e']
+        self.crashing = [2, 5]
+        self.template = Template(name='t1', fields=[
+            String('hello', fuzzable=False),
+            Group(self.values, name='g')
+        ])
+        self.model = GraphModel()
+        self.model.connect(self.template)
+        self.target = self.get_target()
+        self.fuzzer = None
+
+    def tearDown(self):
+        if self.fuzzer:
+            self.fuzzer.stop()
+        self.server.stop()
+
+    def get_target(self):
+        target = self.target_cls('uut', host=self.server.host, port=self.server.port, timeout=0.5, logger=self.logger)
+        target.set_expect_response(True)
+        return target
+
+    def get_fuzzer(self):
+        fuzzer = ServerFuzzer(name='TestNetworkFuzzer', logger=self.logger)
+        fuzzer.set_interface(EmptyInterface())
+        fuzzer.set_model(self.model)
+        fuzzer.set_target(self.target)
+        fuzzer.set_delay_between_tests(0)
+        return fuzzer
+
+    def _check_session(self):
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.model.last_index())
+        self.assertEqual(info.failure_count, len(self.crashing))
+        for i in range(self.model.num_mutations()):
+            if i in self.crashing:
+                report = self.fuzzer.dataman.get_report_by_id(i)
+                self.assertEqual(report.get_status(), Report.FAILED)
+            else:
+                with self.assertRaises(KeyError):
+                    self.fuzzer.dataman.get_report_by_id(i)
+        requests = set(self.server.requests)
+        for value in self.values:
+            self.assertIn('hello' + value, requests)
+
+    def testFuzzAndDetectCrashes(self):
+        self.fuzzer = self.get_fuzzer()
+        self.fuzzer.start()
+        self._check_session()
+        # environment test + one request per test
+        self.assertEqual(len(self.server.requests), 1 + len(self.values))
+
+    def testMissingHost(self):
+        with self.assertRaises(KittyException):
+            self.target_cls('uut', host=None, port=self.server.port)
+
+
+class UdpTargetTests(NetworkTargetTests):
+
+    protocol = 'udp'
+    target_cls = UdpTarget
+
+
+class ConcurrentTcpFuzzerTests(NetworkTargetTests):
+
+    def get_fuzzer(self):
+        fuzzer = ConcurrentServerFuzzer(name='TestConcurrentFuzzer', logger=self.logger)
+        fuzzer.set_interface(EmptyInterface())
+        fuzzer.set_model(self.model)
+        fuzzer.set_target(self.target)
+        fuzzer.set_delay_between_tests(0)
+        fuzzer.set_concurrency(3)
+        return fuzzer
+
+    def testSequenceIsSentOverOneConnection(self):
+        prefix = Template(name='prefix', fields=[String('prefix', fuzzable=False)])
+        self.model = GraphModel()
+        self.model.connect(prefix)
+        self.model.connect(prefix, self.template)
+        self.fuzzer = self.get_fuzzer()
+        self.fuzzer.start()
+        self._check_session()
+        self.assertEqual(self.server.requests.count('prefix'), 1 + len(self.values))
+
+    def testStoreAllReports(self):
+        self.fuzzer = self.get_fuzzer()
+        self.fuzzer.set_store_all_reports(True)
+        self.fuzzer.start()
+        for i in range(self.model.num_mutations()):
+            report = self.fuzzer.dataman.get_report_by_id(i)
+            self.assertEqual(report.get('test_number'), i)
+            transmission = report.get('transmission_0x0000')
+            self.assertEqual(transmission.get('request (raw)'), 'hello' + self.values[i])
+            if i not in self.crashing:
+                self.assertEqual(transmission.get('response (raw)'), 'hello' + self.values[i])
+
+    def testFeedbackIsPassedWithTheContextOfEachCase(self):
+        feedbacks = []
+        self.model.get_feedback_context = lambda: self.model.current_index()
+        self.model.handle_feedback = lambda feedback, context=None: feedbacks.append(context)
+        self.fuzzer = self.get_fuzzer()
+        self.fuzzer.start()
+        self.assertEqual(feedbacks, range(self.model.num_mutations()))
+
+    def testInvalidConcurrency(self):
+        with self.assertRaises(KittyException):
+            ConcurrentServerFuzzer().set_concurrency(0)
+
+
+class ConcurrentUdpFuzzerTests(ConcurrentTcpFuzzerTests):
+
+    protocol = 'udp'
+    target_cls = UdpTarget
+
+
+if __name__ == '__main__':
+    if not os.path.exists('logs'):
+        os.mkdir('logs')
+    unittest.main(verbosity=2)